@@ -0,0 +1,105 @@
+"""
+DOCX render benchmark: renders per second with a fresh DocxTemplate per render
+(the old behaviour) and with the DocxTemplateCache.
+
+Builds a synthetic template of --paragraphs paragraphs with placeholders, a
+table with a loop and a header, renders it --renders times each way, and
+checks the cached output matches the uncached output.
+
+Usage (from backend/):
+    python benchmarks/bench_docx_render.py --paragraphs 400 --renders 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from docx import Document
+from docxtpl import DocxTemplate
+
+from utils.docx_cache import DocxTemplateCache
+
+
+def build_template(path: str, paragraphs: int):
+    document = Document()
+    document.sections[0].header.paragraphs[0].text = "{{ clientname }} - {{ casenumber }}"
+    document.add_heading("{{ matter_name }}", level=1)
+    for i in range(paragraphs):
+        document.add_paragraph(
+            f"Paragraph {i}: {{{{ clientname }}}} appears before the court of {{{{ county }}}} "
+            f"County on {{{{ currentdate }}}}{{% if opposing_party %}} against {{{{ opposing_party }}}}{{% endif %}}."
+        )
+    table = document.add_table(rows=3, cols=2)
+    table.cell(0, 0).text = "{%tr for item in assets %}"
+    table.cell(1, 0).text = "{{ item.name }}"
+    table.cell(1, 1).text = "{{ item.value }}"
+    table.cell(2, 0).text = "{%tr endfor %}"
+    document.save(path)
+
+
+def sample_context(i: int):
+    return {
+        "clientname": f"Client {i}",
+        "casenumber": f"2024-DR-{i:05d}",
+        "matter_name": f"Matter of Client {i}",
+        "county": "Orange",
+        "currentdate": "January 1, 2025",
+        "opposing_party": "Respondent" if i % 2 else "",
+        "assets": [{"name": f"Asset {n}", "value": f"${n * 1000}"} for n in range(10)],
+    }
+
+
+def document_xml(path: str) -> bytes:
+    with zipfile.ZipFile(path) as archive:
+        return b"".join(archive.read(name) for name in sorted(archive.namelist()) if name.startswith("word/"))
+
+
+def render_uncached(template_path: str, context, output_path: str):
+    doc = DocxTemplate(template_path)
+    doc.render(context)
+    doc.save(output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paragraphs", type=int, default=400, help="templated paragraphs in the template")
+    parser.add_argument("--renders", type=int, default=50, help="renders per mode")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template_path = os.path.join(tmp, "template.docx")
+        build_template(template_path, args.paragraphs)
+        cache = DocxTemplateCache(max_entries=4)
+
+        # Same context both ways; outputs must be identical
+        render_uncached(template_path, sample_context(1), os.path.join(tmp, "expected.docx"))
+        cache.render(template_path, sample_context(1), os.path.join(tmp, "warm.docx"))
+        cache.render(template_path, sample_context(1), os.path.join(tmp, "cached.docx"))
+        if document_xml(os.path.join(tmp, "expected.docx")) != document_xml(os.path.join(tmp, "cached.docx")):
+            sys.exit("cached render differs from uncached render")
+
+        size_kb = os.path.getsize(template_path) / 1024
+        print(f"{args.paragraphs} paragraphs ({size_kb:.0f} KB template), {args.renders} renders per mode")
+        print(f"{'mode':<10} {'renders/s':>10} {'ms/render':>10}")
+        for mode in ("uncached", "cached"):
+            start = time.perf_counter()
+            for i in range(args.renders):
+                output_path = os.path.join(tmp, f"{mode}-{i}.docx")
+                if mode == "cached":
+                    cache.render(template_path, sample_context(i), output_path)
+                else:
+                    render_uncached(template_path, sample_context(i), output_path)
+            elapsed = time.perf_counter() - start
+            print(f"{mode:<10} {args.renders / elapsed:>10.1f} {elapsed / args.renders * 1000:>10.1f}")
+
+        stats = cache.get_stats()
+        print(f"cache: {stats['hits']} hits, {stats['misses']} misses, "
+              f"{stats['compile_hits']} compile hits, {stats['bytes'] / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+DOCX variable detection benchmark: scans per second with the old detection
+(a DocxTemplate load, then a python-docx parse of the body text), the streaming
+DocxVariableScanner, and the scanner's memoized result for a known hash.
+
+Builds a synthetic template of --paragraphs paragraphs with placeholders,
+including one split across runs and others in the header and footer, and
+reports how many of the expected variables each way finds.
+
+Usage (from backend/):
+    python benchmarks/bench_docx_scan.py --paragraphs 2000 --scans 20
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from docx import Document
+from docxtpl import DocxTemplate
+
+from utils.blob_store import sha256_file
+from utils.docx_scan import DocxVariableScanner
+
+EXPECTED = {"clientname", "county", "casenumber", "matter_name", "firm_phone", "items.name", "items.value"}
+
+
+def build_template(path: str, paragraphs: int):
+    document = Document()
+    document.sections[0].header.paragraphs[0].text = "{casenumber}"
+    document.sections[0].footer.paragraphs[0].text = "{firm_phone}"
+    split = document.add_paragraph()
+    # Word splits placeholders like this when formatting changes mid-word
+    split.add_run("{matter")
+    split.add_run("_name}").bold = True
+    document.add_paragraph("{#items}")
+    document.add_paragraph("{items.name}: {items.value}")
+    document.add_paragraph("{/items}")
+    for i in range(paragraphs):
+        document.add_paragraph(f"Paragraph {i}: {{clientname}} appears before the court of {{county}} County.")
+    document.save(path)
+
+
+def detect_old(path: str):
+    """The old detection: docxtpl loads lazily, so it took the python-docx fallback"""
+    pattern = r'\{([a-zA-Z_][a-zA-Z0-9_\.]*)\}'
+    doc = DocxTemplate(path)
+    if doc.docx is not None:
+        return set(re.findall(pattern, doc.get_xml()))
+    raw_doc = Document(path)
+    text_content = ""
+    for para in raw_doc.paragraphs:
+        text_content += para.text + "\n"
+    for table in raw_doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                text_content += cell.text + "\n"
+    return set(re.findall(pattern, text_content))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paragraphs", type=int, default=2000, help="paragraphs in the template")
+    parser.add_argument("--scans", type=int, default=20, help="scans per mode")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "template.docx")
+        build_template(path, args.paragraphs)
+        content_hash = sha256_file(path)
+
+        def scan_fresh():
+            return set(DocxVariableScanner().scan_file(path, content_hash)["all_detected"])
+
+        memo = DocxVariableScanner()
+        modes = {
+            "old": lambda: detect_old(path),
+            "streaming": scan_fresh,
+            "memoized": lambda: set(memo.scan_file(path, content_hash)["all_detected"]),
+        }
+        print(f"{args.paragraphs} paragraphs, {args.scans} scans per mode")
+        print(f"{'mode':<14} {'scans/s':>9} {'ms/scan':>9} {'found':>7}")
+        for mode, scan in modes.items():
+            found = scan()
+            start = time.perf_counter()
+            for _ in range(args.scans):
+                scan()
+            elapsed = time.perf_counter() - start
+            label = f"{len(found & EXPECTED)}/{len(EXPECTED)}"
+            print(f"{mode:<14} {args.scans / elapsed:>9.1f} {elapsed / args.scans * 1000:>9.2f} {label:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Login burst benchmark: latency of unrelated requests while logins are hashing.
+
+Runs a minimal FastAPI app in-process with two login handlers - bcrypt called
+directly inside the async handler (the old behaviour) and bcrypt on the
+PasswordHasher pool - and measures /ping latency during a burst of logins.
+
+Usage (from backend/):
+    python benchmarks/bench_login_latency.py --logins 20 --rounds 12
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import bcrypt
+import httpx
+from fastapi import FastAPI
+
+from utils.passwords import PasswordHasher
+
+
+def build_app(hasher: PasswordHasher, stored_hash: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/login/blocking")
+    async def login_blocking():
+        ok = bcrypt.checkpw(b"correct horse", stored_hash.encode("utf-8"))
+        return {"ok": ok}
+
+    @app.post("/login/pooled")
+    async def login_pooled():
+        ok = await hasher.verify("correct horse", stored_hash)
+        return {"ok": ok}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_burst(client: httpx.AsyncClient, mode: str, logins: int, ping_interval: float):
+    ping_latencies = []
+    done = asyncio.Event()
+
+    async def pinger():
+        # Latency is measured from when each ping was due, so time spent
+        # waiting for a blocked event loop counts against the request
+        due = time.perf_counter()
+        while True:
+            await client.get("/ping")
+            ping_latencies.append((time.perf_counter() - due) * 1000)
+            if done.is_set():
+                break
+            due = max(due + ping_interval, time.perf_counter())
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+
+    async def login():
+        await client.post(f"/login/{mode}")
+
+    ping_task = asyncio.create_task(pinger())
+    await asyncio.sleep(ping_interval)
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await ping_task
+
+    return {
+        "mode": mode,
+        "logins_per_sec": logins / elapsed,
+        "ping_count": len(ping_latencies),
+        "ping_p50_ms": statistics.median(ping_latencies),
+        "ping_p99_ms": percentile(ping_latencies, 99),
+        "ping_max_ms": max(ping_latencies),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=20, help="concurrent logins in the burst")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    parser.add_argument("--workers", type=int, default=4, help="hasher pool size")
+    parser.add_argument("--ping-interval", type=float, default=0.01, help="seconds between /ping requests")
+    args = parser.parse_args()
+
+    hasher = PasswordHasher(rounds=args.rounds, max_workers=args.workers, max_pending=args.logins)
+    stored_hash = hasher.hash_sync("correct horse")
+    # Start the pool threads up front so the first burst isn't charged for it
+    await asyncio.gather(*(hasher.verify("correct horse", stored_hash) for _ in range(args.workers)))
+    app = build_app(hasher, stored_hash)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        print(f"{args.logins} logins, bcrypt rounds={args.rounds}, pool workers={args.workers}")
+        print(f"{'mode':<10} {'logins/s':>9} {'pings':>6} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for mode in ("blocking", "pooled"):
+            r = await run_burst(client, mode, args.logins, args.ping_interval)
+            print(f"{r['mode']:<10} {r['logins_per_sec']:>9.1f} {r['ping_count']:>6} "
+                  f"{r['ping_p50_ms']:>8.1f} {r['ping_p99_ms']:>8.1f} {r['ping_max_ms']:>8.1f}")
+
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
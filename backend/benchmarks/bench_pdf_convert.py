@@ -0,0 +1,112 @@
+"""
+DOCX to PDF conversion benchmark: documents per minute with a cold
+`soffice --convert-to` per document (fresh profile each time) and with the
+PdfConverter pool of warm LibreOffice workers.
+
+Builds a synthetic --paragraphs paragraph DOCX, converts it --docs times each
+way, and checks every output is a PDF. Needs LibreOffice (set SOFFICE_PATH if
+it isn't on PATH); the pool uses UNO when the `uno` module is importable.
+
+Usage (from backend/):
+    python benchmarks/bench_pdf_convert.py --docs 20 --workers 2
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from docx import Document
+
+from utils.pdf_convert import PdfConverter, find_soffice
+
+
+def build_docx(path: str, paragraphs: int):
+    document = Document()
+    document.add_heading("Conversion benchmark", level=1)
+    for i in range(paragraphs):
+        document.add_paragraph(f"Paragraph {i}: the quick brown fox jumps over the lazy dog. " * 3)
+    document.save(path)
+
+
+def is_pdf(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(5) == b"%PDF-"
+
+
+def convert_cold(soffice: str, docx_path: str, out_dir: str):
+    with tempfile.TemporaryDirectory() as profile:
+        subprocess.run(
+            [soffice, "--headless", f"-env:UserInstallation=file://{profile}",
+             "--convert-to", "pdf", "--outdir", out_dir, docx_path],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True
+        )
+
+
+async def convert_pooled(converter: PdfConverter, docx_paths, out_dir: str):
+    await asyncio.gather(*(
+        converter.convert(path, os.path.join(out_dir, os.path.basename(path)[:-5] + ".pdf"))
+        for path in docx_paths
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20, help="documents per mode")
+    parser.add_argument("--paragraphs", type=int, default=100, help="paragraphs per document")
+    parser.add_argument("--workers", type=int, default=2, help="pool workers")
+    args = parser.parse_args()
+
+    soffice = find_soffice()
+    if not soffice:
+        sys.exit("LibreOffice not found; install it or set SOFFICE_PATH")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        docx_paths = []
+        for i in range(args.docs):
+            path = os.path.join(tmp, f"doc{i}.docx")
+            build_docx(path, args.paragraphs)
+            docx_paths.append(path)
+
+        cold_dir = os.path.join(tmp, "cold")
+        os.mkdir(cold_dir)
+        start = time.perf_counter()
+        for path in docx_paths:
+            convert_cold(soffice, path, cold_dir)
+        cold = time.perf_counter() - start
+
+        converter = PdfConverter(workers=args.workers)
+        converter.profile_root = os.path.join(tmp, "profiles")
+        pool_dir = os.path.join(tmp, "pool")
+        os.mkdir(pool_dir)
+
+        async def run_pool():
+            started = time.perf_counter()
+            await converter.start()
+            warmup = time.perf_counter() - started
+            started = time.perf_counter()
+            await convert_pooled(converter, docx_paths, pool_dir)
+            return warmup, time.perf_counter() - started
+
+        try:
+            warmup, pooled = asyncio.run(run_pool())
+        finally:
+            converter.shutdown()
+
+        outputs = [os.path.join(d, f) for d in (cold_dir, pool_dir) for f in os.listdir(d)]
+        assert len(outputs) == 2 * args.docs and all(is_pdf(p) for p in outputs), "missing or invalid PDF output"
+
+        print(f"{args.docs} documents x {args.paragraphs} paragraphs, pool mode {converter.mode}")
+        print(f"{'mode':<22} {'docs/min':>9} {'s/doc':>7}")
+        print(f"{'cold soffice':<22} {args.docs / cold * 60:>9.1f} {cold / args.docs:>7.2f}")
+        print(f"{f'pool ({args.workers} workers)':<22} {args.docs / pooled * 60:>9.1f} {pooled / args.docs:>7.2f}")
+        print(f"pool start-up (once): {warmup:.2f}s")
+        print(converter.get_stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+PDF form-fill benchmark: fills per second with a fresh PdfReader per fill
+(the old behaviour, which only filled page 1), the same filling every page,
+and the PdfFillEngine with its cached template and field-to-page index.
+
+Builds a synthetic --pages page form with --fields text fields and one
+checkbox per page, and checks the engine fills fields on every page.
+
+Usage (from backend/):
+    python benchmarks/bench_pdf_fill.py --pages 8 --fields 25 --fills 50
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ArrayObject, DictionaryObject, FloatObject, NameObject, NumberObject, StreamObject, TextStringObject
+)
+
+from utils.pdf_fill import PdfFillEngine
+
+
+def build_form(path: str, pages: int, fields: int):
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    all_fields = ArrayObject()
+    for p in range(pages):
+        page = writer.add_blank_page(612, 792)
+        annots = ArrayObject()
+        for f in range(fields):
+            y = 750 - f * 28
+            widget = writer._add_object(DictionaryObject({
+                NameObject("/Type"): NameObject("/Annot"),
+                NameObject("/Subtype"): NameObject("/Widget"),
+                NameObject("/FT"): NameObject("/Tx"),
+                NameObject("/T"): TextStringObject(f"page{p + 1}_field{f + 1}"),
+                NameObject("/Rect"): ArrayObject([FloatObject(50), FloatObject(y), FloatObject(350), FloatObject(y + 20)]),
+                NameObject("/DA"): TextStringObject("/Helv 10 Tf 0 g"),
+                NameObject("/F"): NumberObject(4),
+                NameObject("/P"): page.indirect_reference,
+            }))
+            annots.append(widget)
+            all_fields.append(widget)
+        on = StreamObject()
+        on.set_data(b"0 g 2 2 12 12 re f")
+        off = StreamObject()
+        checkbox = writer._add_object(DictionaryObject({
+            NameObject("/Type"): NameObject("/Annot"),
+            NameObject("/Subtype"): NameObject("/Widget"),
+            NameObject("/FT"): NameObject("/Btn"),
+            NameObject("/T"): TextStringObject(f"page{p + 1}_check"),
+            NameObject("/Rect"): ArrayObject([FloatObject(400), FloatObject(750), FloatObject(416), FloatObject(766)]),
+            NameObject("/AS"): NameObject("/Off"),
+            NameObject("/F"): NumberObject(4),
+            NameObject("/AP"): DictionaryObject({NameObject("/N"): DictionaryObject({
+                NameObject("/Yes"): writer._add_object(on),
+                NameObject("/Off"): writer._add_object(off),
+            })}),
+            NameObject("/P"): page.indirect_reference,
+        }))
+        annots.append(checkbox)
+        all_fields.append(checkbox)
+        page[NameObject("/Annots")] = annots
+    writer.root_object[NameObject("/AcroForm")] = writer._add_object(DictionaryObject({
+        NameObject("/Fields"): all_fields,
+        NameObject("/DA"): TextStringObject("/Helv 10 Tf 0 g"),
+        NameObject("/DR"): DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/Helv"): font})}),
+    }))
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def sample_values(pages: int, fields: int, i: int):
+    values = {f"page{p + 1}_field{f + 1}": f"Value {i}-{p}-{f}" for p in range(pages) for f in range(fields)}
+    values.update({f"page{p + 1}_check": "/Yes" for p in range(pages)})
+    return values
+
+
+def fill_old(template_path: str, values, output):
+    reader = PdfReader(template_path)
+    writer = PdfWriter()
+    writer.append(reader)
+    writer.update_page_form_field_values(writer.pages[0], values, auto_regenerate=True)
+    writer.write(output)
+
+
+def fill_old_all_pages(template_path: str, values, output):
+    reader = PdfReader(template_path)
+    writer = PdfWriter()
+    writer.append(reader)
+    writer.update_page_form_field_values(None, values, auto_regenerate=True)
+    writer.write(output)
+
+
+def filled_fields(data: bytes) -> int:
+    fields = PdfReader(io.BytesIO(data)).get_fields() or {}
+    return sum(1 for field in fields.values() if field.get("/V") not in (None, "", "/Off"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=8, help="pages in the form")
+    parser.add_argument("--fields", type=int, default=25, help="text fields per page")
+    parser.add_argument("--fills", type=int, default=50, help="fills per mode")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template_path = os.path.join(tmp, "form.pdf")
+        build_form(template_path, args.pages, args.fields)
+        engine = PdfFillEngine()
+        expected = args.pages * (args.fields + 1)
+
+        modes = {
+            "old (page 1)": lambda values, out: fill_old(template_path, values, out),
+            "old (all)": lambda values, out: fill_old_all_pages(template_path, values, out),
+            "cached": lambda values, out: engine.fill(template_path, values, out),
+            "cached+flat": lambda values, out: engine.fill(template_path, values, out, flatten=True),
+        }
+        print(f"{args.pages} pages x {args.fields + 1} fields, {args.fills} fills per mode")
+        print(f"{'mode':<13} {'fills/s':>8} {'ms/fill':>8} {'filled':>10}")
+        for mode, fill in modes.items():
+            check = io.BytesIO()
+            fill(sample_values(args.pages, args.fields, 0), check)
+            filled = filled_fields(check.getvalue())
+            if mode == "cached+flat":
+                remaining = PdfReader(io.BytesIO(check.getvalue())).get_fields()
+                filled_label = "flattened" if not remaining else f"{len(remaining)} left"
+            else:
+                filled_label = f"{filled}/{expected}"
+            start = time.perf_counter()
+            for i in range(args.fills):
+                fill(sample_values(args.pages, args.fields, i), io.BytesIO())
+            elapsed = time.perf_counter() - start
+            print(f"{mode:<13} {args.fills / elapsed:>8.1f} {elapsed / args.fills * 1000:>8.1f} {filled_label:>10}")
+
+
+if __name__ == "__main__":
+    main()
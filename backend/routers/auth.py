@@ -5,11 +5,13 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional, List
 from datetime import datetime, timezone, timedelta
 import jwt
-import bcrypt
 import uuid
 import secrets
 import os
 
+from utils.cache import TTLCache
+from utils.passwords import password_hasher, PasswordHasherBusy
+from utils.db import database, users_repo
 from models.schemas import (
     UserLogin, UserRegister, UserResponse, TokenResponse, ProfileUpdate, PasswordChange,
     PasswordResetRequest, PasswordResetConfirm, UserCreate, UserUpdate, AuthHealthResponse
@@ -18,30 +20,47 @@ from models.schemas import (
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 security = HTTPBearer(auto_error=False)
 
-supabase = None
 JWT_SECRET = None
 
+# User rows keyed by JWT sub. The short TTL bounds how long a change made by
+# another process (e.g. deactivation, or a token_version bump that revokes
+# tokens) can go unnoticed here.
+user_cache = TTLCache(
+    max_size=int(os.environ.get('USER_CACHE_MAX_SIZE', '1024')),
+    ttl_seconds=float(os.environ.get('USER_CACHE_TTL_SECONDS', '30'))
+)
+
 def init_auth(supabase_client, jwt_secret):
-    global supabase, JWT_SECRET
-    supabase = supabase_client
+    global JWT_SECRET
+    database.bind(supabase_client)
     JWT_SECRET = jwt_secret
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+async def hash_password(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+async def verify_password(password: str, hashed: str) -> bool:
+    try:
+        return await password_hasher.verify(password, hashed)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
 
-def create_token(user_id: str, email: str, role: str) -> str:
+def create_token(user_id: str, email: str, role: str, token_version: int = 0) -> str:
     payload = {
         "sub": user_id,
         "email": email,
         "role": role,
+        "ver": token_version,
         "iat": datetime.now(timezone.utc),
         "exp": datetime.now(timezone.utc) + timedelta(days=7)
     }
     return jwt.encode(payload, JWT_SECRET, algorithm="HS256")
 
+def invalidate_cached_user(user_id: str):
+    user_cache.invalidate(user_id)
+
 def parse_datetime(dt_value) -> datetime:
     if isinstance(dt_value, datetime):
         return dt_value
@@ -59,6 +78,26 @@ def user_to_response(user: dict) -> UserResponse:
         created_at=parse_datetime(user["created_at"])
     )
 
+async def load_token_user(user_id: str, token_version: Optional[int]) -> dict:
+    """The active user a token was issued to, rejecting tokens revoked by a version bump.
+    A revoked token is still accepted by a process whose cached row predates the bump,
+    until that entry expires (USER_CACHE_TTL_SECONDS)."""
+    user = user_cache.get(user_id)
+    # A token newer than the cached row means the row changed elsewhere
+    if user is None or (token_version is not None and token_version > user.get("token_version", 0)):
+        user = await users_repo.get_by_id(user_id)
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        user_cache.set(user_id, user)
+
+    if not user.get("is_active", True):
+        raise HTTPException(status_code=401, detail="Account is deactivated")
+
+    if token_version is not None and token_version != user.get("token_version", 0):
+        raise HTTPException(status_code=401, detail="Token revoked")
+
+    return dict(user)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     if not credentials:
         raise HTTPException(status_code=401, detail="Not authenticated")
@@ -68,18 +107,11 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
         user_id = payload.get("sub")
-        if not user_id:
+        # Purpose-scoped tokens (e.g. calendar feeds) are never API credentials
+        if not user_id or "purpose" in payload:
             raise HTTPException(status_code=401, detail="Invalid token")
 
-        result = supabase.table("users").select("*").eq("id", user_id).maybe_single().execute()
-        if not result.data:
-            raise HTTPException(status_code=401, detail="User not found")
-
-        user = result.data
-        if not user.get("is_active", True):
-            raise HTTPException(status_code=401, detail="Account is deactivated")
-
-        return user
+        return await load_token_user(user_id, payload.get("ver"))
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
@@ -102,23 +134,31 @@ async def require_admin(current_user: dict = Depends(get_current_user)):
 @router.post("/login", response_model=TokenResponse)
 async def login(credentials: UserLogin):
     try:
-        result = supabase.table("users").select("*").eq("email", credentials.email.lower()).maybe_single().execute()
+        user = await users_repo.get_by_email(credentials.email.lower())
     except Exception as e:
         print(f"[AUTH] Supabase query error: {e}")
         raise HTTPException(status_code=500, detail="Authentication service error")
 
-    if not result or not result.data:
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    user = result.data
-
     if not user.get("is_active", True):
         raise HTTPException(status_code=401, detail="Account is deactivated")
 
-    if not verify_password(credentials.password, user["password_hash"]):
+    if not await verify_password(credentials.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    token = create_token(user["id"], user["email"], user.get("role", "staff"))
+    # Upgrade hashes made with an older cost factor while we have the plaintext
+    if password_hasher.needs_rehash(user["password_hash"]):
+        try:
+            await users_repo.update(user["id"], {
+                "password_hash": await password_hasher.hash(credentials.password)
+            })
+            invalidate_cached_user(user["id"])
+        except Exception as e:
+            print(f"[AUTH] Password rehash failed for {user['id']}: {e}")
+
+    token = create_token(user["id"], user["email"], user.get("role", "staff"), user.get("token_version", 0))
 
     return TokenResponse(
         access_token=token,
@@ -142,8 +182,8 @@ async def register(data: UserRegister):
         raise HTTPException(status_code=400, detail="Password must be at least 8 characters")
 
     try:
-        existing = supabase.table("users").select("id").eq("email", email).maybe_single().execute()
-        if existing and existing.data:
+        existing = await users_repo.get_by_email(email, columns="id")
+        if existing:
             raise HTTPException(status_code=400, detail="An account with this email already exists")
     except HTTPException:
         raise
@@ -156,7 +196,7 @@ async def register(data: UserRegister):
     new_user = {
         "id": user_id,
         "email": email,
-        "password_hash": hash_password(data.password),
+        "password_hash": await hash_password(data.password),
         "name": data.name.strip(),
         "role": "staff",
         "is_active": True,
@@ -164,12 +204,12 @@ async def register(data: UserRegister):
         "updated_at": now.isoformat()
     }
 
-    supabase.table("users").insert(new_user).execute()
+    await users_repo.insert(new_user)
 
     token = create_token(user_id, email, "staff")
 
-    result = supabase.table("users").select("*").eq("id", user_id).maybe_single().execute()
-    if not result or not result.data:
+    created = await users_repo.get_by_id(user_id)
+    if not created:
         return TokenResponse(
             access_token=token,
             user=UserResponse(
@@ -183,7 +223,7 @@ async def register(data: UserRegister):
         )
     return TokenResponse(
         access_token=token,
-        user=user_to_response(result.data)
+        user=user_to_response(created)
     )
 
 
@@ -199,44 +239,51 @@ async def update_profile(data: ProfileUpdate, current_user: dict = Depends(get_c
     if data.name is not None:
         updates["name"] = data.name
 
-    supabase.table("users").update(updates).eq("id", current_user["id"]).execute()
+    await users_repo.update(current_user["id"], updates)
+    invalidate_cached_user(current_user["id"])
 
-    result = supabase.table("users").select("*").eq("id", current_user["id"]).maybe_single().execute()
+    user = await users_repo.get_by_id(current_user["id"])
 
-    return {"success": True, "user": user_to_response(result.data)}
+    return {"success": True, "user": user_to_response(user)}
 
 
 @router.post("/change-password")
 async def change_password(data: PasswordChange, current_user: dict = Depends(get_current_user)):
-    if not verify_password(data.current_password, current_user["password_hash"]):
+    if not await verify_password(data.current_password, current_user["password_hash"]):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
 
     if len(data.new_password) < 8:
         raise HTTPException(status_code=400, detail="Password must be at least 8 characters")
 
-    supabase.table("users").update({
-        "password_hash": hash_password(data.new_password),
+    token_version = await users_repo.update_revoking_tokens(current_user["id"], {
+        "password_hash": await hash_password(data.new_password),
         "updated_at": datetime.now(timezone.utc).isoformat()
-    }).eq("id", current_user["id"]).execute()
+    })
+    if token_version is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    invalidate_cached_user(current_user["id"])
+
+    # Other sessions are revoked by the version bump (within USER_CACHE_TTL_SECONDS
+    # in other processes); hand this one a fresh token
+    token = create_token(current_user["id"], current_user["email"], current_user.get("role", "staff"), token_version)
 
-    return {"success": True, "message": "Password changed successfully"}
+    return {"success": True, "message": "Password changed successfully", "access_token": token}
 
 
 @router.post("/password-reset/request")
 async def request_password_reset(data: PasswordResetRequest):
-    result = supabase.table("users").select("*").eq("email", data.email.lower()).maybe_single().execute()
+    user = await users_repo.get_by_email(data.email.lower())
 
-    if result.data:
-        user = result.data
+    if user:
         if user.get("is_active", True):
             reset_token = secrets.token_urlsafe(32)
             expires = datetime.now(timezone.utc) + timedelta(hours=1)
 
-            supabase.table("users").update({
+            await users_repo.update(user["id"], {
                 "password_reset_token": reset_token,
                 "password_reset_expires": expires.isoformat(),
                 "updated_at": datetime.now(timezone.utc).isoformat()
-            }).eq("id", user["id"]).execute()
+            })
 
     return {
         "success": True,
@@ -246,12 +293,10 @@ async def request_password_reset(data: PasswordResetRequest):
 
 @router.get("/password-reset/token/{token}")
 async def get_reset_token_info(token: str):
-    result = supabase.table("users").select("email, password_reset_expires").eq("password_reset_token", token).maybe_single().execute()
+    user = await users_repo.get_by_reset_token(token, columns="email, password_reset_expires")
 
-    if not result.data:
+    if not user:
         raise HTTPException(status_code=400, detail="Invalid or expired reset token")
-
-    user = result.data
     expires = parse_datetime(user.get("password_reset_expires"))
 
     if datetime.now(timezone.utc) > expires:
@@ -262,12 +307,10 @@ async def get_reset_token_info(token: str):
 
 @router.post("/password-reset/confirm")
 async def confirm_password_reset(data: PasswordResetConfirm):
-    result = supabase.table("users").select("*").eq("password_reset_token", data.token).maybe_single().execute()
+    user = await users_repo.get_by_reset_token(data.token)
 
-    if not result.data:
+    if not user:
         raise HTTPException(status_code=400, detail="Invalid or expired reset token")
-
-    user = result.data
     expires = parse_datetime(user.get("password_reset_expires"))
 
     if datetime.now(timezone.utc) > expires:
@@ -276,12 +319,13 @@ async def confirm_password_reset(data: PasswordResetConfirm):
     if len(data.new_password) < 8:
         raise HTTPException(status_code=400, detail="Password must be at least 8 characters")
 
-    supabase.table("users").update({
-        "password_hash": hash_password(data.new_password),
+    await users_repo.update_revoking_tokens(user["id"], {
+        "password_hash": await hash_password(data.new_password),
         "password_reset_token": None,
         "password_reset_expires": None,
         "updated_at": datetime.now(timezone.utc).isoformat()
-    }).eq("id", user["id"]).execute()
+    })
+    invalidate_cached_user(user["id"])
 
     return {"success": True, "message": "Password has been reset successfully"}
 
@@ -293,17 +337,17 @@ async def check_role(current_user: dict = Depends(get_current_user)):
 
 @router.get("/admin/users")
 async def get_all_users(current_user: dict = Depends(require_admin)):
-    result = supabase.table("users").select("*").order("created_at", desc=True).execute()
+    users = await users_repo.list_all()
 
     return {
-        "users": [user_to_response(u) for u in result.data]
+        "users": [user_to_response(u) for u in users]
     }
 
 
 @router.post("/admin/users", response_model=UserResponse)
 async def create_user(data: UserCreate, current_user: dict = Depends(require_admin)):
-    existing = supabase.table("users").select("id").eq("email", data.email.lower()).maybe_single().execute()
-    if existing.data:
+    existing = await users_repo.get_by_email(data.email.lower(), columns="id")
+    if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
 
     if len(data.password) < 8:
@@ -315,7 +359,7 @@ async def create_user(data: UserCreate, current_user: dict = Depends(require_adm
     new_user = {
         "id": user_id,
         "email": data.email.lower(),
-        "password_hash": hash_password(data.password),
+        "password_hash": await hash_password(data.password),
         "name": data.name,
         "role": data.role,
         "is_active": True,
@@ -323,16 +367,16 @@ async def create_user(data: UserCreate, current_user: dict = Depends(require_adm
         "updated_at": now.isoformat()
     }
 
-    supabase.table("users").insert(new_user).execute()
+    await users_repo.insert(new_user)
 
-    result = supabase.table("users").select("*").eq("id", user_id).maybe_single().execute()
-    return user_to_response(result.data)
+    created = await users_repo.get_by_id(user_id)
+    return user_to_response(created)
 
 
 @router.patch("/admin/users/{user_id}", response_model=UserResponse)
 async def update_user(user_id: str, data: UserUpdate, current_user: dict = Depends(require_admin)):
-    existing = supabase.table("users").select("*").eq("id", user_id).maybe_single().execute()
-    if not existing.data:
+    existing = await users_repo.get_by_id(user_id)
+    if not existing:
         raise HTTPException(status_code=404, detail="User not found")
 
     if user_id == current_user["id"] and data.role == "staff":
@@ -350,26 +394,32 @@ async def update_user(user_id: str, data: UserUpdate, current_user: dict = Depen
     if data.is_active is not None:
         updates["is_active"] = data.is_active
 
-    supabase.table("users").update(updates).eq("id", user_id).execute()
+    if data.is_active == False:
+        # Revokes outstanding tokens; other processes notice within USER_CACHE_TTL_SECONDS
+        await users_repo.update_revoking_tokens(user_id, updates)
+    else:
+        await users_repo.update(user_id, updates)
+    invalidate_cached_user(user_id)
 
-    result = supabase.table("users").select("*").eq("id", user_id).maybe_single().execute()
-    return user_to_response(result.data)
+    updated = await users_repo.get_by_id(user_id)
+    return user_to_response(updated)
 
 
 @router.post("/admin/users/{user_id}/reset-password")
 async def admin_reset_password(user_id: str, current_user: dict = Depends(require_admin)):
-    existing = supabase.table("users").select("*").eq("id", user_id).maybe_single().execute()
-    if not existing.data:
+    existing = await users_repo.get_by_id(user_id)
+    if not existing:
         raise HTTPException(status_code=404, detail="User not found")
 
     reset_token = secrets.token_urlsafe(32)
     expires = datetime.now(timezone.utc) + timedelta(hours=24)
 
-    supabase.table("users").update({
+    await users_repo.update(user_id, {
         "password_reset_token": reset_token,
         "password_reset_expires": expires.isoformat(),
         "updated_at": datetime.now(timezone.utc).isoformat()
-    }).eq("id", user_id).execute()
+    })
+    invalidate_cached_user(user_id)
 
     return {
         "success": True,
@@ -393,7 +443,7 @@ async def auth_health(current_user: Optional[dict] = Depends(get_current_user_op
 
     provider_connected = False
     try:
-        result = supabase.table("users").select("id").limit(1).execute()
+        await users_repo.any_exist()
         provider_connected = True
     except Exception:
         pass
@@ -409,8 +459,7 @@ async def auth_health(current_user: Optional[dict] = Depends(get_current_user_op
 @router.post("/seed-admin")
 async def seed_admin():
     """Create initial admin user if no users exist. Only works when database is empty."""
-    existing = supabase.table("users").select("id").limit(1).execute()
-    if existing.data:
+    if await users_repo.any_exist():
         raise HTTPException(status_code=400, detail="Users already exist. Seed is only for initial setup.")
 
     user_id = str(uuid.uuid4())
@@ -419,7 +468,7 @@ async def seed_admin():
     admin_user = {
         "id": user_id,
         "email": "admin@illinoisestatelaw.com",
-        "password_hash": hash_password("AdminPass123!"),
+        "password_hash": await hash_password("AdminPass123!"),
         "name": "Administrator",
         "role": "admin",
         "is_active": True,
@@ -427,7 +476,7 @@ async def seed_admin():
         "updated_at": now.isoformat()
     }
 
-    supabase.table("users").insert(admin_user).execute()
+    await users_repo.insert(admin_user)
 
     return {
         "success": True,
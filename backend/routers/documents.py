@@ -3,11 +3,13 @@ Document Generation Engine
 Handles DOCX templating, PDF form filling, and Dropbox integration
 """
 
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Header
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any
 from datetime import datetime, timezone
+import io
 import os
 import re
 import json
@@ -15,14 +17,14 @@ import uuid
 import tempfile
 import shutil
 import base64
+import asyncio
+import time
 from pathlib import Path
 import logging
 
 # Document processing libraries
-from docxtpl import DocxTemplate
-from pypdf import PdfReader, PdfWriter
+from pypdf import PdfReader
 import dropbox
-from dropbox.files import WriteMode
 from dropbox.exceptions import ApiError
 
 # Slack integration
@@ -32,6 +34,29 @@ from slack_sdk.errors import SlackApiError
 import httpx
 from supabase import Client as SupabaseClient
 
+from utils.airtable import airtable_client
+from utils.bundle_cache import ClientBundle, client_bundle_cache
+from utils.blob_store import BlobStore, LocalBlobStore, create_remote_backend
+from utils.db import (
+    database, templates_repo, mapping_profiles_repo, generated_docs_repo,
+    staff_inputs_repo, approvals_repo, notifications_repo
+)
+from utils.template_catalog import template_catalog
+from utils.docx_cache import docx_template_cache
+from utils.docx_scan import docx_variable_scanner
+from utils.render_engine import render_engine
+from utils.pdf_fill import pdf_fill_engine
+from utils.pdf_convert import ConversionFailed, pdf_converter
+from utils.jobs import FINISHED_STATUSES, JobContext, job_manager
+from utils.zip_stream import ArchiveTooLarge, StreamingZip
+from utils.generated_storage import display_name, generated_storage
+from utils.preview_cache import preview_cache
+from utils.dropbox_upload import DropboxNotConfigured, dropbox_uploader
+from utils.dropbox_folders import dropbox_folder_cache
+from utils.mapping_plan import (
+    compile_mapping, compile_profile_mapping, compile_template_mapping, filename_template
+)
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/documents", tags=["Document Generation"])
@@ -41,6 +66,9 @@ security = HTTPBearer()
 TEMPLATES_DIR = Path(__file__).parent.parent / "templates_storage"
 TEMPLATES_DIR.mkdir(exist_ok=True)
 
+# Template bytes, one copy per distinct sha256 (remote backend attached at startup)
+template_blobs = BlobStore(LocalBlobStore(TEMPLATES_DIR / "blobs"))
+
 # Dropbox config
 DROPBOX_ACCESS_TOKEN = os.environ.get('DROPBOX_ACCESS_TOKEN', '')
 DROPBOX_BASE_FOLDER = os.environ.get('DROPBOX_BASE_FOLDER', '/Illinois Estate Law/Generated Documents')
@@ -96,6 +124,8 @@ class GenerateDocxRequest(BaseModel):
     custom_mapping: Optional[Dict[str, Any]] = None
     output_format: str = "DOCX"  # DOCX, PDF, BOTH
     save_to_dropbox: bool = False
+    bundle_version: Optional[str] = None
+    dry_run: bool = False  # Render in memory and report values; nothing is saved
 
 
 class FillPdfRequest(BaseModel):
@@ -105,55 +135,119 @@ class FillPdfRequest(BaseModel):
     custom_mapping: Optional[Dict[str, Any]] = None
     flatten: bool = False
     save_to_dropbox: bool = False
+    bundle_version: Optional[str] = None
+    dry_run: bool = False  # Fill in memory and report values; nothing is saved
 
 
 # ==================== HELPERS ====================
 
-def get_dropbox_client():
-    """Get authenticated Dropbox client with team member support"""
-    token = os.environ.get('DROPBOX_ACCESS_TOKEN', '')
-    team_member_id = os.environ.get('DROPBOX_TEAM_MEMBER_ID', '')
-    
-    if not token:
-        raise HTTPException(status_code=500, detail="Dropbox access token not configured")
-    
-    if team_member_id:
-        # Business team account - use team member file access
-        return dropbox.DropboxTeam(token).as_user(team_member_id)
-    else:
-        # Personal account
-        return dropbox.Dropbox(token)
-
-
 async def airtable_request(method: str, endpoint: str, data: Optional[Dict] = None) -> Dict:
     """Make request to Airtable API"""
-    url = f"{AIRTABLE_BASE_URL}/{endpoint}"
-    headers = {
-        "Authorization": f"Bearer {AIRTABLE_API_KEY}",
-        "Content-Type": "application/json"
-    }
+    if method not in ("GET", "POST", "PATCH"):
+        raise ValueError(f"Unsupported method: {method}")
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        if method == "GET":
-            response = await client.get(url, headers=headers)
-        elif method == "POST":
-            response = await client.post(url, headers=headers, json=data)
-        elif method == "PATCH":
-            response = await client.patch(url, headers=headers, json=data)
-        else:
-            raise ValueError(f"Unsupported method: {method}")
-        
-        response.raise_for_status()
-        return response.json() if response.text else {}
+    response = await airtable_client.send(method, endpoint, data)
+    response.raise_for_status()
+    return response.json() if response.text else {}
+
+
+async def fetch_linked_records(table: str, record_ids: List[str]) -> List[Dict]:
+    """Linked records of one table for a bundle; a failed table yields no records"""
+    if not record_ids:
+        return []
+    try:
+        return await airtable_client.get_records(table, record_ids)
+    except Exception as e:
+        logger.warning(f"Failed to fetch linked {table} records: {e}")
+        return []
+
+
+def stamp_current_date(bundle: ClientBundle) -> ClientBundle:
+    """Add current date info for templates"""
+    now = datetime.now()
+    bundle["currentdate"] = now.strftime("%B %d, %Y")
+    bundle["yyyy"] = now.strftime("%Y")
+    bundle["mm"] = now.strftime("%m")
+    bundle["dd"] = now.strftime("%d")
+    return bundle
+
+
+async def get_client_bundle(client_id: str, bundle_version: Optional[str] = None) -> ClientBundle:
+    """
+    Client bundle from the bundle cache, built on a miss. With bundle_version,
+    returns exactly that previously served bundle while it is retained.
+    """
+    bundle = await client_bundle_cache.get(client_id, build_client_bundle, version=bundle_version)
+    return stamp_current_date(bundle)
 
 
-async def get_client_bundle(client_id: str) -> Dict[str, Any]:
+# Linked Master List fields folded into a bundle, and the tables they link to
+LINKED_TABLES = {
+    "Judge": "Judge%20Information",
+    "Case Contacts": "Case%20Contacts",
+    "Assets & Debts": "Assets%20%26%20Debts",
+    "Dates & Deadlines": "Dates%20%26%20Deadlines"
+}
+
+
+def linked_record_ids(fields: Dict, field: str) -> List[str]:
+    ids = fields.get(field) or []
+    # Only the first judge is used
+    return ids[:1] if field == "Judge" else ids
+
+
+async def build_client_bundle(client_id: str) -> ClientBundle:
     """
     Fetch client record and all linked records from Airtable.
-    Returns a normalized dictionary suitable for templating.
-    Also includes raw Airtable field names for direct mapping.
+    Returns a normalized bundle suitable for templating, keyed by the raw
+    Airtable field names for direct mapping and by computed keys.
     """
-    bundle = {}
+    try:
+        # Get main client record from Master List
+        client_data = await airtable_request("GET", f"Master%20List/{client_id}")
+        fields = client_data.get("fields", {})
+        
+        # Fetch every linked table at once, each in chunked RECORD_ID() batches,
+        # so assembly takes as long as the slowest table
+        fetched = await asyncio.gather(*(
+            fetch_linked_records(table, linked_record_ids(fields, field)) for field, table in LINKED_TABLES.items()
+        ))
+        return assemble_client_bundle(fields, dict(zip(LINKED_TABLES, fetched)))
+    except Exception as e:
+        logger.error(f"Failed to get client bundle: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch client data: {str(e)}")
+
+
+async def build_client_bundles(client_ids: List[str]) -> Dict[str, ClientBundle]:
+    """
+    Bundles for many clients with batched reads: the Master List records in
+    chunks, then each linked table once for all clients together. Clients
+    missing from the Master List are omitted.
+    """
+    records = await airtable_client.get_records("Master%20List", client_ids)
+    wanted: Dict[str, List[str]] = {field: [] for field in LINKED_TABLES}
+    for record in records:
+        for field in LINKED_TABLES:
+            wanted[field].extend(linked_record_ids(record.get("fields", {}), field))
+    fetched = await asyncio.gather(*(
+        fetch_linked_records(table, wanted[field]) for field, table in LINKED_TABLES.items()
+    ))
+    linked_by_id = {field: {r["id"]: r for r in rows} for field, rows in zip(LINKED_TABLES, fetched)}
+    
+    bundles = {}
+    for record in records:
+        fields = record.get("fields", {})
+        linked = {
+            field: [linked_by_id[field][rid] for rid in linked_record_ids(fields, field) if rid in linked_by_id[field]]
+            for field in LINKED_TABLES
+        }
+        bundles[record["id"]] = assemble_client_bundle(fields, linked)
+    return bundles
+
+
+def assemble_client_bundle(fields: Dict, linked: Dict[str, List[Dict]]) -> ClientBundle:
+    """Build a bundle from a Master List record's fields and its linked records, by LINKED_TABLES field"""
+    bundle = ClientBundle()
     
     def normalize_value(value):
         """
@@ -176,249 +270,173 @@ async def get_client_bundle(client_id: str) -> Dict[str, Any]:
                 return ", ".join(str(v) for v in value)
         return value
     
-    try:
-        # Get main client record from Master List
-        client_data = await airtable_request("GET", f"Master%20List/{client_id}")
-        fields = client_data.get("fields", {})
-        
-        # IMPORTANT: Add ALL raw Airtable fields directly to the bundle
-        # This allows direct mapping of Airtable field names to template variables
-        for key, value in fields.items():
-            normalized = normalize_value(value)
-            # Add the raw field name as-is
-            bundle[key] = normalized
-            # Also add a lowercase version for case-insensitive matching
-            bundle[key.lower()] = normalized
-            # And a version with underscores instead of spaces
-            bundle[key.lower().replace(' ', '_').replace('-', '_')] = normalized
-        
-        # Map common client fields (computed/combined fields)
-        # Use normalize_value to handle potential arrays from linked fields
-        bundle["clientname"] = normalize_value(fields.get("Client", fields.get("Matter Name", "")))
-        bundle["mattername"] = normalize_value(fields.get("Matter Name", ""))
-        bundle["decedentname"] = normalize_value(fields.get("Decedent Name", fields.get("Matter Name", "")))
-        bundle["casenumber"] = normalize_value(fields.get("Case Number", ""))
-        # Calendar might be from a linked field
-        bundle["calendar"] = normalize_value(fields.get("Calendar", fields.get("Calendar (from Judge Information 2)", "")))
-        bundle["clientprobaterole"] = normalize_value(fields.get("Client Probate Role", ""))
-        bundle["clientstreetaddress"] = normalize_value(fields.get("Street Address", fields.get("Client Street Address", "")))
-        bundle["clientcity"] = normalize_value(fields.get("City", ""))
-        bundle["clientstate"] = normalize_value(fields.get("State", ""))
-        bundle["clientzip"] = normalize_value(fields.get("Zip Code", ""))
-        bundle["clientcitystatezip"] = f"{normalize_value(fields.get('City', ''))}, {normalize_value(fields.get('State', ''))} {normalize_value(fields.get('Zip Code', ''))}".strip(", ")
-        bundle["clientemail"] = normalize_value(fields.get("Email Address", ""))
-        bundle["clientphone"] = normalize_value(fields.get("Phone Number", ""))
-        
-        # Decedent info
-        bundle["decedentstreetaddress"] = normalize_value(fields.get("Decedent Street Address", ""))
-        bundle["decedentcity"] = normalize_value(fields.get("Decedent City", ""))
-        bundle["decedentstate"] = normalize_value(fields.get("Decedent State", ""))
-        bundle["decedentzip"] = normalize_value(fields.get("Decedent Zip", ""))
-        bundle["decedentcitystatezip"] = f"{normalize_value(fields.get('Decedent City', ''))}, {normalize_value(fields.get('Decedent State', ''))} {normalize_value(fields.get('Decedent Zip', ''))}".strip(", ")
-        bundle["decedentdod"] = normalize_value(fields.get("Date of Death", ""))
-        bundle["decedentdob"] = normalize_value(fields.get("Decedent DOB", fields.get("Date of Birth", "")))
-        
-        # Case type and status
-        bundle["casetype"] = normalize_value(fields.get("Type of Case", ""))
-        bundle["casestatus"] = normalize_value(fields.get("Active/Inactive", ""))
-        bundle["datepaid"] = normalize_value(fields.get("Date Paid", ""))
-        
-        # Get linked Judge Information
-        judge_ids = fields.get("Judge", [])
-        if judge_ids:
-            try:
-                judge_data = await airtable_request("GET", f"Judge%20Information/{judge_ids[0]}")
-                judge_fields = judge_data.get("fields", {})
-                bundle["judge"] = judge_fields.get("Judge Name", "")
-                bundle["judgeemail"] = judge_fields.get("Email", "")
-                bundle["courtroom"] = judge_fields.get("Courtroom", "")
-                bundle["courthouse"] = judge_fields.get("Courthouse", "")
-            except Exception as e:
-                logger.warning(f"Failed to fetch judge: {e}")
-                bundle["judge"] = ""
-        
-        # Get linked Case Contacts and categorize them
-        contact_ids = fields.get("Case Contacts", [])
-        contacts = []
-        executors = []
-        guardians = []
-        caretakers = []
-        trustees = []
-        beneficiaries = []
-        hpoa_list = []
-        fpoa_list = []
-        
-        for contact_id in contact_ids:
-            try:
-                contact_data = await airtable_request("GET", f"Case%20Contacts/{contact_id}")
-                contact_fields = contact_data.get("fields", {})
-                contact_info = {
-                    "name": contact_fields.get("Name", ""),
-                    "type": contact_fields.get("Type", ""),
-                    "email": contact_fields.get("Email", ""),
-                    "phone": contact_fields.get("Phone", ""),
-                    "address": contact_fields.get("Street Address", ""),
-                    "city": contact_fields.get("City", ""),
-                    "state": contact_fields.get("State", ""),
-                    "zip": contact_fields.get("Zip Code", ""),
-                    "relationship": contact_fields.get("Relationship to Decedent", "")
-                }
-                contacts.append(contact_info)
-                
-                # Categorize by type
-                contact_type = (contact_fields.get("Type", "") or "").lower()
-                if "executor" in contact_type or "personal representative" in contact_type:
-                    executors.append(contact_info)
-                elif "guardian" in contact_type:
-                    guardians.append(contact_info)
-                elif "caretaker" in contact_type:
-                    caretakers.append(contact_info)
-                elif "trustee" in contact_type:
-                    trustees.append(contact_info)
-                elif "beneficiary" in contact_type or "heir" in contact_type:
-                    beneficiaries.append(contact_info)
-                elif "hpoa" in contact_type or "health" in contact_type:
-                    hpoa_list.append(contact_info)
-                elif "fpoa" in contact_type or "financial" in contact_type:
-                    fpoa_list.append(contact_info)
-            except Exception as e:
-                logger.warning(f"Failed to fetch contact {contact_id}: {e}")
-        
-        bundle["contacts"] = contacts
-        bundle["executors"] = executors
-        bundle["guardians"] = guardians
-        bundle["caretakers"] = caretakers
-        bundle["trustees"] = trustees
-        bundle["beneficiaries"] = beneficiaries
-        bundle["hpoa"] = hpoa_list
-        bundle["fpoa"] = fpoa_list
-        
-        # Single values for first items (common in templates)
-        bundle["executor"] = executors[0]["name"] if executors else ""
-        bundle["guardian"] = guardians[0]["name"] if guardians else ""
-        bundle["caretaker"] = caretakers[0]["name"] if caretakers else ""
-        bundle["trustee"] = trustees[0]["name"] if trustees else ""
-        bundle["beneficiary"] = beneficiaries[0]["name"] if beneficiaries else ""
-        
-        # Get Assets & Debts
-        asset_ids = fields.get("Assets & Debts", [])
-        assets = []
-        debts = []
-        for asset_id in asset_ids:
-            try:
-                asset_data = await airtable_request("GET", f"Assets%20%26%20Debts/{asset_id}")
-                asset_fields = asset_data.get("fields", {})
-                asset_info = {
-                    "name": asset_fields.get("Asset/Debt Name", ""),
-                    "type": asset_fields.get("Type", ""),
-                    "value": asset_fields.get("Value", ""),
-                    "description": asset_fields.get("Description", ""),
-                    "account_number": asset_fields.get("Account Number", "")
-                }
-                if asset_fields.get("Asset or Debt", "").lower() == "asset":
-                    assets.append(asset_info)
-                else:
-                    debts.append(asset_info)
-            except Exception as e:
-                logger.warning(f"Failed to fetch asset {asset_id}: {e}")
-        
-        bundle["assets"] = assets
-        bundle["debts"] = debts
-        
-        # Get Dates & Deadlines
-        deadline_ids = fields.get("Dates & Deadlines", [])
-        deadlines = []
-        for deadline_id in deadline_ids:
-            try:
-                deadline_data = await airtable_request("GET", f"Dates%20%26%20Deadlines/{deadline_id}")
-                deadline_fields = deadline_data.get("fields", {})
-                deadlines.append({
-                    "event": deadline_fields.get("Event", ""),
-                    "date": deadline_fields.get("Date", ""),
-                    "notes": deadline_fields.get("Notes", "")
-                })
-            except Exception as e:
-                logger.warning(f"Failed to fetch deadline {deadline_id}: {e}")
-        
-        bundle["deadlines"] = deadlines
-        
-        # Add current date info for templates
-        now = datetime.now()
-        bundle["currentdate"] = now.strftime("%B %d, %Y")
-        bundle["yyyy"] = now.strftime("%Y")
-        bundle["mm"] = now.strftime("%m")
-        bundle["dd"] = now.strftime("%d")
-        
-        # Store raw fields for custom mappings
-        bundle["_raw_fields"] = fields
-        
-    except Exception as e:
-        logger.error(f"Failed to get client bundle: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to fetch client data: {str(e)}")
+    # IMPORTANT: Add ALL raw Airtable fields directly to the bundle
+    # This allows direct mapping of Airtable field names to template variables.
+    # Each value is stored once; lower-cased and underscored names resolve
+    # through the bundle's key index
+    for key, value in fields.items():
+        bundle[key] = normalize_value(value)
+    
+    # Map common client fields (computed/combined fields)
+    # Use normalize_value to handle potential arrays from linked fields
+    bundle["clientname"] = normalize_value(fields.get("Client", fields.get("Matter Name", "")))
+    bundle["mattername"] = normalize_value(fields.get("Matter Name", ""))
+    bundle["decedentname"] = normalize_value(fields.get("Decedent Name", fields.get("Matter Name", "")))
+    bundle["casenumber"] = normalize_value(fields.get("Case Number", ""))
+    # Calendar might be from a linked field
+    bundle["calendar"] = normalize_value(fields.get("Calendar", fields.get("Calendar (from Judge Information 2)", "")))
+    bundle["clientprobaterole"] = normalize_value(fields.get("Client Probate Role", ""))
+    bundle["clientstreetaddress"] = normalize_value(fields.get("Street Address", fields.get("Client Street Address", "")))
+    bundle["clientcity"] = normalize_value(fields.get("City", ""))
+    bundle["clientstate"] = normalize_value(fields.get("State", ""))
+    bundle["clientzip"] = normalize_value(fields.get("Zip Code", ""))
+    bundle["clientcitystatezip"] = f"{normalize_value(fields.get('City', ''))}, {normalize_value(fields.get('State', ''))} {normalize_value(fields.get('Zip Code', ''))}".strip(", ")
+    bundle["clientemail"] = normalize_value(fields.get("Email Address", ""))
+    bundle["clientphone"] = normalize_value(fields.get("Phone Number", ""))
+    
+    # Decedent info
+    bundle["decedentstreetaddress"] = normalize_value(fields.get("Decedent Street Address", ""))
+    bundle["decedentcity"] = normalize_value(fields.get("Decedent City", ""))
+    bundle["decedentstate"] = normalize_value(fields.get("Decedent State", ""))
+    bundle["decedentzip"] = normalize_value(fields.get("Decedent Zip", ""))
+    bundle["decedentcitystatezip"] = f"{normalize_value(fields.get('Decedent City', ''))}, {normalize_value(fields.get('Decedent State', ''))} {normalize_value(fields.get('Decedent Zip', ''))}".strip(", ")
+    bundle["decedentdod"] = normalize_value(fields.get("Date of Death", ""))
+    bundle["decedentdob"] = normalize_value(fields.get("Decedent DOB", fields.get("Date of Birth", "")))
+    
+    # Case type and status
+    bundle["casetype"] = normalize_value(fields.get("Type of Case", ""))
+    bundle["casestatus"] = normalize_value(fields.get("Active/Inactive", ""))
+    bundle["datepaid"] = normalize_value(fields.get("Date Paid", ""))
+    
+    judge_ids = fields.get("Judge", [])
+    judge_records = linked["Judge"]
+    contact_records = linked["Case Contacts"]
+    asset_records = linked["Assets & Debts"]
+    deadline_records = linked["Dates & Deadlines"]
+    
+    # Linked Judge Information
+    if judge_ids:
+        judge_fields = judge_records[0].get("fields", {}) if judge_records else {}
+        bundle["judge"] = judge_fields.get("Judge Name", "")
+        bundle["judgeemail"] = judge_fields.get("Email", "")
+        bundle["courtroom"] = judge_fields.get("Courtroom", "")
+        bundle["courthouse"] = judge_fields.get("Courthouse", "")
+    
+    # Categorize Case Contacts
+    contacts = []
+    executors = []
+    guardians = []
+    caretakers = []
+    trustees = []
+    beneficiaries = []
+    hpoa_list = []
+    fpoa_list = []
+    
+    for contact_data in contact_records:
+        try:
+            contact_fields = contact_data.get("fields", {})
+            contact_info = {
+                "name": contact_fields.get("Name", ""),
+                "type": contact_fields.get("Type", ""),
+                "email": contact_fields.get("Email", ""),
+                "phone": contact_fields.get("Phone", ""),
+                "address": contact_fields.get("Street Address", ""),
+                "city": contact_fields.get("City", ""),
+                "state": contact_fields.get("State", ""),
+                "zip": contact_fields.get("Zip Code", ""),
+                "relationship": contact_fields.get("Relationship to Decedent", "")
+            }
+            contacts.append(contact_info)
+            
+            # Categorize by type
+            contact_type = (contact_fields.get("Type", "") or "").lower()
+            if "executor" in contact_type or "personal representative" in contact_type:
+                executors.append(contact_info)
+            elif "guardian" in contact_type:
+                guardians.append(contact_info)
+            elif "caretaker" in contact_type:
+                caretakers.append(contact_info)
+            elif "trustee" in contact_type:
+                trustees.append(contact_info)
+            elif "beneficiary" in contact_type or "heir" in contact_type:
+                beneficiaries.append(contact_info)
+            elif "hpoa" in contact_type or "health" in contact_type:
+                hpoa_list.append(contact_info)
+            elif "fpoa" in contact_type or "financial" in contact_type:
+                fpoa_list.append(contact_info)
+        except Exception as e:
+            logger.warning(f"Failed to read contact {contact_data.get('id')}: {e}")
+    
+    bundle["contacts"] = contacts
+    bundle["executors"] = executors
+    bundle["guardians"] = guardians
+    bundle["caretakers"] = caretakers
+    bundle["trustees"] = trustees
+    bundle["beneficiaries"] = beneficiaries
+    bundle["hpoa"] = hpoa_list
+    bundle["fpoa"] = fpoa_list
+    
+    # Single values for first items (common in templates)
+    bundle["executor"] = executors[0]["name"] if executors else ""
+    bundle["guardian"] = guardians[0]["name"] if guardians else ""
+    bundle["caretaker"] = caretakers[0]["name"] if caretakers else ""
+    bundle["trustee"] = trustees[0]["name"] if trustees else ""
+    bundle["beneficiary"] = beneficiaries[0]["name"] if beneficiaries else ""
+    
+    # Assets & Debts
+    assets = []
+    debts = []
+    for asset_data in asset_records:
+        try:
+            asset_fields = asset_data.get("fields", {})
+            asset_info = {
+                "name": asset_fields.get("Asset/Debt Name", ""),
+                "type": asset_fields.get("Type", ""),
+                "value": asset_fields.get("Value", ""),
+                "description": asset_fields.get("Description", ""),
+                "account_number": asset_fields.get("Account Number", "")
+            }
+            if asset_fields.get("Asset or Debt", "").lower() == "asset":
+                assets.append(asset_info)
+            else:
+                debts.append(asset_info)
+        except Exception as e:
+            logger.warning(f"Failed to read asset {asset_data.get('id')}: {e}")
     
+    bundle["assets"] = assets
+    bundle["debts"] = debts
+    
+    # Dates & Deadlines
+    deadlines = []
+    for deadline_data in deadline_records:
+        try:
+            deadline_fields = deadline_data.get("fields", {})
+            deadlines.append({
+                "event": deadline_fields.get("Event", ""),
+                "date": deadline_fields.get("Date", ""),
+                "notes": deadline_fields.get("Notes", "")
+            })
+        except Exception as e:
+            logger.warning(f"Failed to read deadline {deadline_data.get('id')}: {e}")
+    
+    bundle["deadlines"] = deadlines
+    
+    stamp_current_date(bundle)
+
     return bundle
 
 
-def detect_docx_variables(file_path: str) -> Dict[str, Any]:
+def detect_docx_variables(file_path: str, content_hash: Optional[str] = None, content: Optional[bytes] = None) -> Dict[str, Any]:
     """
-    Detect variables in a DOCX template.
+    Detect variables in a DOCX template's body, headers and footers.
     Variables use single curly braces: {variablename}
     Repeat blocks use: {#items} ... {/items}
+    Blocking; call it off the event loop.
     """
     try:
-        doc = DocxTemplate(file_path)
-        
-        # Make sure document is properly loaded
-        if doc.docx is None:
-            # Try loading with python-docx directly to extract text
-            from docx import Document
-            raw_doc = Document(file_path)
-            text_content = ""
-            for para in raw_doc.paragraphs:
-                text_content += para.text + "\n"
-            for table in raw_doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        text_content += cell.text + "\n"
-            
-            # Find variables in text content
-            simple_vars = set(re.findall(r'\{([a-zA-Z_][a-zA-Z0-9_\.]*)\}', text_content))
-            simple_vars = {v for v in simple_vars if not v.startswith('#') and not v.startswith('/')}
-            
-            return {
-                "variables": sorted(list(simple_vars)),
-                "repeat_blocks": [],
-                "nested_variables": [],
-                "all_detected": sorted(list(simple_vars))
-            }
-        
-        # Get the full XML content
-        xml_content = doc.get_xml()
-        
-        # Find all single-curly-brace variables: {var}
-        # Exclude Jinja2 style {{ }} and loop markers {# /}
-        simple_vars = set(re.findall(r'\{([a-zA-Z_][a-zA-Z0-9_\.]*)\}', xml_content))
-        
-        # Find repeat block markers: {#blockname} and {/blockname}
-        repeat_starts = set(re.findall(r'\{#([a-zA-Z_][a-zA-Z0-9_]*)\}', xml_content))
-        repeat_ends = set(re.findall(r'\{/([a-zA-Z_][a-zA-Z0-9_]*)\}', xml_content))
-        
-        # Repeat blocks are those that have both start and end markers
-        repeat_blocks = repeat_starts & repeat_ends
-        
-        # Filter out repeat block markers from simple vars
-        simple_vars = {v for v in simple_vars if not v.startswith('#') and not v.startswith('/')}
-        
-        # Find variables inside repeat blocks (e.g., {items.name})
-        nested_vars = {v for v in simple_vars if '.' in v}
-        top_level_vars = simple_vars - nested_vars
-        
-        return {
-            "variables": sorted(list(top_level_vars)),
-            "repeat_blocks": sorted(list(repeat_blocks)),
-            "nested_variables": sorted(list(nested_vars)),
-            "all_detected": sorted(list(simple_vars))
-        }
+        if content is not None:
+            return docx_variable_scanner.scan_bytes(content, content_hash)
+        return docx_variable_scanner.scan_file(file_path, content_hash)
     except Exception as e:
         logger.error(f"Failed to detect DOCX variables: {e}")
         # Return empty result on error
@@ -477,73 +495,130 @@ def convert_template_syntax(content: str, data: Dict) -> str:
     return content
 
 
-def render_docx_template(template_path: str, data: Dict, output_path: str) -> str:
+def render_docx_template(template_path: str, data: Dict, output_path: str, content_hash: Optional[str] = None) -> str:
     """
     Render a DOCX template with the provided data.
-    Converts {var} syntax to Jinja2 and renders.
+    The parsed, patched and compiled template is reused from the template cache.
     """
-    # Read template
-    doc = DocxTemplate(template_path)
-    
-    # Get XML and convert syntax
-    # docxtpl expects {{ var }} syntax, so we need to preprocess
-    
-    # Create a modified template with converted syntax
-    # For now, we'll create a context that works with both syntaxes
-    
-    # Render with data
-    doc.render(data)
-    
-    # Save output
-    doc.save(output_path)
+    docx_template_cache.render(template_path, data, output_path, content_hash)
     
     return output_path
 
 
-def fill_pdf_form(template_path: str, data: Dict, output_path: str, flatten: bool = False) -> str:
-    """Fill a PDF form with the provided data"""
-    reader = PdfReader(template_path)
-    writer = PdfWriter()
-    
-    # Copy pages and fill form
-    writer.append(reader)
-    
-    # Update form fields
-    writer.update_page_form_field_values(
-        writer.pages[0],
-        data,
-        auto_regenerate=True
+async def render_docx(template: Dict, render_data: Dict, output_path: str) -> str:
+    """Render a DOCX template on the render engine's worker processes"""
+    render_engine.remember_template(template["file_path"], template.get("content_hash"))
+    return await render_engine.run(
+        render_docx_template, template["file_path"], render_data, output_path, template.get("content_hash")
     )
-    
-    # Write output
-    with open(output_path, 'wb') as output_file:
-        writer.write(output_file)
+
+
+def render_docx_bytes(template_path: str, data: Dict, content_hash: Optional[str] = None) -> bytes:
+    """Render a DOCX template into memory"""
+    buffer = io.BytesIO()
+    docx_template_cache.render(template_path, data, buffer, content_hash)
+    return buffer.getvalue()
+
+
+async def convert_to_pdf(docx_path: str, result: Dict) -> Optional[str]:
+    """Convert a generated DOCX to a PDF beside it, noting the outcome on result"""
+    if not pdf_converter.available:
+        result["pdf_available"] = False
+        result["pdf_message"] = "PDF conversion requires LibreOffice (not available in this environment)"
+        return None
+    pdf_path = os.path.splitext(docx_path)[0] + ".pdf"
+    try:
+        await pdf_converter.convert(docx_path, pdf_path)
+    except ConversionFailed as e:
+        result["pdf_available"] = False
+        result["pdf_message"] = str(e)
+        return None
+    result["pdf_available"] = True
+    result["pdf_path"] = pdf_path
+    result["pdf_filename"] = display_name(pdf_path)
+    return pdf_path
+
+
+def wants_pdf(output_format: Optional[str]) -> bool:
+    return (output_format or "DOCX").upper() in ("PDF", "BOTH")
+
+
+def fill_pdf_form(
+    template_path: str,
+    data: Dict,
+    output_path: str,
+    flatten: bool = False,
+    content_hash: Optional[str] = None
+) -> str:
+    """
+    Fill a PDF form with the provided data, on every page that has the fields.
+    The parsed template and its field-to-page index come from the fill engine's cache.
+    """
+    pdf_fill_engine.fill(template_path, data, output_path, flatten, content_hash)
     
     return output_path
 
 
+def fill_pdf_form_bytes(template_path: str, data: Dict, flatten: bool = False, content_hash: Optional[str] = None) -> bytes:
+    """Fill a PDF form into memory"""
+    buffer = io.BytesIO()
+    pdf_fill_engine.fill(template_path, data, buffer, flatten, content_hash)
+    return buffer.getvalue()
+
+
+def pdf_values_for(template: Dict, render_data: Dict) -> Dict[str, str]:
+    """Values for the template's detected PDF fields that render_data has"""
+    return {
+        field["name"]: str(render_data[field["name"]])
+        for field in template.get("detected_pdf_fields", [])
+        if field.get("name") in render_data
+    }
+
+
+async def dry_run_document(template: Dict, values: Dict, unresolved: List[str], base_filename: str) -> Dict:
+    """
+    Render a template in memory and report what generating it would produce:
+    the value of each template variable, those left empty, mappings whose
+    source isn't in the client bundle, and a text preview. Nothing is written
+    to disk, uploaded to Dropbox or recorded in generated_docs.
+    """
+    if template["type"] == "DOCX":
+        render_engine.remember_template(template["file_path"], template.get("content_hash"))
+        content = await render_engine.run(render_docx_bytes, template["file_path"], values, template.get("content_hash"))
+        detected = await asyncio.to_thread(
+            docx_variable_scanner.scan_file, template["file_path"], template.get("content_hash")
+        )
+        names = detected["variables"] + detected["repeat_blocks"]
+        file_type = "docx"
+    else:
+        # Flattened so the filled values show up in the text preview
+        content = await render_engine.run(
+            fill_pdf_form_bytes, template["file_path"], values, True, template.get("content_hash")
+        )
+        names = [field["name"] for field in template.get("detected_pdf_fields", []) if field.get("name")]
+        file_type = "pdf"
+    preview = await asyncio.to_thread(preview_cache.preview_bytes, content, file_type)
+    return {
+        "success": True,
+        "dry_run": True,
+        "template_id": template.get("id"),
+        "template_name": template["name"],
+        "file_type": file_type,
+        "filename": f"{base_filename}.{file_type}",
+        "size_bytes": len(content),
+        "variables": {name: values.get(name) for name in names},
+        "missing_variables": [name for name in names if values.get(name) in (None, "", [])],
+        "unresolved_mappings": unresolved,
+        "preview": preview
+    }
+
+
 async def upload_to_dropbox(local_path: str, dropbox_path: str) -> str:
-    """Upload a file to Dropbox"""
+    """Upload a file to Dropbox, off the event loop on the shared client"""
     try:
-        dbx = get_dropbox_client()
-        
-        with open(local_path, 'rb') as f:
-            file_data = f.read()
-        
-        # Ensure path starts with /
-        if not dropbox_path.startswith('/'):
-            dropbox_path = '/' + dropbox_path
-        
-        # Upload file
-        result = dbx.files_upload(
-            file_data,
-            dropbox_path,
-            mode=WriteMode.overwrite
-        )
-        
-        logger.info(f"Uploaded to Dropbox: {result.path_display}")
-        return result.path_display
-        
+        return await dropbox_uploader.upload(local_path, dropbox_path)
+    except DropboxNotConfigured as e:
+        raise HTTPException(status_code=500, detail=str(e))
     except ApiError as e:
         logger.error(f"Dropbox upload failed: {e}")
         raise HTTPException(status_code=500, detail=f"Dropbox upload failed: {str(e)}")
@@ -551,45 +626,53 @@ async def upload_to_dropbox(local_path: str, dropbox_path: str) -> str:
 
 def generate_output_filename(pattern: str, data: Dict, template_name: str) -> str:
     """Generate filename from pattern using data"""
-    filename = pattern
-    
-    # Replace template name
-    filename = filename.replace("{templateName}", template_name)
-    filename = filename.replace("{templatename}", template_name)
-    
-    # Replace date tokens
-    now = datetime.now()
-    filename = filename.replace("{yyyy}", now.strftime("%Y"))
-    filename = filename.replace("{mm}", now.strftime("%m"))
-    filename = filename.replace("{dd}", now.strftime("%d"))
-    
-    # Replace data tokens
-    for key, value in data.items():
-        if isinstance(value, str):
-            filename = filename.replace(f"{{{key}}}", value)
-    
-    # Clean filename
-    filename = re.sub(r'[<>:"/\\|?*]', '', filename)
-    
-    return filename
+    return filename_template(pattern).render(data, template_name)
 
 
 # ==================== DATABASE HELPERS ====================
 
-def save_template_sync(sb: SupabaseClient, template_data: Dict) -> str:
+async def save_template(template_data: Dict) -> str:
     template_data["id"] = str(uuid.uuid4())
     template_data["created_at"] = datetime.now(timezone.utc).isoformat()
     template_data["updated_at"] = datetime.now(timezone.utc).isoformat()
-    sb.table("doc_templates").insert(template_data).execute()
+    await templates_repo.insert(template_data)
+    template_catalog.upsert(template_data)
     return template_data["id"]
 
 
-def get_template_sync(sb: SupabaseClient, template_id: str) -> Optional[Dict]:
-    result = sb.table("doc_templates").select("*").eq("id", template_id).maybe_single().execute()
-    return result.data
+async def get_template(template_id: str) -> Optional[Dict]:
+    return await template_catalog.get(template_id)
+
 
+async def update_template(template_id: str, updates: Dict) -> None:
+    await templates_repo.update(template_id, updates)
+    template_catalog.apply_updates(template_id, updates)
 
-def ensure_template_file_exists_sync(sb: SupabaseClient, template: Dict) -> str:
+
+def template_suffix(template_type: Optional[str]) -> str:
+    return '.docx' if template_type == "DOCX" else '.pdf'
+
+
+async def store_template_blob(template_id: str, content: bytes, template_type: Optional[str]) -> Dict:
+    """Put template bytes in the blob store and point the row at them.
+
+    The legacy base64 copy is only dropped once a remote backend holds the
+    blob, so templates still survive a redeploy on an ephemeral disk.
+    """
+    suffix = template_suffix(template_type)
+    content_hash = await asyncio.to_thread(template_blobs.put, content, suffix)
+    updates = {
+        "file_path": str(template_blobs.local.path_for(content_hash, suffix)),
+        "content_hash": content_hash,
+        "file_size": len(content)
+    }
+    if template_blobs.remote is not None:
+        updates["file_content"] = None
+    await update_template(template_id, updates)
+    return updates
+
+
+async def ensure_template_file_exists(template: Dict) -> str:
     file_path = template.get("file_path", "")
     template_id = template.get("id")
     template_name = template.get("name", "Unknown")
@@ -597,7 +680,17 @@ def ensure_template_file_exists_sync(sb: SupabaseClient, template: Dict) -> str:
     if file_path and os.path.exists(file_path):
         return file_path
 
-    file_content_base64 = template.get("file_content")
+    content_hash = template.get("content_hash")
+    if content_hash:
+        blob_path = await asyncio.to_thread(template_blobs.local_path, content_hash, template_suffix(template.get("type")))
+        if blob_path:
+            file_path = str(blob_path)
+            if file_path != template.get("file_path"):
+                await update_template(template_id, {"file_path": file_path})
+            return file_path
+
+    # Templates uploaded before the blob store keep a base64 copy in the row
+    file_content_base64 = template.get("file_content") or await templates_repo.get_legacy_content(template_id)
     if not file_content_base64:
         raise HTTPException(
             status_code=500,
@@ -606,16 +699,9 @@ def ensure_template_file_exists_sync(sb: SupabaseClient, template: Dict) -> str:
 
     try:
         file_content = base64.b64decode(file_content_base64)
-        file_ext = '.docx' if template.get("type") == "DOCX" else '.pdf'
-        if not file_path:
-            file_id = str(uuid.uuid4())
-            file_path = str(TEMPLATES_DIR / f"{file_id}{file_ext}")
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, 'wb') as f:
-            f.write(file_content)
-        if file_path != template.get("file_path"):
-            sb.table("doc_templates").update({"file_path": file_path}).eq("id", template_id).execute()
-        return file_path
+        updates = await store_template_blob(template_id, file_content, template.get("type"))
+        template.update({k: v for k, v in updates.items() if k != "file_content"})
+        return updates["file_path"]
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -623,70 +709,458 @@ def ensure_template_file_exists_sync(sb: SupabaseClient, template: Dict) -> str:
         )
 
 
-def list_templates_sync(sb: SupabaseClient, template_type: Optional[str] = None) -> List[Dict]:
-    q = sb.table("doc_templates").select("*")
-    if template_type:
-        q = q.eq("type", template_type)
-    result = q.execute()
-    return result.data or []
+async def list_templates(template_type: Optional[str] = None) -> List[Dict]:
+    return await template_catalog.search(template_type=template_type)
 
 
-def save_mapping_profile_sync(sb: SupabaseClient, profile_data: Dict) -> str:
+async def save_mapping_profile(profile_data: Dict) -> str:
     profile_data["id"] = str(uuid.uuid4())
     profile_data["created_at"] = datetime.now(timezone.utc).isoformat()
     profile_data["updated_at"] = datetime.now(timezone.utc).isoformat()
-    sb.table("doc_mapping_profiles").insert(profile_data).execute()
+    await mapping_profiles_repo.insert(profile_data)
     return profile_data["id"]
 
 
-def get_mapping_profile_sync(sb: SupabaseClient, profile_id: str) -> Optional[Dict]:
-    result = sb.table("doc_mapping_profiles").select("*").eq("id", profile_id).maybe_single().execute()
-    return result.data
+async def get_mapping_profile(profile_id: str) -> Optional[Dict]:
+    return await mapping_profiles_repo.get(profile_id)
+
 
+async def list_mapping_profiles(template_id: Optional[str] = None) -> List[Dict]:
+    return await mapping_profiles_repo.list(template_id)
 
-def list_mapping_profiles_sync(sb: SupabaseClient, template_id: Optional[str] = None) -> List[Dict]:
-    q = sb.table("doc_mapping_profiles").select("*")
-    if template_id:
-        q = q.eq("template_id", template_id)
-    result = q.execute()
-    return result.data or []
 
+async def load_batch_profiles(template_ids: List[str], profile_mappings: Dict[str, str]) -> Dict[str, Dict]:
+    """Mapping profile for each template, keyed by template id.
 
-def save_generated_doc_sync(sb: SupabaseClient, doc_data: Dict) -> str:
+    Uses the profile chosen in profile_mappings, otherwise the template's
+    newest profile. Two queries in total, however many templates.
+    """
+    chosen = {
+        tid: profile_mappings[tid] for tid in template_ids
+        if profile_mappings.get(tid) and profile_mappings[tid] != '__DEFAULT__'
+    }
+    profiles_by_id, latest = await asyncio.gather(
+        mapping_profiles_repo.get_many(list(set(chosen.values()))),
+        mapping_profiles_repo.latest_for_templates([tid for tid in template_ids if tid not in chosen])
+    )
+    for tid, profile_id in chosen.items():
+        if profile_id in profiles_by_id:
+            latest[tid] = profiles_by_id[profile_id]
+    return latest
+
+
+async def save_generated_doc(doc_data: Dict) -> str:
     if "id" not in doc_data:
         doc_data["id"] = str(uuid.uuid4())
     if "created_at" not in doc_data:
         doc_data["created_at"] = datetime.now(timezone.utc).isoformat()
-    sb.table("generated_docs").insert(doc_data).execute()
+    await generated_docs_repo.insert(doc_data)
+    for column in ("docx_path", "pdf_path", "file_path"):
+        await generated_storage.register(doc_data.get(column), doc_data["id"], column)
+    # Previews show the PDF when there is one
+    preview_cache.warm(doc_data.get("pdf_path") or doc_data.get("docx_path"))
     return doc_data["id"]
 
 
-def list_generated_docs_sync(sb: SupabaseClient, client_id: Optional[str] = None) -> List[Dict]:
-    q = sb.table("generated_docs").select("*").order("created_at", desc=True)
-    if client_id:
-        q = q.eq("client_id", client_id)
-    result = q.limit(100).execute()
-    return result.data or []
+async def list_generated_docs(client_id: Optional[str] = None) -> List[Dict]:
+    return await generated_docs_repo.list(client_id)
 
 
-def get_client_staff_inputs_sync(sb: SupabaseClient, client_id: str) -> Dict:
-    result = sb.table("client_staff_inputs").select("*").eq("client_id", client_id).maybe_single().execute()
-    return result.data.get("inputs", {}) if result.data else {}
+async def get_client_staff_inputs(client_id: str) -> Dict:
+    row = await staff_inputs_repo.get(client_id)
+    return row.get("inputs", {}) if row else {}
 
 
-def save_client_staff_inputs_sync(sb: SupabaseClient, client_id: str, inputs: Dict) -> None:
-    sb.table("client_staff_inputs").upsert({
+async def save_client_staff_inputs(client_id: str, inputs: Dict) -> None:
+    await staff_inputs_repo.upsert({
         "client_id": client_id,
         "inputs": inputs,
         "updated_at": datetime.now(timezone.utc).isoformat()
-    }, on_conflict="client_id").execute()
+    })
 
 
 # ==================== API ENDPOINTS ====================
 
+async def generate_batch(
+    request: Dict[str, Any],
+    job: Optional[JobContext] = None,
+    client_bundle: Optional[ClientBundle] = None,
+    templates_by_id: Optional[Dict[str, Dict]] = None,
+    profiles_by_template: Optional[Dict[str, Dict]] = None
+) -> Dict:
+    """
+    Generate multiple documents at once for a single client.
+    Accepts a list of template_ids and consolidated staff inputs.
+    Returns separate files for each template. When run as a job, progress
+    is reported on it and templates an interrupted run finished are skipped.
+    Callers generating for many clients pass the bundle, templates and
+    profiles they already loaded.
+    """
+    client_id = request.get("client_id")
+    template_ids = request.get("template_ids", [])
+    profile_mappings = request.get("profile_mappings", {})  # {template_id: profile_id}
+    staff_inputs = request.get("staff_inputs", {})
+    save_to_dropbox = request.get("save_to_dropbox", False)
+    save_inputs = request.get("save_inputs", True)
+    dry_run = request.get("dry_run", False)
+    bundle_version = request.get("bundle_version")
+    output_pdf = wants_pdf(request.get("output_format"))
+    
+    # Log incoming request for debugging
+    logger.info(f"[GENERATE-BATCH] Received request - client_id: {client_id}, template_ids: {template_ids}")
+    
+    if not client_id:
+        raise HTTPException(status_code=400, detail="client_id is required")
+    if not template_ids or len(template_ids) == 0:
+        raise HTTPException(status_code=400, detail="At least one template_id is required")
+    
+    async def report(stage: str, **data):
+        if job:
+            await job.progress(stage, **data)
+    
+    if job:
+        await job.set_total(len(template_ids))
+    await report("bundle", client_id=client_id)
+    
+    # Get client data once (reused for all templates), pinned to the
+    # version the user previewed when one is given
+    if client_bundle is None:
+        client_bundle = await get_client_bundle(client_id, bundle_version)
+    
+    # Save staff inputs for future use if requested
+    if save_inputs and staff_inputs and not dry_run:
+        existing_inputs = await get_client_staff_inputs(client_id)
+        merged_inputs = {**existing_inputs, **staff_inputs}
+        await save_client_staff_inputs(client_id, merged_inputs)
+    
+    results = []
+    errors = []
+    
+    # Resolve every template and its fallback profile up front, so the
+    # number of round trips doesn't grow with the batch
+    if templates_by_id is None:
+        templates_by_id = await template_catalog.get_many(template_ids)
+    if profiles_by_template is None:
+        profiles_by_template = await load_batch_profiles(list(templates_by_id), profile_mappings)
+    
+    async def generate_one(template_id: str, uploads):
+        """Render, upload and record one template; returns (result, error)"""
+        try:
+            # Get template
+            template = templates_by_id.get(template_id)
+            if not template:
+                logger.error(f"[GENERATE] Template not found in DB: {template_id}")
+                return None, {"template_id": template_id, "error": "Template not found in database. It may have been deleted."}
+    
+            # Ensure template file exists (restore from Supabase if needed)
+            try:
+                template_file_path = await ensure_template_file_exists(template)
+                logger.info(f"[GENERATE] Template '{template.get('name')}' file ready at: {template_file_path}")
+                # Update template dict with confirmed file path
+                template["file_path"] = template_file_path
+            except HTTPException as e:
+                logger.error(f"[GENERATE] Failed to ensure template file: {e.detail}")
+                return None, {
+                    "template_id": template_id, 
+                    "error": e.detail
+                }
+    
+            # Get mapping - first try from template directly, then fall back to profiles
+            plan = compile_mapping(None)
+            output_rules = {}
+            dropbox_rules = {}
+            used_profile_id = None  # Track which profile was used (if any)
+    
+            # Check if template has valid mapping stored directly (must have fields or pdfFields)
+            template_mapping = template.get("mapping_json") or {}
+            has_valid_mapping = template_mapping.get("fields") or template_mapping.get("pdfFields")
+    
+            if has_valid_mapping:
+                plan = compile_template_mapping(template)
+                logger.info(f"Using mapping stored directly on template '{template.get('name')}'")
+            else:
+                # Fall back to profile (for backwards compatibility)
+                profile_id = profile_mappings.get(template_id)
+                profile = profiles_by_template.get(template_id)
+                if profile_id and profile_id != '__DEFAULT__':
+                    used_profile_id = profile_id
+                elif profile:
+                    used_profile_id = profile.get('id')
+                    logger.info(f"Auto-loaded mapping profile '{profile.get('name')}' for generation")
+    
+                if profile:
+                    plan = compile_profile_mapping(profile)
+                    output_rules = profile.get("output_rules_json", {})
+                    dropbox_rules = profile.get("dropbox_rules_json", {})
+    
+            # Build render data: start with client bundle
+            render_data = client_bundle.render_context()
+    
+            # Log available keys for debugging
+            logger.info(f"[GENERATE] Client bundle has {len(client_bundle)} keys")
+    
+            # Apply profile mappings; exact, lower-cased or underscored field
+            # names all resolve through the bundle's key index
+            unresolved = plan.apply(client_bundle, render_data)
+            if unresolved:
+                logger.warning(f"[MAPPING] {len(unresolved)} mapped variable(s) not found in client bundle: {', '.join(unresolved)}")
+    
+            # Apply staff inputs (these override or fill unmapped fields)
+            for var_name, value in staff_inputs.items():
+                if value:  # Only apply non-empty values
+                    render_data[var_name] = value
+    
+            # Generate output filename
+            filename_pattern = output_rules.get("fileNamePattern", "{clientname} - {templateName} - {yyyy}-{mm}-{dd}")
+            base_filename = generate_output_filename(filename_pattern, render_data, template["name"])
+    
+            if dry_run:
+                values = render_data if template["type"] == "DOCX" else pdf_values_for(template, render_data)
+                return await dry_run_document(template, values, unresolved, base_filename), None
+    
+            # Generate document based on type
+            result = {
+                "success": True,
+                "template_id": template_id,
+                "template_name": template["name"],
+                "client_name": render_data.get("clientname", "Unknown")
+            }
+    
+            if template["type"] == "DOCX":
+                output_path = generated_storage.allocate(f"{base_filename}.docx", client_id)
+                await render_docx(template, render_data, str(output_path))
+                result["docx_path"] = str(output_path)
+                result["docx_filename"] = f"{base_filename}.docx"
+                result["file_type"] = "docx"
+                if output_pdf:
+                    await report("convert", template_id=template_id)
+                    await convert_to_pdf(str(output_path), result)
+            else:
+                # PDF filling
+                output_path = generated_storage.allocate(f"{base_filename}.pdf", client_id)
+                pdf_field_values = pdf_values_for(template, render_data)
+                await render_engine.run(fill_pdf_form, template["file_path"], pdf_field_values, str(output_path), False, template.get("content_hash"))
+                result["pdf_path"] = str(output_path)
+                result["pdf_filename"] = f"{base_filename}.pdf"
+                result["file_type"] = "pdf"
+    
+            # Upload to Dropbox if requested
+            dropbox_paths = []
+            if save_to_dropbox:
+                await report("upload", template_id=template_id)
+                base_folder = dropbox_rules.get("baseFolder", DROPBOX_BASE_FOLDER)
+                folder_pattern = dropbox_rules.get("folderPattern", "/{clientname}/{yyyy}/{templateName}/")
+                folder_path = generate_output_filename(folder_pattern, render_data, template["name"])
+    
+                file_path = result.get("docx_path") or result.get("pdf_path")
+                file_name = result.get("docx_filename") or result.get("pdf_filename")
+                full_dropbox_path = f"{base_folder}{folder_path}{file_name}"
+    
+                files = [(file_path, full_dropbox_path)]
+                if result.get("docx_path") and result.get("pdf_path"):
+                    files.append((result["pdf_path"], f"{base_folder}{folder_path}{result['pdf_filename']}"))
+    
+                # Resolves once every document in the batch has uploaded and
+                # the packet has been committed
+                uploaded = await uploads.upload(files)
+                for key, saved_path in zip(("dropbox_path", "dropbox_pdf_path"), uploaded):
+                    if isinstance(saved_path, Exception):
+                        result.setdefault("dropbox_error", str(saved_path))
+                    else:
+                        dropbox_paths.append(saved_path)
+                        result[key] = saved_path
+    
+            # Save generation record with ID
+            doc_id = str(uuid.uuid4())
+            gen_record = {
+                "id": doc_id,
+                "client_id": client_id,
+                "template_id": template_id,
+                "profile_id": used_profile_id,
+                "docx_path": result.get("docx_path"),
+                "pdf_path": result.get("pdf_path"),
+                "dropbox_paths": dropbox_paths,
+                "staff_inputs_used": staff_inputs,
+                "status": "SUCCESS",
+                "log": f"Generated from template: {template['name']} (batch)",
+                "created_at": datetime.now(timezone.utc).isoformat()
+            }
+            await save_generated_doc(gen_record)
+    
+            # Include doc_id in result for download
+            result["doc_id"] = doc_id
+            return result, None
+    
+        except Exception as e:
+            logger.error(f"Failed to generate template {template_id}: {e}")
+            return None, {"template_id": template_id, "error": str(e)}
+    
+    async def run_one(template_id: str):
+        # A resumed job keeps what its interrupted run already generated
+        if job and template_id in job.completed:
+            return job.completed[template_id]
+        await report("render", template_id=template_id)
+        with packet.producer() as uploads:
+            result, error = await generate_one(template_id, uploads)
+        if job:
+            await job.item_done(template_id, result, error)
+        return result, error
+    
+    # Each document's files go up to Dropbox as soon as it is rendered, and
+    # the batch's files are committed together in one call
+    packet = dropbox_uploader.packet(sum(1 for tid in template_ids if not (job and tid in job.completed)))
+    
+    # Templates render in parallel on the render engine's workers, so the
+    # packet takes about as long as its slowest template
+    for result, error in await asyncio.gather(*(run_one(tid) for tid in template_ids)):
+        if result:
+            results.append(result)
+        else:
+            errors.append(error)
+    
+    return {
+        "success": len(results) > 0,
+        "total_requested": len(template_ids),
+        "total_generated": len(results),
+        "total_failed": len(errors),
+        "results": results,
+        "errors": errors,
+        "bundle_version": client_bundle.get("_bundle_version"),
+        "dry_run": dry_run
+    }
+
+
+async def run_batch_job(job: JobContext) -> Dict:
+    return await generate_batch(job.payload, job)
+
+
+job_manager.register("generate-batch", run_batch_job)
+
+
+MAIL_MERGE_CONCURRENCY = int(os.environ.get('MAIL_MERGE_CONCURRENCY', '4'))
+MAIL_MERGE_MAX_CLIENTS = int(os.environ.get('MAIL_MERGE_MAX_CLIENTS', '500'))
+
+
+async def find_master_list_ids(filter_by: str) -> List[str]:
+    """Ids of the Master List records matching an Airtable formula"""
+    record_ids = []
+    offset = None
+    while True:
+        params = {"filterByFormula": filter_by, "fields[]": "Matter Name"}
+        if offset:
+            params["offset"] = offset
+        response = await airtable_client.send("GET", "Master%20List", params=params)
+        response.raise_for_status()
+        result = response.json()
+        record_ids.extend(record["id"] for record in result.get("records", []))
+        offset = result.get("offset")
+        if not offset:
+            return record_ids
+
+
+async def prepare_mail_merge(request: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Resolve the clients of a mail merge (explicit client_ids and/or a Master
+    List filter_by formula) and load everything generation needs up front:
+    every bundle from batched Airtable reads, the templates and profiles once.
+    """
+    template_ids = request.get("template_ids") or []
+    client_ids = list(dict.fromkeys(request.get("client_ids") or []))
+    filter_by = request.get("filter_by")
+    
+    if not template_ids:
+        raise HTTPException(status_code=400, detail="At least one template_id is required")
+    if not client_ids and not filter_by:
+        raise HTTPException(status_code=400, detail="client_ids or filter_by is required")
+    
+    try:
+        if filter_by:
+            client_ids = list(dict.fromkeys(client_ids + await find_master_list_ids(filter_by)))
+        if len(client_ids) > MAIL_MERGE_MAX_CLIENTS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Mail merge is limited to {MAIL_MERGE_MAX_CLIENTS} clients; {len(client_ids)} matched"
+            )
+        bundles = await client_bundle_cache.get_many(client_ids, build_client_bundles)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"[MAIL-MERGE] Failed to load clients: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch client data: {str(e)}")
+    
+    templates_by_id = await template_catalog.get_many(template_ids)
+    return {
+        "client_ids": client_ids,
+        "bundles": bundles,
+        "templates_by_id": templates_by_id,
+        "profiles_by_template": await load_batch_profiles(list(templates_by_id), request.get("profile_mappings", {}))
+    }
+
+
+async def run_mail_merge(request: Dict[str, Any], prepared: Dict[str, Any]) -> AsyncIterator[Dict]:
+    """
+    Generate the template set for every prepared client, several clients at
+    a time, yielding each client's batch result as it finishes and a summary
+    at the end, with throughput in documents per minute.
+    """
+    client_ids = prepared["client_ids"]
+    bundles = prepared["bundles"]
+    batch_request = {k: v for k, v in request.items() if k not in ("client_ids", "filter_by")}
+    batch_request["save_inputs"] = False
+    semaphore = asyncio.Semaphore(MAIL_MERGE_CONCURRENCY)
+    start = time.perf_counter()
+    generated = 0
+    failed_clients = 0
+    
+    yield {"event": "start", "clients": len(client_ids), "templates": len(prepared["templates_by_id"])}
+    
+    async def merge_one(client_id: str) -> Dict:
+        bundle = bundles.get(client_id)
+        if bundle is None:
+            return {"event": "client", "client_id": client_id, "success": False, "error": "Client not found in Master List"}
+        async with semaphore:
+            try:
+                outcome = await generate_batch(
+                    {**batch_request, "client_id": client_id},
+                    client_bundle=stamp_current_date(bundle),
+                    templates_by_id=prepared["templates_by_id"],
+                    profiles_by_template=prepared["profiles_by_template"]
+                )
+            except Exception as e:
+                logger.error(f"[MAIL-MERGE] Failed for client {client_id}: {e}")
+                return {"event": "client", "client_id": client_id, "success": False, "error": str(e)}
+        return {"event": "client", "client_id": client_id, "client_name": bundle.get("clientname"), **outcome}
+    
+    tasks = [asyncio.create_task(merge_one(client_id)) for client_id in client_ids]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item = await next_done
+            generated += item.get("total_generated", 0)
+            if not item.get("success"):
+                failed_clients += 1
+            elapsed = time.perf_counter() - start
+            item["docs_per_minute"] = round(generated / elapsed * 60, 1) if elapsed else 0.0
+            yield item
+    finally:
+        # A client that disconnects stops the rest of the merge
+        for task in tasks:
+            task.cancel()
+    
+    elapsed = time.perf_counter() - start
+    yield {
+        "event": "summary",
+        "clients": len(client_ids),
+        "failed_clients": failed_clients,
+        "total_generated": generated,
+        "elapsed_seconds": round(elapsed, 2),
+        "docs_per_minute": round(generated / elapsed * 60, 1) if elapsed else 0.0
+    }
+
+
 def create_document_routes(sb: SupabaseClient, get_current_user):
     """Create document routes with Supabase dependency"""
-    db = sb
+    database.bind(sb)
+    template_blobs.remote = create_remote_backend(sb, "templates")
     
     @router.post("/templates/upload")
     async def upload_template(
@@ -698,7 +1172,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         category: str = Form("Other"),
         current_user: dict = Depends(get_current_user)
     ):
-        """Upload a template file (DOCX or PDF) - stores in Supabase for persistence"""
+        """Upload a template file (DOCX or PDF) - bytes go to the content-addressed blob store"""
         # Validate file type
         filename = file.filename.lower()
         if template_type == "DOCX" and not filename.endswith('.docx'):
@@ -712,17 +1186,11 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         if case_type not in CASE_TYPES:
             raise HTTPException(status_code=400, detail=f"Invalid case type. Must be one of: {', '.join(CASE_TYPES)}")
         
-        # Read file content
+        # Read file content; identical uploads share one stored copy
         content = await file.read()
-        file_content_base64 = base64.b64encode(content).decode('utf-8')
-        
-        # Save file to disk as well (for backwards compatibility and faster access)
-        file_id = str(uuid.uuid4())
-        file_ext = '.docx' if template_type == "DOCX" else '.pdf'
-        file_path = TEMPLATES_DIR / f"{file_id}{file_ext}"
-        
-        with open(file_path, 'wb') as f:
-            f.write(content)
+        file_ext = template_suffix(template_type)
+        content_hash = await asyncio.to_thread(template_blobs.put, content, file_ext)
+        file_path = template_blobs.local.path_for(content_hash, file_ext)
         
         # Detect variables/fields
         detected_variables = []
@@ -730,15 +1198,17 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         
         try:
             if template_type == "DOCX":
-                detection_result = detect_docx_variables(str(file_path))
+                detection_result = await asyncio.to_thread(
+                    detect_docx_variables, str(file_path), content_hash, content
+                )
                 detected_variables = detection_result.get("all_detected", [])
             else:
-                detected_pdf_fields = detect_pdf_fields(str(file_path))
+                detected_pdf_fields = await asyncio.to_thread(detect_pdf_fields, str(file_path))
         except Exception as e:
             # Log the error but continue - allow upload even if field detection fails
             logger.error(f"Failed to detect fields in template: {str(e)}")
         
-        # Save to database WITH file content
+        # The bytes are addressed by content_hash
         template_data = {
             "name": name,
             "type": template_type,
@@ -746,14 +1216,18 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             "case_type": case_type,
             "category": category,
             "file_path": str(file_path),
-            "file_content": file_content_base64,  # Store file content in Supabase
+            "content_hash": content_hash,
+            "file_size": len(content),
             "original_filename": file.filename,
             "detected_variables": detected_variables,
             "detected_pdf_fields": detected_pdf_fields
         }
+        # Without a remote backend the local blob is lost on redeploy, so keep the base64 copy
+        if template_blobs.remote is None:
+            template_data["file_content"] = base64.b64encode(content).decode('utf-8')
         
-        template_id = save_template_sync(db, template_data)
-        logger.info(f"Template '{name}' uploaded and stored in Supabase with ID: {template_id}")
+        template_id = await save_template(template_data)
+        logger.info(f"Template '{name}' uploaded with ID: {template_id} (blob {content_hash[:12]})")
         
         return {
             "id": template_id,
@@ -762,6 +1236,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             "county": county,
             "case_type": case_type,
             "category": category,
+            "content_hash": content_hash,
             "detected_variables": detected_variables,
             "detected_pdf_fields": detected_pdf_fields,
             "message": "Template uploaded successfully"
@@ -776,20 +1251,10 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         current_user: dict = Depends(get_current_user)
     ):
         """List all templates with optional filters"""
-        q = db.table("doc_templates").select("*")
-        if template_type:
-            q = q.eq("type", template_type)
-        if case_type:
-            q = q.eq("case_type", case_type)
-        if county:
-            q = q.eq("county", county)
-        templates = q.execute().data or []
-        
-        # Apply search filter if provided
-        if search:
-            search_lower = search.lower()
-            templates = [t for t in templates if search_lower in t.get("name", "").lower()]
-        
+        # Each search word matches the start of a word in the template name
+        templates = await template_catalog.search(
+            template_type=template_type, case_type=case_type, county=county, search=search
+        )
         return {"templates": templates}
     
     @router.get("/templates/by-case-type/{case_type_filter}")
@@ -799,9 +1264,9 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
     ):
         """Get templates organized by case type"""
         if case_type_filter == "all":
-            templates = (db.table("doc_templates").select("*").execute()).data or []
+            templates = await template_catalog.search()
         else:
-            templates = (db.table("doc_templates").select("*").eq("case_type", case_type_filter).execute()).data or []
+            templates = await template_catalog.search(case_type=case_type_filter)
         
         # Group by category
         grouped = {}
@@ -830,7 +1295,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         current_user: dict = Depends(get_current_user)
     ):
         """Get a specific template"""
-        template = get_template_sync(db, template_id)
+        template = await get_template(template_id)
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
         return template
@@ -841,7 +1306,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         current_user: dict = Depends(get_current_user)
     ):
         """Check if a template is healthy (exists in DB and file exists on disk)"""
-        template = get_template_sync(db, template_id)
+        template = await get_template(template_id)
         if not template:
             return {
                 "healthy": False,
@@ -869,7 +1334,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         current_user: dict = Depends(get_current_user)
     ):
         """Check health of all templates"""
-        templates = (db.table("doc_templates").select("*").execute()).data or []
+        templates = await template_catalog.search()
         
         results = []
         healthy_count = 0
@@ -889,7 +1354,8 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
                 "name": t.get("name"),
                 "healthy": file_exists,
                 "file_path": file_path,
-                "file_exists": file_exists
+                "file_exists": file_exists,
+                "content_hash": t.get("content_hash")
             })
         
         return {
@@ -904,10 +1370,10 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         current_user: dict = Depends(get_current_user)
     ):
         """
-        Migrate existing templates to store file content in Supabase.
-        This ensures templates persist across deployments.
+        Migrate existing templates into the content-addressed blob store.
+        Bytes come from the file on disk or, failing that, the legacy base64 column.
         """
-        templates = (db.table("doc_templates").select("*").execute()).data or []
+        templates = await templates_repo.list()
         
         migrated = 0
         already_migrated = 0
@@ -919,27 +1385,32 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             template_name = t.get("name")
             
             # Check if already migrated
-            if t.get("file_content"):
+            if t.get("content_hash"):
                 already_migrated += 1
                 continue
             
-            # Try to read file and store in Supabase
             file_path = t.get("file_path", "")
-            if file_path and os.path.exists(file_path):
-                try:
+            try:
+                if file_path and os.path.exists(file_path):
                     with open(file_path, 'rb') as f:
                         content = f.read()
-                    file_content_base64 = base64.b64encode(content).decode('utf-8')
-                    
-                    db.table("doc_templates").update({"file_content": file_content_base64}).eq("id", template_id).execute()
-                    migrated += 1
-                    logger.info(f"Migrated template '{template_name}' to Supabase")
-                except Exception as e:
-                    failed += 1
-                    errors.append({"id": template_id, "name": template_name, "error": str(e)})
-            else:
+                else:
+                    legacy_content = await templates_repo.get_legacy_content(template_id)
+                    if not legacy_content:
+                        failed += 1
+                        errors.append({"id": template_id, "name": template_name, "error": "File not found on disk or in database"})
+                        continue
+                    content = base64.b64decode(legacy_content)
+                
+                updates = await store_template_blob(template_id, content, t.get("type"))
+                # The old per-upload copy is now redundant
+                if file_path and file_path != updates["file_path"] and os.path.exists(file_path):
+                    os.remove(file_path)
+                migrated += 1
+                logger.info(f"Migrated template '{template_name}' to blob {updates['content_hash'][:12]}")
+            except Exception as e:
                 failed += 1
-                errors.append({"id": template_id, "name": template_name, "error": "File not found on disk"})
+                errors.append({"id": template_id, "name": template_name, "error": str(e)})
         
         return {
             "success": True,
@@ -956,15 +1427,15 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         current_user: dict = Depends(get_current_user)
     ):
         """
-        Restore a template file from Supabase to disk.
-        Useful if the file was lost due to deployment.
+        Restore a template file to local disk from the blob store (or the legacy
+        database copy). Useful if the file was lost due to deployment.
         """
-        template = get_template_sync(db, template_id)
+        template = await get_template(template_id)
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
         
         try:
-            file_path = ensure_template_file_exists_sync(db, template)
+            file_path = await ensure_template_file_exists(template)
             return {
                 "success": True,
                 "template_id": template_id,
@@ -981,18 +1452,23 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         current_user: dict = Depends(get_current_user)
     ):
         """Delete a template"""
-        template = get_template_sync(db, template_id)
+        template = await get_template(template_id)
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
         
-        # Delete file
+        # Delete from database
+        await templates_repo.delete(template_id)
+        template_catalog.remove(template_id)
+        
+        # Delete the file, unless another template still shares the same blob
+        content_hash = template.get("content_hash")
         file_path = template.get("file_path")
-        if file_path and os.path.exists(file_path):
+        if content_hash:
+            if await templates_repo.count_by_hash(content_hash) == 0:
+                await asyncio.to_thread(template_blobs.delete, content_hash, template_suffix(template.get("type")))
+        elif file_path and os.path.exists(file_path):
             os.remove(file_path)
         
-        # Delete from database
-        db.table("doc_templates").delete().eq("id", template_id).execute()
-        
         return {"success": True, "message": "Template deleted"}
     
     @router.post("/docx/detect-variables")
@@ -1004,17 +1480,9 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         if not file.filename.lower().endswith('.docx'):
             raise HTTPException(status_code=400, detail="File must be a .docx")
         
-        # Save temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as tmp:
-            content = await file.read()
-            tmp.write(content)
-            tmp_path = tmp.name
-        
-        try:
-            result = detect_docx_variables(tmp_path)
-            return result
-        finally:
-            os.unlink(tmp_path)
+        # Scanned from memory; the result is memoized by content hash
+        content = await file.read()
+        return await asyncio.to_thread(detect_docx_variables, file.filename, None, content)
     
     @router.post("/pdf/detect-fields")
     async def detect_fields_endpoint(
@@ -1046,7 +1514,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         template_id = profile.template_id
         
         # Verify template exists
-        template = get_template_sync(db, template_id)
+        template = await get_template(template_id)
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
         
@@ -1057,9 +1525,9 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             "mapping_updated_at": datetime.now(timezone.utc).isoformat()
         }
         
-        db.table("doc_templates").update(mapping_data).eq("id", template_id).execute()
+        await update_template(template_id, mapping_data)
 
-        db.table("doc_mapping_profiles").delete().eq("template_id", template_id).execute()
+        await mapping_profiles_repo.delete_for_template(template_id)
         
         # Create single profile
         profile_data = {
@@ -1073,7 +1541,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             "created_at": datetime.now(timezone.utc).isoformat(),
             "updated_at": datetime.now(timezone.utc).isoformat()
         }
-        db.table("doc_mapping_profiles").insert(profile_data).execute()
+        await mapping_profiles_repo.insert(profile_data)
         
         return {
             "id": profile_data["id"],
@@ -1086,7 +1554,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         current_user: dict = Depends(get_current_user)
     ):
         """List mapping profiles"""
-        profiles = list_mapping_profiles_sync(db, template_id)
+        profiles = await list_mapping_profiles(template_id)
         return {"profiles": profiles}
     
     @router.get("/mapping-profiles/{profile_id}")
@@ -1095,7 +1563,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         current_user: dict = Depends(get_current_user)
     ):
         """Get a specific mapping profile"""
-        profile = get_mapping_profile_sync(db, profile_id)
+        profile = await get_mapping_profile(profile_id)
         if not profile:
             raise HTTPException(status_code=404, detail="Profile not found")
         return profile
@@ -1116,7 +1584,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             "mapping_updated_at": datetime.now(timezone.utc).isoformat()
         }
         
-        db.table("doc_templates").update(mapping_data).eq("id", template_id).execute()
+        await update_template(template_id, mapping_data)
 
         update_data = {
             "name": profile.name,
@@ -1128,7 +1596,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             "updated_at": datetime.now(timezone.utc).isoformat()
         }
 
-        db.table("doc_mapping_profiles").update(update_data).eq("id", profile_id).execute()
+        await mapping_profiles_repo.update(profile_id, update_data)
         
         return {"success": True, "message": "Mapping updated"}
     
@@ -1138,11 +1606,11 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         current_user: dict = Depends(get_current_user)
     ):
         """Delete a mapping profile"""
-        existing = get_mapping_profile_sync(db, profile_id)
+        existing = await get_mapping_profile(profile_id)
         if not existing:
             raise HTTPException(status_code=404, detail="Profile not found")
         
-        db.table("doc_mapping_profiles").delete().eq("id", profile_id).execute()
+        await mapping_profiles_repo.delete(profile_id)
         return {"success": True, "message": "Profile deleted"}
     
     @router.post("/templates/{template_id}/mapping")
@@ -1156,7 +1624,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         This is the preferred method - one mapping per template.
         """
         # Verify template exists
-        template = get_template_sync(db, template_id)
+        template = await get_template(template_id)
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
         
@@ -1166,7 +1634,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             "mapping_updated_at": datetime.now(timezone.utc).isoformat()
         }
         
-        db.table("doc_templates").update(mapping_data).eq("id", template_id).execute()
+        await update_template(template_id, mapping_data)
 
         return {
             "success": True,
@@ -1183,7 +1651,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         Get the mapping configuration for a template.
         Returns the mapping stored directly on the template.
         """
-        template = get_template_sync(db, template_id)
+        template = await get_template(template_id)
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
         
@@ -1213,7 +1681,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
     ):
         """Generate a document from a DOCX template"""
         # Get template
-        template = get_template_sync(db, request.template_id)
+        template = await get_template(request.template_id)
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
         
@@ -1221,47 +1689,45 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             raise HTTPException(status_code=400, detail="Template is not a DOCX")
         
         # Get client data
-        client_bundle = await get_client_bundle(request.client_id)
+        client_bundle = await get_client_bundle(request.client_id, request.bundle_version)
         
         # Get mapping profile if specified
-        mapping = request.custom_mapping or {}
+        plan = compile_mapping(request.custom_mapping)
         output_rules = {}
         dropbox_rules = {}
         
         if request.profile_id:
-            profile = get_mapping_profile_sync(db, request.profile_id)
+            profile = await get_mapping_profile(request.profile_id)
             if profile:
-                mapping = profile.get("mapping_json", {})
+                plan = compile_profile_mapping(profile)
                 output_rules = profile.get("output_rules_json", {})
                 dropbox_rules = profile.get("dropbox_rules_json", {})
         
         # Apply custom mappings to client bundle
-        render_data = dict(client_bundle)
-        if mapping.get("fields"):
-            for var_name, source_info in mapping["fields"].items():
-                source = source_info.get("source", "")
-                if source and source in client_bundle:
-                    render_data[var_name] = client_bundle[source]
+        render_data = client_bundle.render_context()
+        unresolved = plan.apply(client_bundle, render_data, include_pdf_fields=False)
         
         # Generate output filename
         filename_pattern = output_rules.get("fileNamePattern", "{clientname} - {templateName} - {yyyy}-{mm}-{dd}")
         base_filename = generate_output_filename(filename_pattern, render_data, template["name"])
         
-        # Create output directory
-        output_dir = TEMPLATES_DIR / "generated"
-        output_dir.mkdir(exist_ok=True)
+        if request.dry_run:
+            return await dry_run_document(template, render_data, unresolved, base_filename)
         
         # Generate DOCX
-        output_docx_path = output_dir / f"{base_filename}.docx"
-        render_docx_template(template["file_path"], render_data, str(output_docx_path))
+        output_docx_path = generated_storage.allocate(f"{base_filename}.docx", request.client_id)
+        await render_docx(template, render_data, str(output_docx_path))
         
         result = {
             "success": True,
             "docx_path": str(output_docx_path),
             "docx_filename": f"{base_filename}.docx",
-            "pdf_available": False,
-            "pdf_message": "PDF conversion requires LibreOffice (not available in this environment)"
+            "pdf_available": pdf_converter.available
         }
+        if wants_pdf(request.output_format):
+            await convert_to_pdf(str(output_docx_path), result)
+        elif not pdf_converter.available:
+            result["pdf_message"] = "PDF conversion requires LibreOffice (not available in this environment)"
         
         # Upload to Dropbox if requested
         dropbox_paths = []
@@ -1276,6 +1742,10 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
                 saved_path = await upload_to_dropbox(str(output_docx_path), full_dropbox_path)
                 dropbox_paths.append(saved_path)
                 result["dropbox_docx_path"] = saved_path
+                if result.get("pdf_path"):
+                    saved_path = await upload_to_dropbox(result["pdf_path"], f"{base_folder}{folder_path}{base_filename}.pdf")
+                    dropbox_paths.append(saved_path)
+                    result["dropbox_pdf_path"] = saved_path
             except Exception as e:
                 result["dropbox_error"] = str(e)
         
@@ -1285,12 +1755,12 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             "template_id": request.template_id,
             "profile_id": request.profile_id,
             "docx_path": str(output_docx_path),
-            "pdf_path": None,
+            "pdf_path": result.get("pdf_path"),
             "dropbox_paths": dropbox_paths,
             "status": "SUCCESS",
             "log": f"Generated from template: {template['name']}"
         }
-        save_generated_doc_sync(db, gen_record)
+        await save_generated_doc(gen_record)
         
         return result
     
@@ -1301,7 +1771,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
     ):
         """Fill a PDF form with client data"""
         # Get template
-        template = get_template_sync(db, request.template_id)
+        template = await get_template(request.template_id)
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
         
@@ -1309,49 +1779,37 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             raise HTTPException(status_code=400, detail="Template is not a fillable PDF")
         
         # Get client data
-        client_bundle = await get_client_bundle(request.client_id)
+        client_bundle = await get_client_bundle(request.client_id, request.bundle_version)
         
         # Get mapping profile if specified
-        mapping = request.custom_mapping or {}
+        plan = compile_mapping(request.custom_mapping)
         output_rules = {}
         dropbox_rules = {}
         
         if request.profile_id:
-            profile = get_mapping_profile_sync(db, request.profile_id)
+            profile = await get_mapping_profile(request.profile_id)
             if profile:
-                mapping = profile.get("mapping_json", {})
+                plan = compile_profile_mapping(profile)
                 output_rules = profile.get("output_rules_json", {})
                 dropbox_rules = profile.get("dropbox_rules_json", {})
         
         # Build PDF field values from mapping
-        pdf_field_values = {}
-        pdf_field_mappings = mapping.get("pdfFields", {})
-        
-        for field_name, field_config in pdf_field_mappings.items():
-            source = field_config.get("source", "")
-            field_type = field_config.get("type", "text")
-            
-            if source in client_bundle:
-                value = client_bundle[source]
-                
-                # Handle checkbox fields
-                if field_type == "checkbox":
-                    true_value = field_config.get("trueValue", "Yes")
-                    pdf_field_values[field_name] = "/Yes" if str(value).lower() in ["yes", "true", "1"] else "/Off"
-                else:
-                    pdf_field_values[field_name] = str(value) if value else ""
+        pdf_field_values = plan.pdf_values(client_bundle)
         
         # Generate output filename
         filename_pattern = output_rules.get("fileNamePattern", "{clientname} - {templateName} - FILLED - {yyyy}-{mm}-{dd}")
         base_filename = generate_output_filename(filename_pattern, client_bundle, template["name"])
         
-        # Create output directory
-        output_dir = TEMPLATES_DIR / "generated"
-        output_dir.mkdir(exist_ok=True)
+        if request.dry_run:
+            unresolved = plan.unresolved_pdf_fields(client_bundle)
+            return await dry_run_document(template, pdf_field_values, unresolved, base_filename)
         
         # Fill PDF
-        output_pdf_path = output_dir / f"{base_filename}.pdf"
-        fill_pdf_form(template["file_path"], pdf_field_values, str(output_pdf_path), request.flatten)
+        output_pdf_path = generated_storage.allocate(f"{base_filename}.pdf", request.client_id)
+        await render_engine.run(
+            fill_pdf_form, template["file_path"], pdf_field_values, str(output_pdf_path),
+            request.flatten, template.get("content_hash")
+        )
         
         result = {
             "success": True,
@@ -1387,7 +1845,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             "status": "SUCCESS",
             "log": f"Filled from template: {template['name']}"
         }
-        save_generated_doc_sync(db, gen_record)
+        await save_generated_doc(gen_record)
         
         return result
     
@@ -1397,9 +1855,58 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         current_user: dict = Depends(get_current_user)
     ):
         """List generated documents"""
-        docs = list_generated_docs_sync(db, client_id)
+        docs = await list_generated_docs(client_id)
         return {"documents": docs}
     
+    @router.get("/generated/archive")
+    async def download_generated_archive(
+        doc_ids: Optional[str] = None,
+        job_id: Optional[str] = None,
+        file_type: str = "all",
+        current_user: dict = Depends(get_current_user)
+    ):
+        """
+        Download generated documents as one ZIP, streamed from disk.
+        Takes comma-separated doc_ids and/or the job_id of a batch job;
+        file_type is docx, pdf or all.
+        """
+        ids = [doc_id for doc_id in (doc_ids or "").split(",") if doc_id]
+        if job_id:
+            job = await get_user_job(job_id, current_user)
+            items = await job_manager.store.items(job["id"])
+            ids.extend(result["doc_id"] for result, _ in items.values() if result and result.get("doc_id"))
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            raise HTTPException(status_code=400, detail="doc_ids or job_id is required")
+        
+        docs = await generated_docs_repo.get_many(ids, "id, docx_path, pdf_path")
+        columns = {"docx": ("docx_path",), "pdf": ("pdf_path",)}.get(file_type, ("docx_path", "pdf_path"))
+        files = []
+        for doc_id in ids:
+            doc = docs.get(doc_id) or {}
+            for column in columns:
+                file_path = doc.get(column)
+                if file_path and os.path.exists(file_path):
+                    files.append((file_path, display_name(file_path)))
+        if not files:
+            raise HTTPException(status_code=404, detail="No generated files found")
+        await generated_storage.touch(*(path for path, _ in files))
+        
+        try:
+            archive = StreamingZip(files)
+        except ArchiveTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        
+        filename = f"documents-{datetime.now().strftime('%Y%m%d-%H%M%S')}.zip"
+        return StreamingResponse(
+            iter(archive),
+            media_type="application/zip",
+            headers={
+                "Content-Length": str(archive.content_length),
+                "Content-Disposition": f'attachment; filename="{filename}"'
+            }
+        )
+    
     @router.get("/generated/{doc_id}/download")
     async def download_generated_doc(
         doc_id: str,
@@ -1409,7 +1916,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         """Download a generated document"""
         from fastapi.responses import FileResponse
         
-        doc = (db.table("generated_docs").select("*").eq("id", doc_id).maybe_single().execute()).data
+        doc = await generated_docs_repo.get(doc_id)
         if not doc:
             raise HTTPException(status_code=404, detail="Document not found")
         
@@ -1417,7 +1924,8 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         if not file_path or not os.path.exists(file_path):
             raise HTTPException(status_code=404, detail="File not found")
         
-        filename = os.path.basename(file_path)
+        await generated_storage.touch(file_path)
+        filename = display_name(file_path)
         return FileResponse(
             path=file_path,
             filename=filename,
@@ -1513,7 +2021,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         current_user: dict = Depends(get_current_user)
     ):
         """Get saved staff inputs for a client"""
-        inputs = get_client_staff_inputs_sync(db, client_id)
+        inputs = await get_client_staff_inputs(client_id)
         return {"client_id": client_id, "inputs": inputs}
     
     @router.post("/staff-inputs/{client_id}")
@@ -1524,7 +2032,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
     ):
         """Save staff inputs for a client"""
         inputs = data.get("inputs", {})
-        save_client_staff_inputs_sync(db, client_id, inputs)
+        await save_client_staff_inputs(client_id, inputs)
         return {"success": True, "message": "Staff inputs saved"}
     
     @router.post("/generate-with-inputs")
@@ -1539,39 +2047,37 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         staff_inputs = request.get("staff_inputs", {})
         save_to_dropbox = request.get("save_to_dropbox", False)
         save_inputs = request.get("save_inputs", True)
+        dry_run = request.get("dry_run", False)
+        bundle_version = request.get("bundle_version")
         
         if not client_id or not template_id:
             raise HTTPException(status_code=400, detail="client_id and template_id are required")
         
         # Get template
-        template = get_template_sync(db, template_id)
+        template = await get_template(template_id)
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
         
         # Get client data
-        client_bundle = await get_client_bundle(client_id)
+        client_bundle = await get_client_bundle(client_id, bundle_version)
         
         # Get mapping profile if specified
-        mapping = {}
+        plan = compile_mapping(None)
         output_rules = {}
         dropbox_rules = {}
         
         if profile_id and profile_id != '__DEFAULT__':
-            profile = get_mapping_profile_sync(db, profile_id)
+            profile = await get_mapping_profile(profile_id)
             if profile:
-                mapping = profile.get("mapping_json", {})
+                plan = compile_profile_mapping(profile)
                 output_rules = profile.get("output_rules_json", {})
                 dropbox_rules = profile.get("dropbox_rules_json", {})
         
         # Build render data: start with client bundle
-        render_data = dict(client_bundle)
+        render_data = client_bundle.render_context()
         
         # Apply profile mappings
-        if mapping.get("fields"):
-            for var_name, source_info in mapping["fields"].items():
-                source = source_info.get("source", "")
-                if source and source in client_bundle:
-                    render_data[var_name] = client_bundle[source]
+        unresolved = plan.apply(client_bundle, render_data, include_pdf_fields=False)
         
         # Apply staff inputs (these override or fill unmapped fields)
         for var_name, value in staff_inputs.items():
@@ -1579,18 +2085,18 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
                 render_data[var_name] = value
         
         # Save staff inputs for future use if requested
-        if save_inputs and staff_inputs:
-            existing_inputs = get_client_staff_inputs_sync(db, client_id)
+        if save_inputs and staff_inputs and not dry_run:
+            existing_inputs = await get_client_staff_inputs(client_id)
             merged_inputs = {**existing_inputs, **staff_inputs}
-            save_client_staff_inputs_sync(db, client_id, merged_inputs)
+            await save_client_staff_inputs(client_id, merged_inputs)
         
         # Generate output filename
         filename_pattern = output_rules.get("fileNamePattern", "{clientname} - {templateName} - {yyyy}-{mm}-{dd}")
         base_filename = generate_output_filename(filename_pattern, render_data, template["name"])
         
-        # Create output directory
-        output_dir = TEMPLATES_DIR / "generated"
-        output_dir.mkdir(exist_ok=True)
+        if dry_run:
+            values = render_data if template["type"] == "DOCX" else pdf_values_for(template, render_data)
+            return await dry_run_document(template, values, unresolved, base_filename)
         
         # Generate document based on type
         result = {
@@ -1600,21 +2106,21 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         }
         
         if template["type"] == "DOCX":
-            output_path = output_dir / f"{base_filename}.docx"
-            render_docx_template(template["file_path"], render_data, str(output_path))
+            output_path = generated_storage.allocate(f"{base_filename}.docx", client_id)
+            await render_docx(template, render_data, str(output_path))
             result["docx_path"] = str(output_path)
             result["docx_filename"] = f"{base_filename}.docx"
-            result["pdf_available"] = False
-            result["pdf_message"] = "PDF conversion requires LibreOffice (not available)"
+            if wants_pdf(request.get("output_format")):
+                await convert_to_pdf(str(output_path), result)
+            else:
+                result["pdf_available"] = pdf_converter.available
+                if not pdf_converter.available:
+                    result["pdf_message"] = "PDF conversion requires LibreOffice (not available)"
         else:
             # PDF filling
-            output_path = output_dir / f"{base_filename}.pdf"
-            pdf_field_values = {}
-            for field in template.get("detected_pdf_fields", []):
-                field_name = field.get("name")
-                if field_name in render_data:
-                    pdf_field_values[field_name] = str(render_data[field_name])
-            fill_pdf_form(template["file_path"], pdf_field_values, str(output_path), False)
+            output_path = generated_storage.allocate(f"{base_filename}.pdf", client_id)
+            pdf_field_values = pdf_values_for(template, render_data)
+            await render_engine.run(fill_pdf_form, template["file_path"], pdf_field_values, str(output_path), False, template.get("content_hash"))
             result["pdf_path"] = str(output_path)
             result["pdf_filename"] = f"{base_filename}.pdf"
         
@@ -1648,7 +2154,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             "status": "SUCCESS",
             "log": f"Generated from template: {template['name']}"
         }
-        save_generated_doc_sync(db, gen_record)
+        await save_generated_doc(gen_record)
         
         return result
     
@@ -1662,221 +2168,118 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         Accepts a list of template_ids and consolidated staff inputs.
         Returns separate files for each template.
         """
-        client_id = request.get("client_id")
-        template_ids = request.get("template_ids", [])
-        profile_mappings = request.get("profile_mappings", {})  # {template_id: profile_id}
-        staff_inputs = request.get("staff_inputs", {})
-        save_to_dropbox = request.get("save_to_dropbox", False)
-        save_inputs = request.get("save_inputs", True)
+        return await generate_batch(request)
+    
+    @router.post("/mail-merge")
+    async def mail_merge(
+        request: Dict[str, Any],
+        current_user: dict = Depends(get_current_user)
+    ):
+        """
+        Generate one template set for many clients: client_ids and/or a Master
+        List filter_by formula. Streams newline-delimited JSON: a start line,
+        one line per client as it finishes, and a summary with docs/minute.
+        """
+        prepared = await prepare_mail_merge(request)
+        logger.info(f"[MAIL-MERGE] {len(prepared['client_ids'])} clients x {len(prepared['templates_by_id'])} templates")
         
-        # Log incoming request for debugging
-        logger.info(f"[GENERATE-BATCH] Received request - client_id: {client_id}, template_ids: {template_ids}")
+        async def lines():
+            async for item in run_mail_merge(request, prepared):
+                yield json.dumps(item, default=str) + "\n"
         
-        if not client_id:
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    
+    @router.post("/generate-batch/jobs")
+    async def submit_batch_job(
+        request: Dict[str, Any],
+        current_user: dict = Depends(get_current_user)
+    ):
+        """
+        Queue a batch generation and return its job id at once.
+        Follow it by polling /jobs/{job_id} or streaming /jobs/{job_id}/events.
+        """
+        if not request.get("client_id"):
             raise HTTPException(status_code=400, detail="client_id is required")
-        if not template_ids or len(template_ids) == 0:
+        if not request.get("template_ids"):
             raise HTTPException(status_code=400, detail="At least one template_id is required")
+        if request.get("dry_run"):
+            raise HTTPException(status_code=400, detail="Dry runs return at once; use /generate-batch")
         
-        # Get client data once (reused for all templates)
-        client_bundle = await get_client_bundle(client_id)
-        
-        # Save staff inputs for future use if requested
-        if save_inputs and staff_inputs:
-            existing_inputs = get_client_staff_inputs_sync(db, client_id)
-            merged_inputs = {**existing_inputs, **staff_inputs}
-            save_client_staff_inputs_sync(db, client_id, merged_inputs)
-        
-        # Create output directory
-        output_dir = TEMPLATES_DIR / "generated"
-        output_dir.mkdir(exist_ok=True)
-        
-        results = []
-        errors = []
-        
-        for template_id in template_ids:
-            try:
-                # Get template
-                template = get_template_sync(db, template_id)
-                if not template:
-                    logger.error(f"[GENERATE] Template not found in DB: {template_id}")
-                    errors.append({"template_id": template_id, "error": "Template not found in database. It may have been deleted."})
-                    continue
-                
-                # Ensure template file exists (restore from Supabase if needed)
-                try:
-                    template_file_path = ensure_template_file_exists_sync(db, template)
-                    logger.info(f"[GENERATE] Template '{template.get('name')}' file ready at: {template_file_path}")
-                    # Update template dict with confirmed file path
-                    template["file_path"] = template_file_path
-                except HTTPException as e:
-                    logger.error(f"[GENERATE] Failed to ensure template file: {e.detail}")
-                    errors.append({
-                        "template_id": template_id, 
-                        "error": e.detail
-                    })
-                    continue
-                
-                # Get mapping - first try from template directly, then fall back to profiles
-                mapping = {}
-                output_rules = {}
-                dropbox_rules = {}
-                used_profile_id = None  # Track which profile was used (if any)
-                
-                # Check if template has valid mapping stored directly (must have fields or pdfFields)
-                template_mapping = template.get("mapping_json", {})
-                has_valid_mapping = template_mapping.get("fields") or template_mapping.get("pdfFields")
-                
-                if has_valid_mapping:
-                    mapping = template_mapping
-                    logger.info(f"Using mapping stored directly on template '{template.get('name')}'")
-                else:
-                    # Fall back to profile (for backwards compatibility)
-                    profile_id = profile_mappings.get(template_id)
-                    profile = None
-                    if profile_id and profile_id != '__DEFAULT__':
-                        profile = get_mapping_profile_sync(db, profile_id)
-                        used_profile_id = profile_id
-                    else:
-                        result = db.table("doc_mapping_profiles").select("*").eq("template_id", template_id).order("created_at", desc=True).limit(1).execute()
-                        profile = result.data[0] if result.data else None
-                        if profile:
-                            used_profile_id = profile.get('id')
-                            logger.info(f"Auto-loaded mapping profile '{profile.get('name')}' for generation")
-                    
-                    if profile:
-                        mapping = profile.get("mapping_json", {})
-                        output_rules = profile.get("output_rules_json", {})
-                        dropbox_rules = profile.get("dropbox_rules_json", {})
-                
-                # Build render data: start with client bundle
-                render_data = dict(client_bundle)
-                
-                # Log available keys for debugging
-                logger.info(f"[GENERATE] Client bundle has {len(client_bundle)} keys")
-                
-                # Apply profile mappings for DOCX templates
-                if mapping.get("fields"):
-                    for var_name, source_info in mapping["fields"].items():
-                        source = source_info.get("source", "")
-                        if source and source not in ['__LEAVE_BLANK__', '__STAFF_INPUT__']:
-                            # Try exact match first
-                            if source in client_bundle:
-                                render_data[var_name] = client_bundle[source]
-                                logger.debug(f"[MAPPING] {var_name} <- {source} = {client_bundle[source][:50] if client_bundle[source] else 'empty'}")
-                            # Try lowercase match
-                            elif source.lower() in client_bundle:
-                                render_data[var_name] = client_bundle[source.lower()]
-                            # Try with underscores
-                            elif source.lower().replace(' ', '_') in client_bundle:
-                                render_data[var_name] = client_bundle[source.lower().replace(' ', '_')]
-                            else:
-                                logger.warning(f"[MAPPING] Field '{source}' not found in client bundle for variable '{var_name}'")
-                
-                # Apply profile mappings for PDF templates
-                if mapping.get("pdfFields"):
-                    for var_name, source_info in mapping["pdfFields"].items():
-                        source = source_info.get("source", "")
-                        if source and source not in ['__LEAVE_BLANK__', '__STAFF_INPUT__']:
-                            # Try exact match first
-                            if source in client_bundle:
-                                render_data[var_name] = client_bundle[source]
-                            # Try lowercase match
-                            elif source.lower() in client_bundle:
-                                render_data[var_name] = client_bundle[source.lower()]
-                            # Try with underscores
-                            elif source.lower().replace(' ', '_') in client_bundle:
-                                render_data[var_name] = client_bundle[source.lower().replace(' ', '_')]
-                            else:
-                                logger.warning(f"[MAPPING] PDF field '{source}' not found in client bundle for field '{var_name}'")
-                
-                # Apply staff inputs (these override or fill unmapped fields)
-                for var_name, value in staff_inputs.items():
-                    if value:  # Only apply non-empty values
-                        render_data[var_name] = value
-                
-                # Generate output filename
-                filename_pattern = output_rules.get("fileNamePattern", "{clientname} - {templateName} - {yyyy}-{mm}-{dd}")
-                base_filename = generate_output_filename(filename_pattern, render_data, template["name"])
-                
-                # Generate document based on type
-                result = {
-                    "success": True,
-                    "template_id": template_id,
-                    "template_name": template["name"],
-                    "client_name": render_data.get("clientname", "Unknown")
-                }
-                
-                if template["type"] == "DOCX":
-                    output_path = output_dir / f"{base_filename}.docx"
-                    render_docx_template(template["file_path"], render_data, str(output_path))
-                    result["docx_path"] = str(output_path)
-                    result["docx_filename"] = f"{base_filename}.docx"
-                    result["file_type"] = "docx"
-                else:
-                    # PDF filling
-                    output_path = output_dir / f"{base_filename}.pdf"
-                    pdf_field_values = {}
-                    for field in template.get("detected_pdf_fields", []):
-                        field_name = field.get("name")
-                        if field_name in render_data:
-                            pdf_field_values[field_name] = str(render_data[field_name])
-                    fill_pdf_form(template["file_path"], pdf_field_values, str(output_path), False)
-                    result["pdf_path"] = str(output_path)
-                    result["pdf_filename"] = f"{base_filename}.pdf"
-                    result["file_type"] = "pdf"
-                
-                # Upload to Dropbox if requested
-                dropbox_paths = []
-                if save_to_dropbox:
-                    base_folder = dropbox_rules.get("baseFolder", DROPBOX_BASE_FOLDER)
-                    folder_pattern = dropbox_rules.get("folderPattern", "/{clientname}/{yyyy}/{templateName}/")
-                    folder_path = generate_output_filename(folder_pattern, render_data, template["name"])
-                    
-                    file_path = result.get("docx_path") or result.get("pdf_path")
-                    file_name = result.get("docx_filename") or result.get("pdf_filename")
-                    full_dropbox_path = f"{base_folder}{folder_path}{file_name}"
-                    
-                    try:
-                        saved_path = await upload_to_dropbox(file_path, full_dropbox_path)
-                        dropbox_paths.append(saved_path)
-                        result["dropbox_path"] = saved_path
-                    except Exception as e:
-                        result["dropbox_error"] = str(e)
-                
-                # Save generation record with ID
-                doc_id = str(uuid.uuid4())
-                gen_record = {
-                    "id": doc_id,
-                    "client_id": client_id,
-                    "template_id": template_id,
-                    "profile_id": used_profile_id,
-                    "docx_path": result.get("docx_path"),
-                    "pdf_path": result.get("pdf_path"),
-                    "dropbox_paths": dropbox_paths,
-                    "staff_inputs_used": staff_inputs,
-                    "status": "SUCCESS",
-                    "log": f"Generated from template: {template['name']} (batch)",
-                    "created_at": datetime.now(timezone.utc).isoformat()
-                }
-                save_generated_doc_sync(db, gen_record)
-                
-                # Include doc_id in result for download
-                result["doc_id"] = doc_id
-                results.append(result)
-                
-            except Exception as e:
-                logger.error(f"Failed to generate template {template_id}: {e}")
-                errors.append({"template_id": template_id, "error": str(e)})
-        
+        job = await job_manager.submit("generate-batch", request, current_user.get("id"))
         return {
-            "success": len(results) > 0,
-            "total_requested": len(template_ids),
-            "total_generated": len(results),
-            "total_failed": len(errors),
-            "results": results,
-            "errors": errors
+            "job_id": job["id"],
+            "status": job["status"],
+            "status_url": f"/api/documents/jobs/{job['id']}",
+            "events_url": f"/api/documents/jobs/{job['id']}/events"
         }
     
+    async def get_user_job(job_id: str, current_user: dict) -> Dict:
+        job = await job_manager.store.get(job_id)
+        if not job or (job.get("user_id") and job["user_id"] != current_user.get("id")):
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+    
+    @router.get("/jobs")
+    async def list_jobs(current_user: dict = Depends(get_current_user)):
+        """Recent jobs submitted by the current user"""
+        jobs = await job_manager.store.list(current_user.get("id"))
+        return {"jobs": [{k: v for k, v in job.items() if k not in ("payload", "result")} for job in jobs]}
+    
+    @router.get("/jobs/{job_id}")
+    async def get_job(job_id: str, current_user: dict = Depends(get_current_user)):
+        """Job status, counts, per-document results so far, and the final result once finished"""
+        job = await get_user_job(job_id, current_user)
+        items = await job_manager.store.items(job_id)
+        job["results"] = [result for result, _ in items.values() if result]
+        job["errors"] = [error for _, error in items.values() if error]
+        job.pop("payload", None)
+        return job
+    
+    @router.get("/jobs/{job_id}/events")
+    async def stream_job_events(
+        job_id: str,
+        after: int = 0,
+        last_event_id: Optional[str] = Header(None),
+        current_user: dict = Depends(get_current_user)
+    ):
+        """
+        Server-sent events for a job: status changes, progress stages and each
+        finished document. Reconnecting clients resume after Last-Event-ID.
+        """
+        await get_user_job(job_id, current_user)
+        if last_event_id and last_event_id.isdigit():
+            after = int(last_event_id)
+        
+        async def events():
+            seq = after
+            while True:
+                signal = job_manager.listen(job_id)
+                for event in await job_manager.store.events(job_id, seq):
+                    seq = event["seq"]
+                    yield f"id: {seq}\nevent: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+                    if event["event"] == "status" and event["data"].get("status") in FINISHED_STATUSES:
+                        return
+                try:
+                    await asyncio.wait_for(signal.wait(), timeout=15)
+                except asyncio.TimeoutError:
+                    job = await job_manager.store.get(job_id)
+                    if not job or job["status"] in FINISHED_STATUSES:
+                        return
+                    yield ": keepalive\n\n"
+        
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    @router.post("/jobs/{job_id}/cancel")
+    async def cancel_job(job_id: str, current_user: dict = Depends(get_current_user)):
+        """Cancel a queued or running job; documents already generated are kept"""
+        await get_user_job(job_id, current_user)
+        job = await job_manager.cancel(job_id)
+        return {"job_id": job_id, "status": job["status"] if job else None}
+    
     @router.post("/get-batch-variables")
     async def get_batch_variables(
         request: Dict[str, Any],
@@ -1889,6 +2292,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         template_ids = request.get("template_ids", [])
         client_id = request.get("client_id")
         profile_mappings = request.get("profile_mappings", {})
+        bundle_version = request.get("bundle_version")
         
         if not template_ids:
             return {"variables": [], "all_variables": []}
@@ -1899,10 +2303,10 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         staff_input_variables = set()
         
         # Get client bundle if client specified
-        client_bundle = {}
+        client_bundle = ClientBundle()
         if client_id:
             try:
-                client_bundle = await get_client_bundle(client_id)
+                client_bundle = await get_client_bundle(client_id, bundle_version)
             except Exception:
                 pass
         
@@ -1910,7 +2314,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         saved_inputs = {}
         if client_id:
             try:
-                saved_inputs = get_client_staff_inputs_sync(db, client_id)
+                saved_inputs = await get_client_staff_inputs(client_id)
             except Exception:
                 pass
         
@@ -1918,8 +2322,11 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         # Also track the source mapping for each variable (for looking up values)
         variable_source_map = {}  # {var_name: source_field_name}
         
+        templates_by_id = await template_catalog.get_many(template_ids)
+        profiles_by_template = await load_batch_profiles(list(templates_by_id), profile_mappings)
+        
         for template_id in template_ids:
-            template = get_template_sync(db, template_id)
+            template = templates_by_id.get(template_id)
             if not template:
                 continue
             
@@ -1934,53 +2341,29 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
                     all_variables.add(field_name)
             
             # Get mapping - first try from template directly, then fall back to profiles
-            mapping_json = None
+            plan = None
             
             if template.get("mapping_json"):
                 # Mapping stored directly on template
-                mapping_json = template.get("mapping_json")
+                plan = compile_template_mapping(template)
                 logger.info(f"Using mapping from template '{template.get('name')}'")
             else:
                 # Fall back to profile (for backwards compatibility)
-                profile_id = profile_mappings.get(template_id)
-                profile = None
-                
-                if profile_id and profile_id != '__DEFAULT__':
-                    profile = get_mapping_profile_sync(db, profile_id)
-                else:
-                    result = db.table("doc_mapping_profiles").select("*").eq("template_id", template_id).order("created_at", desc=True).limit(1).execute()
-                    profile = result.data[0] if result.data else None
-                    if profile:
-                        logger.info(f"Auto-loaded mapping profile '{profile.get('name')}' for template {template_id}")
+                profile = profiles_by_template.get(template_id)
+                if profile and profile_mappings.get(template_id) in (None, '', '__DEFAULT__'):
+                    logger.info(f"Auto-loaded mapping profile '{profile.get('name')}' for template {template_id}")
                 
                 if profile:
-                    mapping_json = profile.get("mapping_json")
+                    plan = compile_profile_mapping(profile)
             
-            if mapping_json:
-                # Check fields mapping (for DOCX)
-                if mapping_json.get("fields"):
-                    for var_name, source_info in mapping_json["fields"].items():
-                        source = source_info.get("source", "")
-                        if source == "__LEAVE_BLANK__":
-                            # Mark as "leave blank" - doesn't need input
-                            leave_blank_variables.add(var_name)
-                        elif source == "__STAFF_INPUT__":
-                            # Staff input required
-                            staff_input_variables.add(var_name)
-                        elif source and source in client_bundle:
-                            mapped_variables.add(var_name)
-                            variable_source_map[var_name] = source  # Track the mapping
-                # Check pdfFields mapping (for PDF)
-                if mapping_json.get("pdfFields"):
-                    for var_name, source_info in mapping_json["pdfFields"].items():
-                        source = source_info.get("source", "")
-                        if source == "__LEAVE_BLANK__":
-                            leave_blank_variables.add(var_name)
-                        elif source == "__STAFF_INPUT__":
-                            staff_input_variables.add(var_name)
-                        elif source and source in client_bundle:
-                            mapped_variables.add(var_name)
-                            variable_source_map[var_name] = source  # Track the mapping
+            if plan:
+                # "Leave blank" variables don't need input; staff-input ones do
+                leave_blank_variables |= plan.leave_blank
+                staff_input_variables |= plan.staff_input
+                for var_name, source in plan.sources.items():
+                    if client_bundle.resolve_key(source) is not None:
+                        mapped_variables.add(var_name)
+                        variable_source_map[var_name] = source  # Track the mapping
         
         # Determine which variables are available from client bundle
         variables_with_status = []
@@ -1992,7 +2375,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             
             # Get the value: use mapped source if available, otherwise direct lookup
             source_field = variable_source_map.get(var, var)
-            airtable_value = client_bundle.get(source_field, "")
+            airtable_value = client_bundle.resolve(source_field, "")
             saved_value = saved_inputs.get(var, "")
             
             # Airtable data has PRIORITY over saved staff inputs
@@ -2029,28 +2412,14 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         return {
             "variables": variables_with_status,
             "all_variables": sorted(list(all_variables)),
-            "saved_inputs": saved_inputs
+            "saved_inputs": saved_inputs,
+            "bundle_version": client_bundle.get("_bundle_version")
         }
     
     # ==================== DROPBOX FOLDER BROWSING ====================
     
-    def get_dropbox_client_for_user():
-        """
-        Get Dropbox client, handling both personal and Business team accounts.
-        For team accounts, uses DROPBOX_TEAM_MEMBER_ID to specify the user.
-        """
-        dropbox_token = os.environ.get('DROPBOX_ACCESS_TOKEN', '')
-        team_member_id = os.environ.get('DROPBOX_TEAM_MEMBER_ID', '')
-        
-        if not dropbox_token:
-            raise HTTPException(status_code=500, detail="Dropbox not configured. Please set DROPBOX_ACCESS_TOKEN in environment.")
-        
-        if team_member_id:
-            # Business team account - use team member file access
-            return dropbox.DropboxTeam(dropbox_token).as_user(team_member_id)
-        else:
-            # Personal account or team account acting as admin
-            return dropbox.Dropbox(dropbox_token)
+    # Folders come from the in-memory folder tree (see utils/dropbox_folders.py),
+    # which falls back to Dropbox itself until its first sync is done
     
     @router.get("/dropbox/folders")
     async def list_dropbox_folders(
@@ -2059,29 +2428,15 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
     ):
         """List folders in Dropbox for folder selection during save."""
         try:
-            dbx = get_dropbox_client_for_user()
-            
-            # Use root or specified path
-            search_path = path if path else ""
-            
-            result = dbx.files_list_folder(search_path)
-            
-            folders = []
-            for entry in result.entries:
-                if isinstance(entry, dropbox.files.FolderMetadata):
-                    folders.append({
-                        "name": entry.name,
-                        "path": entry.path_display,
-                        "id": entry.id
-                    })
-            
-            # Sort alphabetically
-            folders.sort(key=lambda x: x["name"].lower())
+            # Sorted alphabetically
+            folders = await dropbox_folder_cache.list_folders(path)
             
             return {
                 "current_path": path or "/",
                 "folders": folders
             }
+        except DropboxNotConfigured:
+            raise HTTPException(status_code=500, detail="Dropbox not configured. Please set DROPBOX_ACCESS_TOKEN in environment.")
         except dropbox.exceptions.AuthError as e:
             logger.error(f"Dropbox authentication error: {e}")
             error_msg = str(e)
@@ -2114,25 +2469,13 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         query: str,
         current_user: dict = Depends(get_current_user)
     ):
-        """Search for folders in Dropbox."""
+        """Search for folders in Dropbox by the start of words in their names."""
         try:
-            dbx = get_dropbox_client_for_user()
-            
-            # Search for folders
-            result = dbx.files_search_v2(query)
-            
-            folders = []
-            for match in result.matches:
-                if hasattr(match, 'metadata') and hasattr(match.metadata, 'metadata'):
-                    entry = match.metadata.metadata
-                    if isinstance(entry, dropbox.files.FolderMetadata):
-                        folders.append({
-                            "name": entry.name,
-                            "path": entry.path_display,
-                            "id": entry.id
-                        })
+            folders = await dropbox_folder_cache.search(query)
             
             return {"query": query, "folders": folders}
+        except DropboxNotConfigured:
+            raise HTTPException(status_code=500, detail="Dropbox not configured. Please set DROPBOX_ACCESS_TOKEN in environment.")
         except dropbox.exceptions.AuthError as e:
             logger.error(f"Dropbox authentication error: {e}")
             error_msg = str(e)
@@ -2183,10 +2526,10 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             
             # Update the generated doc record if doc_id provided
             if doc_id:
-                existing_doc = (db.table("generated_docs").select("metadata").eq("id", doc_id).maybe_single().execute()).data
+                existing_doc = await generated_docs_repo.get(doc_id, columns="metadata")
                 dropbox_paths = (existing_doc or {}).get("metadata", {}).get("dropbox_paths", [])
                 dropbox_paths.append(saved_path)
-                db.table("generated_docs").update({"metadata": {**(existing_doc or {}).get("metadata", {}), "dropbox_paths": dropbox_paths}}).eq("id", doc_id).execute()
+                await generated_docs_repo.update(doc_id, {"metadata": {**(existing_doc or {}).get("metadata", {}), "dropbox_paths": dropbox_paths}})
             
             return {"success": True, "dropbox_path": saved_path}
         except Exception as e:
@@ -2282,7 +2625,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
                 "approved_at": None,
                 "approved_by": None
             }
-            db.table("document_approvals").insert(approval_record).execute()
+            await approvals_repo.insert(approval_record)
             approval_records.append(approval_record)
         
         # Build Slack message
@@ -2364,7 +2707,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         current_user: dict = Depends(get_current_user)
     ):
         """Get all document approvals for the review dashboard."""
-        approvals = (db.table("document_approvals").select("*").order("created_at", desc=True).limit(200).execute()).data or []
+        approvals = await approvals_repo.list_recent(limit=200)
         
         return {
             "approvals": approvals,
@@ -2379,7 +2722,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         current_user: dict = Depends(get_current_user)
     ):
         """Get document approval details for preview page."""
-        approval = (db.table("document_approvals").select("*").eq("id", approval_id).maybe_single().execute()).data
+        approval = await approvals_repo.get(approval_id)
         
         if not approval:
             raise HTTPException(status_code=404, detail="Approval record not found")
@@ -2392,7 +2735,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         current_user: dict = Depends(get_current_user)
     ):
         """Approve a document and notify the drafter."""
-        approval = (db.table("document_approvals").select("*").eq("id", approval_id).maybe_single().execute()).data
+        approval = await approvals_repo.get(approval_id)
         
         if not approval:
             raise HTTPException(status_code=404, detail="Approval record not found")
@@ -2402,12 +2745,12 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         
         # Update approval status
         approver_name = current_user.get("name", current_user.get("email", "Attorney"))
-        db.table("document_approvals").update({
+        await approvals_repo.update(approval_id, {
             "status": "APPROVED",
             "metadata": {**(approval.get("metadata") or {}), "approved_at": datetime.now(timezone.utc).isoformat(), "approved_by": approver_name},
             "reviewed_by": approver_name,
             "updated_at": datetime.now(timezone.utc).isoformat()
-        }).eq("id", approval_id).execute()
+        })
         
         # Create notification for drafter
         notification = {
@@ -2424,7 +2767,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
                 "matter_name": approval.get("matter_name")
             }
         }
-        db.table("notifications").insert(notification).execute()
+        await notifications_repo.insert(notification)
         
         # Send Slack DM to drafter (if we have their Slack ID - for now just log)
         logger.info(f"Document approved: {approval.get('template_name')} by {approver_name}")
@@ -2451,9 +2794,9 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         """Get notifications for the current user."""
         user_id = current_user.get("id")
         
-        notifications = (db.table("notifications").select("*").eq("user_id", user_id).order("created_at", desc=True).limit(50).execute()).data or []
+        notifications = await notifications_repo.list_for_user(user_id, limit=50)
         
-        unread_count = len((db.table("notifications").select("id").eq("user_id", user_id).eq("read", False).execute()).data or [])
+        unread_count = await notifications_repo.unread_count(user_id)
         
         return {
             "notifications": notifications,
@@ -2466,7 +2809,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         current_user: dict = Depends(get_current_user)
     ):
         """Mark a notification as read."""
-        db.table("notifications").update({"read": True}).eq("id", notification_id).eq("user_id", current_user.get("id")).execute()
+        await notifications_repo.mark_read(notification_id, current_user.get("id"))
         return {"success": True}
     
     # ==================== DOCUMENT PREVIEW ====================
@@ -2474,10 +2817,15 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
     @router.get("/preview/{approval_id}")
     async def get_document_preview(
         approval_id: str,
+        page: Optional[int] = None,
+        page_size: Optional[int] = None,
         current_user: dict = Depends(get_current_user)
     ):
-        """Get document content for preview. Returns text content extracted from DOCX."""
-        approval = (db.table("document_approvals").select("*").eq("id", approval_id).maybe_single().execute()).data
+        """Get document content for preview. Returns text content extracted from DOCX or PDF,
+        all of it or, with `page`, page_size PDF pages or DOCX paragraphs at a time."""
+        if (page is not None and page < 1) or (page_size is not None and page_size < 1):
+            raise HTTPException(status_code=400, detail="page and page_size must be at least 1")
+        approval = await approvals_repo.get(approval_id)
         
         if not approval:
             raise HTTPException(status_code=404, detail="Approval record not found")
@@ -2492,59 +2840,8 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             }
         
         try:
-            # Extract text content from DOCX
-            if local_path.endswith('.docx'):
-                from docx import Document
-                doc = Document(local_path)
-                
-                paragraphs = []
-                for para in doc.paragraphs:
-                    if para.text.strip():
-                        paragraphs.append({
-                            "type": "paragraph",
-                            "text": para.text,
-                            "style": para.style.name if para.style else "Normal"
-                        })
-                
-                # Also extract tables
-                tables = []
-                for table in doc.tables:
-                    table_data = []
-                    for row in table.rows:
-                        row_data = [cell.text for cell in row.cells]
-                        table_data.append(row_data)
-                    tables.append(table_data)
-                
-                return {
-                    "success": True,
-                    "file_type": "docx",
-                    "paragraphs": paragraphs,
-                    "tables": tables,
-                    "filename": os.path.basename(local_path)
-                }
-            
-            elif local_path.endswith('.pdf'):
-                # For PDF, we can extract text using pypdf
-                reader = PdfReader(local_path)
-                pages = []
-                for page in reader.pages:
-                    text = page.extract_text()
-                    if text:
-                        pages.append(text)
-                
-                return {
-                    "success": True,
-                    "file_type": "pdf",
-                    "pages": pages,
-                    "page_count": len(reader.pages),
-                    "filename": os.path.basename(local_path)
-                }
-            
-            else:
-                return {
-                    "success": False,
-                    "error": "Unsupported file type"
-                }
+            content = await preview_cache.preview(local_path, page, page_size)
+            return {**content, "filename": display_name(local_path)}
                 
         except Exception as e:
             logger.error(f"Failed to extract document preview: {e}")
@@ -2556,11 +2853,15 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
     @router.get("/preview-generated/{doc_id}")
     async def get_generated_document_preview(
         doc_id: str,
+        page: Optional[int] = None,
+        page_size: Optional[int] = None,
         current_user: dict = Depends(get_current_user)
     ):
-        """Get preview of a generated document by its ID."""
+        """Get preview of a generated document by its ID, paged like /preview."""
+        if (page is not None and page < 1) or (page_size is not None and page_size < 1):
+            raise HTTPException(status_code=400, detail="page and page_size must be at least 1")
         # Find the generated document
-        doc = (db.table("generated_docs").select("*").eq("id", doc_id).maybe_single().execute()).data
+        doc = await generated_docs_repo.get(doc_id)
         
         if not doc:
             return {
@@ -2576,58 +2877,11 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
                 "success": False,
                 "error": "Document file not found on server"
             }
+        await generated_storage.touch(local_path)
         
         try:
-            if local_path.endswith('.docx'):
-                from docx import Document
-                document = Document(local_path)
-                
-                paragraphs = []
-                for para in document.paragraphs:
-                    if para.text.strip():
-                        paragraphs.append({
-                            "type": "paragraph",
-                            "text": para.text,
-                            "style": para.style.name if para.style else "Normal"
-                        })
-                
-                tables = []
-                for table in document.tables:
-                    table_data = []
-                    for row in table.rows:
-                        row_data = [cell.text for cell in row.cells]
-                        table_data.append(row_data)
-                    tables.append(table_data)
-                
-                return {
-                    "success": True,
-                    "file_type": "docx",
-                    "paragraphs": paragraphs,
-                    "tables": tables,
-                    "filename": os.path.basename(local_path)
-                }
-            
-            elif local_path.endswith('.pdf'):
-                reader = PdfReader(local_path)
-                pages = []
-                for page in reader.pages:
-                    text = page.extract_text()
-                    if text:
-                        pages.append(text)
-                
-                return {
-                    "success": True,
-                    "file_type": "pdf",
-                    "pages": pages,
-                    "page_count": len(reader.pages),
-                    "filename": os.path.basename(local_path)
-                }
-            
-            else:
-                return {
-                    "success": False,
-                    "error": "Unsupported file type"
-                }
+            content = await preview_cache.preview(local_path, page, page_size)
+            return {**content, "filename": display_name(local_path)}
                 
         except Exception as e:
             logger.error(f"Failed to extract document preview: {e}")
@@ -2649,7 +2903,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         These require confirmation before use.
         """
         # Get saved staff inputs
-        inputs_doc = (db.table("client_staff_inputs").select("*").eq("client_id", client_id).maybe_single().execute()).data
+        inputs_doc = await staff_inputs_repo.get(client_id)
         
         if not inputs_doc:
             return {
@@ -2698,11 +2952,11 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         labels = request.get("labels", {})
         
         # Update the staff inputs with confirmed values
-        db.table("client_staff_inputs").upsert({
+        await staff_inputs_repo.upsert({
             "client_id": client_id,
             "inputs": {**confirmed_inputs, "__labels": labels, "__last_confirmed": datetime.now(timezone.utc).isoformat(), "__confirmed_by": current_user.get("email")},
             "updated_at": datetime.now(timezone.utc).isoformat()
-        }, on_conflict="client_id").execute()
+        })
         
         return {
             "success": True,
@@ -2724,7 +2978,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         labels = request.get("labels", {})
         
         # Update existing inputs, preserving any that aren't being updated
-        existing = (db.table("client_staff_inputs").select("*").eq("client_id", client_id).maybe_single().execute()).data
+        existing = await staff_inputs_repo.get(client_id)
         
         if existing:
             merged_inputs = {**existing.get("inputs", {}), **inputs}
@@ -2733,11 +2987,11 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             merged_inputs = inputs
             merged_labels = labels
         
-        db.table("client_staff_inputs").upsert({
+        await staff_inputs_repo.upsert({
             "client_id": client_id,
             "inputs": {**merged_inputs, "__labels": merged_labels, "__updated_by": current_user.get("email")},
             "updated_at": datetime.now(timezone.utc).isoformat()
-        }, on_conflict="client_id").execute()
+        })
         
         return {
             "success": True,
@@ -2752,7 +3006,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         request: Dict[str, Any] = {},
         current_user: dict = Depends(get_current_user)
     ):
-        approval = (db.table("document_approvals").select("*").eq("id", approval_id).maybe_single().execute()).data
+        approval = await approvals_repo.get(approval_id)
         if not approval:
             raise HTTPException(status_code=404, detail="Approval record not found")
         if approval.get("status") == "DENIED":
@@ -2760,13 +3014,13 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
 
         reviewer_name = current_user.get("name", current_user.get("email", "Attorney"))
         comments = request.get("comments", "")
-        db.table("document_approvals").update({
+        await approvals_repo.update(approval_id, {
             "status": "DENIED",
             "comments": comments,
             "metadata": {**(approval.get("metadata") or {}), "denied_at": datetime.now(timezone.utc).isoformat(), "denied_by": reviewer_name},
             "reviewed_by": reviewer_name,
             "updated_at": datetime.now(timezone.utc).isoformat()
-        }).eq("id", approval_id).execute()
+        })
 
         notification = {
             "id": str(uuid.uuid4()),
@@ -2778,7 +3032,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             "created_at": datetime.now(timezone.utc).isoformat(),
             "data": {"approval_id": approval_id, "template_name": approval.get("template_name"), "matter_name": approval.get("matter_name"), "comments": comments}
         }
-        db.table("notifications").insert(notification).execute()
+        await notifications_repo.insert(notification)
 
         slack_channel = get_slack_channel()
         try:
@@ -2804,11 +3058,11 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
         client_id = request.get("client_id")
         field_values = request.get("field_values", {})
 
-        template_data = (db.table("doc_templates").select("*").eq("id", template_id).maybe_single().execute()).data
+        template_data = await templates_repo.get(template_id)
         if not template_data:
             raise HTTPException(status_code=404, detail="Template not found")
 
-        file_path = ensure_template_file_exists_sync(template_data)
+        file_path = await ensure_template_file_exists(template_data)
         if not file_path:
             raise HTTPException(status_code=404, detail="Template file not found")
 
@@ -2847,8 +3101,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             output_bytes = dl_resp.content
 
         output_filename = generate_output_filename(template_data.get("name", "document"), field_values.get("client_name", "Client"))
-        output_path = TEMPLATES_DIR / "generated" / output_filename
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path = generated_storage.allocate(output_filename, client_id)
         with open(output_path, "wb") as f:
             f.write(output_bytes)
 
@@ -2868,7 +3121,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             },
             "created_at": datetime.now(timezone.utc).isoformat()
         }
-        db.table("generated_docs").insert(doc_record).execute()
+        await save_generated_doc(doc_record)
 
         return {"success": True, "doc_id": doc_record["id"], "file_path": str(output_path), "filename": output_filename}
 
@@ -2912,8 +3165,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
 
         template_name = request.get("template_name", "document")
         output_filename = generate_output_filename(template_name, field_values.get("client_name", "Client"))
-        output_path = TEMPLATES_DIR / "generated" / output_filename
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path = generated_storage.allocate(output_filename, client_id)
         with open(output_path, "wb") as f:
             f.write(output_bytes)
 
@@ -2934,7 +3186,7 @@ def create_document_routes(sb: SupabaseClient, get_current_user):
             },
             "created_at": datetime.now(timezone.utc).isoformat()
         }
-        db.table("generated_docs").insert(doc_record).execute()
+        await save_generated_doc(doc_record)
 
         return {"success": True, "doc_id": doc_record["id"], "file_path": str(output_path), "filename": output_filename}
 
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Query, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Query, UploadFile, File, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
@@ -12,11 +12,14 @@ from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime, timezone, timedelta
 import jwt
+import hashlib
+import hmac
 import httpx
 import base64
 import aiofiles
 import asyncio
 from contextlib import asynccontextmanager
+from email.utils import format_datetime, parsedate_to_datetime
 
 ROOT_DIR = Path(__file__).parent
 PROJECT_ROOT = ROOT_DIR.parent
@@ -40,15 +43,56 @@ AIRTABLE_BASE_ID = os.environ.get('AIRTABLE_BASE_ID', '')
 AIRTABLE_BASE_URL = f"https://api.airtable.com/v0/{AIRTABLE_BASE_ID}"
 JWT_SECRET = os.environ.get('JWT_SECRET', 'default-secret-key')
 
-app = FastAPI(title="Illinois Estate Law Staff Portal API")
+from utils.passwords import password_hasher
+from utils.db import database, task_dates_repo
+from utils.template_catalog import template_catalog
+from utils.airtable import airtable_client
+from utils.bundle_cache import client_bundle_cache
+from utils.docx_cache import docx_template_cache
+from utils.docx_scan import docx_variable_scanner
+from utils.render_engine import render_engine
+from utils.jobs import job_manager
+from utils.generated_storage import generated_storage
+from utils.pdf_fill import pdf_fill_engine
+from utils.pdf_convert import pdf_converter
+from utils.dropbox_upload import dropbox_uploader
+from utils.dropbox_folders import dropbox_folder_cache
+from utils.preview_cache import preview_cache
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await render_engine.start()
+    await pdf_converter.start()
+    await job_manager.start()
+    generated_storage.start()
+    dropbox_folder_cache.start()
+    yield
+    await dropbox_folder_cache.shutdown()
+    await preview_cache.shutdown()
+    await judge_cache.shutdown()
+    await generated_storage.shutdown()
+    await job_manager.shutdown()
+    render_engine.shutdown()
+    pdf_converter.shutdown()
+    password_hasher.shutdown()
+    database.shutdown()
+    await airtable_client.close()
+
+app = FastAPI(title="Illinois Estate Law Staff Portal API", lifespan=lifespan)
 
 api_router = APIRouter(prefix="/api")
 airtable_router = APIRouter(prefix="/api/airtable", tags=["Airtable"])
 webhooks_router = APIRouter(prefix="/api/webhooks", tags=["Webhooks"])
+calendar_router = APIRouter(prefix="/api/calendar", tags=["Calendar"])
 
-from routers.auth import router as auth_router, init_auth, get_current_user
+from routers.auth import router as auth_router, init_auth, get_current_user, load_token_user
 init_auth(supabase, JWT_SECRET)
 
+from utils.calendar_feed import calendar_feed_cache, FIRM_FEED_KEY
+from utils.judge_cache import JudgeInformationCache, StandingOrderMirror, STANDING_ORDERS_URL_PREFIX
+
+judge_cache = JudgeInformationCache(StandingOrderMirror(UPLOADS_DIR / "standing_orders"))
+
 security = HTTPBearer()
 
 # Configure logging
@@ -269,8 +313,8 @@ class WebhookPayload(BaseModel):
 @api_router.get("/task-dates/{case_id}")
 async def get_task_dates(case_id: str, current_user: dict = Depends(get_current_user)):
     try:
-        result = supabase.table("task_completion_dates").select("*").eq("case_id", case_id).execute()
-        dates_dict = {td["task_key"]: td for td in (result.data or [])}
+        rows = await task_dates_repo.list_for_case(case_id)
+        dates_dict = {td["task_key"]: td for td in rows}
         return {"task_dates": dates_dict}
     except Exception as e:
         logger.error(f"Failed to get task dates: {str(e)}")
@@ -287,17 +331,17 @@ async def save_task_date(case_id: str, data: dict, current_user: dict = Depends(
 
         if task_status in ["Done", "Not Applicable", "Yes", "Filed", "Dispatched & Complete"]:
             completion_date = datetime.now(timezone.utc).isoformat()
-            supabase.table("task_completion_dates").upsert({
+            await task_dates_repo.upsert({
                 "case_id": case_id,
                 "task_key": task_key,
                 "status": task_status,
                 "completion_date": completion_date,
                 "updated_by": current_user.get("email"),
                 "updated_at": completion_date
-            }, on_conflict="case_id,task_key").execute()
+            })
             return {"success": True, "completion_date": completion_date}
         else:
-            supabase.table("task_completion_dates").delete().eq("case_id", case_id).eq("task_key", task_key).execute()
+            await task_dates_repo.delete(case_id, task_key)
             return {"success": True, "completion_date": None}
     except HTTPException:
         raise
@@ -308,49 +352,41 @@ async def save_task_date(case_id: str, data: dict, current_user: dict = Depends(
 async def airtable_request(method: str, endpoint: str, data: Optional[Dict] = None) -> Dict:
     """Make request to Airtable API"""
     url = f"{AIRTABLE_BASE_URL}/{endpoint}"
-    headers = {
-        "Authorization": f"Bearer {AIRTABLE_API_KEY}",
-        "Content-Type": "application/json"
-    }
+    if method not in ("GET", "POST", "PATCH", "DELETE"):
+        raise ValueError(f"Unsupported method: {method}")
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            if method == "GET":
-                response = await client.get(url, headers=headers)
-            elif method == "POST":
-                response = await client.post(url, headers=headers, json=data)
-            elif method == "PATCH":
-                response = await client.patch(url, headers=headers, json=data)
-            elif method == "DELETE":
-                response = await client.delete(url, headers=headers)
-            else:
-                raise ValueError(f"Unsupported method: {method}")
-            
-            if response.status_code == 429:
-                raise HTTPException(status_code=429, detail="Airtable rate limit exceeded. Please try again later.")
-            
-            if response.status_code == 403:
-                error_data = response.json() if response.text else {}
-                error_msg = error_data.get("error", {}).get("message", "Insufficient permissions")
-                logger.error(f"Airtable 403 error: {error_msg} - URL: {url}")
-                raise HTTPException(status_code=403, detail=f"Permission denied: {error_msg}. The record may not be accessible with current API credentials.")
-            
-            if response.status_code == 404:
-                raise HTTPException(status_code=404, detail="Record or table not found in Airtable.")
-            
-            if response.status_code == 422:
-                error_data = response.json() if response.text else {}
-                error_msg = error_data.get("error", {}).get("message", "Invalid field names or data format")
-                raise HTTPException(status_code=422, detail=f"Airtable validation error: {error_msg}")
-            
-            response.raise_for_status()
-            return response.json() if response.text else {}
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Airtable API error: {e.response.text}")
-            raise HTTPException(status_code=e.response.status_code, detail=f"Airtable error: {e.response.text}")
-        except httpx.RequestError as e:
-            logger.error(f"Airtable request error: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Failed to connect to Airtable: {str(e)}")
+    try:
+        response = await airtable_client.send(method, endpoint, data)
+        
+        # Any write may change a matter's bundle or a record linked into one
+        if method != "GET" and response.status_code < 400:
+            client_bundle_cache.invalidate_from_write(endpoint, data, response.text)
+        
+        if response.status_code == 429:
+            raise HTTPException(status_code=429, detail="Airtable rate limit exceeded. Please try again later.")
+        
+        if response.status_code == 403:
+            error_data = response.json() if response.text else {}
+            error_msg = error_data.get("error", {}).get("message", "Insufficient permissions")
+            logger.error(f"Airtable 403 error: {error_msg} - URL: {url}")
+            raise HTTPException(status_code=403, detail=f"Permission denied: {error_msg}. The record may not be accessible with current API credentials.")
+        
+        if response.status_code == 404:
+            raise HTTPException(status_code=404, detail="Record or table not found in Airtable.")
+        
+        if response.status_code == 422:
+            error_data = response.json() if response.text else {}
+            error_msg = error_data.get("error", {}).get("message", "Invalid field names or data format")
+            raise HTTPException(status_code=422, detail=f"Airtable validation error: {error_msg}")
+        
+        response.raise_for_status()
+        return response.json() if response.text else {}
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Airtable API error: {e.response.text}")
+        raise HTTPException(status_code=e.response.status_code, detail=f"Airtable error: {e.response.text}")
+    except httpx.RequestError as e:
+        logger.error(f"Airtable request error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to connect to Airtable: {str(e)}")
 
 # ==================== AIRTABLE ROUTES ====================
 
@@ -358,12 +394,34 @@ async def airtable_request(method: str, endpoint: str, data: Optional[Dict] = No
 @airtable_router.get("/cache/status")
 async def get_cache_status(current_user: dict = Depends(get_current_user)):
     """Get current cache status"""
-    return airtable_cache.get_cache_status()
+    return {
+        **airtable_cache.get_cache_status(),
+        "calendar_feed": calendar_feed_cache.get_cache_status(),
+        "judges": judge_cache.get_cache_status(),
+        "templates": template_catalog.get_cache_status(),
+        "airtable_client": airtable_client.get_stats(),
+        "client_bundles": client_bundle_cache.get_cache_status(),
+        "docx_templates": docx_template_cache.get_stats(),
+        "docx_scans": docx_variable_scanner.get_stats(),
+        "render_engine": render_engine.get_stats(),
+        "pdf_templates": pdf_fill_engine.get_stats(),
+        "pdf_converter": pdf_converter.get_stats(),
+        "dropbox_uploads": dropbox_uploader.get_stats(),
+        "dropbox_folders": dropbox_folder_cache.get_stats(),
+        "previews": preview_cache.get_stats(),
+        "jobs": job_manager.get_stats(),
+        "generated_storage": await generated_storage.get_stats(),
+        "database": database.get_stats()
+    }
 
 @airtable_router.post("/cache/refresh")
 async def refresh_cache(current_user: dict = Depends(get_current_user)):
     """Force refresh all cached data from Airtable"""
     await airtable_cache.refresh_all()
+    calendar_feed_cache.invalidate()
+    judge_cache.invalidate()
+    template_catalog.invalidate()
+    client_bundle_cache.clear()
     return {"success": True, "status": airtable_cache.get_cache_status()}
 
 # ==================== CACHED ENDPOINTS (USE THESE FOR DROPDOWNS) ====================
@@ -577,6 +635,7 @@ async def create_date_deadline(data: DateDeadlineCreate, current_user: dict = De
     
     try:
         result = await airtable_request("POST", "Dates%20%26%20Deadlines", {"fields": fields})
+        calendar_feed_cache.invalidate()
         return result
     except HTTPException as e:
         logger.error(f"Failed to create deadline: {str(e)}")
@@ -594,12 +653,14 @@ async def update_date_deadline(record_id: str, record: AirtableRecordUpdate, cur
             processed_fields[key] = value
     
     result = await airtable_request("PATCH", f"Dates%20%26%20Deadlines/{record_id}", {"fields": processed_fields})
+    calendar_feed_cache.invalidate()
     return result
 
 @airtable_router.delete("/dates-deadlines/{record_id}")
 async def delete_date_deadline(record_id: str, current_user: dict = Depends(get_current_user)):
     """Delete a date/deadline record"""
     await airtable_request("DELETE", f"Dates%20%26%20Deadlines/{record_id}")
+    calendar_feed_cache.invalidate()
     return {"status": "deleted", "id": record_id}
 
 # Case Contacts
@@ -1784,52 +1845,81 @@ async def get_payments_without_date(current_user: dict = Depends(get_current_use
         logger.error(f"Failed to get payments without date: {str(e)}")
         return {"payments": [], "error": str(e)}
 
+STANDING_ORDER_AUDIENCE = "standing-order"
+STANDING_ORDER_LINK_TTL_SECONDS = int(os.environ.get('STANDING_ORDER_LINK_TTL_SECONDS', '3600'))
+# Links are opened by the browser without an Authorization header, so they carry their own token
+STANDING_ORDER_SECRET = hmac.new(JWT_SECRET.encode(), b"standing-order", hashlib.sha256).hexdigest()
+
+def sign_standing_order_url(url: Optional[str]) -> Optional[str]:
+    """Add a short-lived token to a mirrored standing-order link; Airtable URLs pass through"""
+    if not url or not url.startswith(STANDING_ORDERS_URL_PREFIX + "/"):
+        return url
+    payload = {
+        "sub": url.rsplit("/", 1)[1],
+        "aud": STANDING_ORDER_AUDIENCE,
+        "exp": datetime.now(timezone.utc) + timedelta(seconds=STANDING_ORDER_LINK_TTL_SECONDS)
+    }
+    return f"{url}?token={jwt.encode(payload, STANDING_ORDER_SECRET, algorithm='HS256')}"
+
 # Get Judge Information
 @airtable_router.get("/judge-information")
 async def get_judge_information(current_user: dict = Depends(get_current_user)):
-    """Get all judge information records"""
+    """Get all judge information records (served from the judge cache)"""
     try:
-        endpoint = "Judge%20Information?maxRecords=100"
-        result = await airtable_request("GET", endpoint)
-        records = result.get("records", [])
-        
-        judges = []
-        for r in records:
-            fields = r.get("fields", {})
-            # Handle Standing Orders attachment
-            standing_orders = fields.get("Standing Orders", [])
-            standing_orders_url = standing_orders[0].get("url") if standing_orders and len(standing_orders) > 0 else None
-            standing_orders_filename = standing_orders[0].get("filename") if standing_orders and len(standing_orders) > 0 else None
-            
-            # Get Master List linked records
-            master_list = fields.get("Master List", [])
-            master_list_count = len(master_list) if isinstance(master_list, list) else 0
-            
-            judges.append({
-                "id": r.get("id"),
-                "name": fields.get("Name"),
-                "county": fields.get("County"),
-                "courtroom": fields.get("Courtroom"),
-                "calendar": fields.get("Calendar"),
-                "email": fields.get("Email"),
-                "zoom_information": fields.get("Zoom Information"),
-                "standing_orders_url": standing_orders_url,
-                "standing_orders_filename": standing_orders_filename,
-                "master_list_count": master_list_count,
-                "master_list_ids": master_list if isinstance(master_list, list) else [],
-                "area_of_law": fields.get("Area of Law"),
-                "open_close_on_zoom": fields.get("Open/Close on Zoom?", False),
-                "courtesy_copies_needed": fields.get("Courtesy Copies Needed?", False)
-            })
-        
-        # Sort by name
-        judges.sort(key=lambda x: x.get("name") or "")
-        
+        judges = await judge_cache.get_judges()
+        judges = [
+            {**judge, "standing_orders_url": sign_standing_order_url(judge["standing_orders_url"])}
+            for judge in judges
+        ]
         return {"judges": judges}
     except Exception as e:
         logger.error(f"Failed to get judge information: {str(e)}")
         return {"judges": [], "error": str(e)}
 
+# Get matters linked to a judge
+@airtable_router.get("/judge-information/{record_id}/matters")
+async def get_judge_matters(record_id: str, current_user: dict = Depends(get_current_user)):
+    """Get the Master List records linked to a judge"""
+    matter_ids = await judge_cache.get_matter_ids(record_id)
+    if matter_ids is None:
+        raise HTTPException(status_code=404, detail="Judge not found")
+
+    master_list = await airtable_cache.get_master_list()
+    by_id = {r.get("id"): r for r in master_list}
+    matters = []
+    for matter_id in matter_ids:
+        record = by_id.get(matter_id)
+        if record:
+            matters.append({"id": matter_id, **record.get("fields", {})})
+    return {"matter_ids": matter_ids, "matters": matters}
+
+# Serve a mirrored standing order
+@airtable_router.get("/standing-orders/{digest}")
+async def get_standing_order(digest: str, token: str):
+    """Serve a standing-order PDF from the local content-addressed mirror.
+    The token comes from the signed link in the judge list (see sign_standing_order_url)."""
+    from fastapi.responses import FileResponse
+
+    try:
+        payload = jwt.decode(token, STANDING_ORDER_SECRET, algorithms=["HS256"], audience=STANDING_ORDER_AUDIENCE)
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid or expired link")
+    if payload.get("sub") != digest:
+        raise HTTPException(status_code=401, detail="Invalid or expired link")
+
+    entry = judge_cache.mirror.find_by_digest(digest)
+    file_path = judge_cache.mirror.store.get_path(digest) if entry else None
+    if not file_path:
+        raise HTTPException(status_code=404, detail="Standing order not found")
+
+    return FileResponse(
+        file_path,
+        media_type=entry["type"],
+        filename=entry["filename"],
+        content_disposition_type="inline",
+        headers={"Cache-Control": f"private, max-age={STANDING_ORDER_LINK_TTL_SECONDS}, immutable"}
+    )
+
 # Create Judge
 @airtable_router.post("/judge-information")
 async def create_judge(data: dict, current_user: dict = Depends(get_current_user)):
@@ -1862,6 +1952,7 @@ async def create_judge(data: dict, current_user: dict = Depends(get_current_user
             fields["Master List"] = data.get("master_list")
         
         result = await airtable_request("POST", "Judge%20Information", {"fields": fields})
+        judge_cache.invalidate()
         return {"success": True, "record": result}
     except HTTPException:
         raise
@@ -1906,6 +1997,7 @@ async def update_judge(record_id: str, data: dict, current_user: dict = Depends(
             raise HTTPException(status_code=400, detail="No fields to update")
         
         result = await airtable_request("PATCH", f"Judge%20Information/{record_id}", {"fields": fields})
+        judge_cache.invalidate()
         return {"success": True, "record": result}
     except HTTPException:
         raise
@@ -2243,6 +2335,94 @@ async def send_csa_webhook(data: SendCSARequest, current_user: dict = Depends(ge
             logger.error(f"CSA webhook error: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Failed to send CSA: {str(e)}")
 
+# ==================== CALENDAR FEEDS ====================
+
+CALENDAR_FEED_PURPOSE = "calendar_feed"
+CALENDAR_FEED_AUDIENCE = "calendar-feed"
+# Feed tokens sit in URLs, so they are signed apart from API tokens and never verify as one
+CALENDAR_FEED_SECRET = os.environ.get('CALENDAR_FEED_SECRET') or hmac.new(
+    JWT_SECRET.encode(), b"calendar-feed", hashlib.sha256
+).hexdigest()
+
+def create_calendar_feed_token(user: dict) -> str:
+    """Create a non-expiring token for calendar clients, which cannot send Authorization headers.
+    It is revoked with the user's API tokens (password change, reset or deactivation)."""
+    payload = {
+        "sub": user.get("id"),
+        "ver": user.get("token_version", 0),
+        "purpose": CALENDAR_FEED_PURPOSE,
+        "aud": CALENDAR_FEED_AUDIENCE
+    }
+    return jwt.encode(payload, CALENDAR_FEED_SECRET, algorithm="HS256")
+
+async def load_matter_names() -> Dict[str, str]:
+    """Map Master List record IDs to display names (served from the Airtable cache)"""
+    records = await airtable_cache.get_master_list()
+    return {
+        r.get("id"): r.get("fields", {}).get("Matter Name") or r.get("fields", {}).get("Client") or ""
+        for r in records
+    }
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since for a conditional GET"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return last_modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+@calendar_router.get("/feed-url")
+async def get_calendar_feed_urls(current_user: dict = Depends(get_current_user)):
+    """Get subscription URLs for the personal and firm-wide ICS feeds"""
+    token = create_calendar_feed_token(current_user)
+    return {
+        "personal": f"/api/calendar/feed.ics?token={token}&scope=personal",
+        "firm": f"/api/calendar/feed.ics?token={token}&scope=firm"
+    }
+
+@calendar_router.get("/feed.ics")
+async def get_calendar_feed(
+    request: Request,
+    token: str,
+    scope: str = Query(default="personal", pattern="^(personal|firm)$")
+):
+    """Serve a cached ICS feed of Dates & Deadlines with conditional-GET support"""
+    try:
+        payload = jwt.decode(token, CALENDAR_FEED_SECRET, algorithms=["HS256"], audience=CALENDAR_FEED_AUDIENCE)
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid calendar token")
+    if payload.get("purpose") != CALENDAR_FEED_PURPOSE or not payload.get("sub") or "ver" not in payload:
+        raise HTTPException(status_code=401, detail="Invalid calendar token")
+    user = await load_token_user(payload["sub"], payload["ver"])
+
+    if scope == "firm":
+        feed_key, calendar_name, identities = FIRM_FEED_KEY, "Illinois Estate Law - All Deadlines", []
+    else:
+        feed_key = f"user:{user['id']}"
+        calendar_name = f"Illinois Estate Law - {user.get('name') or user.get('email')}"
+        identities = [user.get("email", ""), user.get("name", "")]
+
+    try:
+        feed = await calendar_feed_cache.get_feed(feed_key, calendar_name, identities, load_matter_names)
+    except Exception as e:
+        logger.error(f"Failed to build calendar feed: {str(e)}")
+        raise HTTPException(status_code=503, detail="Calendar feed temporarily unavailable")
+
+    headers = {
+        "ETag": feed["etag"],
+        "Last-Modified": format_datetime(feed["last_modified"].astimezone(timezone.utc), usegmt=True),
+        "Cache-Control": f"private, max-age={calendar_feed_cache.cache_ttl_seconds}"
+    }
+    if is_not_modified(request, feed["etag"], feed["last_modified"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=feed["body"], media_type="text/calendar; charset=utf-8", headers=headers)
+
 # ==================== GENERAL ROUTES ====================
 
 @api_router.get("/")
@@ -2471,6 +2651,7 @@ app.include_router(api_router)
 app.include_router(auth_router)
 app.include_router(airtable_router)
 app.include_router(webhooks_router)
+app.include_router(calendar_router)
 app.include_router(files_router)
 
 from routers.documents import create_document_routes, router as documents_router
@@ -0,0 +1,144 @@
+"""
+Tests for the Dropbox uploader against a local fake of the Dropbox endpoints.
+Runs offline: the SDK's HTTP session is mounted on an adapter that serves
+upload, upload sessions and finish_batch from memory.
+"""
+import asyncio
+import json
+import os
+import sys
+import uuid
+
+import dropbox
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils.dropbox_upload import DropboxUploader
+
+
+class FakeDropbox(BaseAdapter):
+    """In-memory files and upload sessions, answering like the v2 HTTP API"""
+
+    def __init__(self):
+        super().__init__()
+        self.files = {}
+        self.sessions = {}
+        self.calls = []
+
+    def _metadata(self, path):
+        return {
+            ".tag": "file", "name": path.rsplit("/", 1)[-1], "id": f"id:{uuid.uuid4().hex}",
+            "client_modified": "2026-01-01T00:00:00Z", "server_modified": "2026-01-01T00:00:00Z",
+            "rev": "015f0000000000000000001", "size": len(self.files[path]),
+            "path_lower": path.lower(), "path_display": path
+        }
+
+    def _commit(self, session_id, commit):
+        self.files[commit["path"]] = bytes(self.sessions.pop(session_id))
+        return self._metadata(commit["path"])
+
+    def send(self, request, **kwargs):
+        route = request.url.split("/2/", 1)[1]
+        self.calls.append(route)
+        if "Dropbox-API-Arg" in request.headers:
+            arg, body = json.loads(request.headers["Dropbox-API-Arg"]), request.body or b""
+        else:
+            arg, body = json.loads(request.body or b"null"), b""
+
+        if route == "files/upload":
+            self.files[arg["path"]] = body
+            result = self._metadata(arg["path"])
+        elif route == "files/upload_session/start":
+            session_id = uuid.uuid4().hex
+            self.sessions[session_id] = bytearray(body)
+            result = {"session_id": session_id}
+        elif route == "files/upload_session/append_v2":
+            self.sessions[arg["cursor"]["session_id"]] += body
+            result = None
+        elif route == "files/upload_session/finish":
+            self.sessions[arg["cursor"]["session_id"]] += body
+            result = self._commit(arg["cursor"]["session_id"], arg["commit"])
+        elif route == "files/upload_session/finish_batch_v2":
+            result = {"entries": [
+                {**self._commit(entry["cursor"]["session_id"], entry["commit"]), ".tag": "success"}
+                for entry in arg["entries"]
+            ]}
+        else:
+            raise AssertionError(f"Unexpected Dropbox call: {route}")
+
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["Content-Type"] = "application/json"
+        response._content = json.dumps(result).encode()
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake():
+    return FakeDropbox()
+
+
+@pytest.fixture
+def uploader(fake):
+    def client_factory():
+        session = requests.Session()
+        session.mount("https://", fake)
+        return dropbox.Dropbox("test-token", session=session)
+    return DropboxUploader(client_factory=client_factory)
+
+
+def write_file(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(os.urandom(size))
+    return str(path)
+
+
+def test_small_file_uploads_in_one_call(fake, uploader, tmp_path):
+    path = write_file(tmp_path, "small.docx", 1000)
+    saved = asyncio.run(uploader.upload(path, "Clients/Wong/small.docx"))
+    assert saved == "/Clients/Wong/small.docx"
+    assert fake.calls == ["files/upload"]
+    with open(path, "rb") as f:
+        assert fake.files[saved] == f.read()
+
+
+def test_large_file_uploads_in_chunks(fake, uploader, tmp_path):
+    uploader.chunk_size = 1024
+    path = write_file(tmp_path, "large.pdf", 5000)
+    saved = asyncio.run(uploader.upload(path, "/Clients/Wong/large.pdf"))
+    assert fake.calls[0] == "files/upload_session/start"
+    assert fake.calls.count("files/upload_session/append_v2") == 4
+    assert fake.calls[-1] == "files/upload_session/finish"
+    with open(path, "rb") as f:
+        assert fake.files[saved] == f.read()
+
+
+def test_packet_commits_once(fake, uploader, tmp_path):
+    uploader.chunk_size = 1024
+    sizes = {"a.docx": 300, "b.docx": 3000, "c.pdf": 10}
+
+    async def run():
+        packet = uploader.packet(4)
+
+        async def produce(name):
+            with packet.producer() as uploads:
+                if name is None:
+                    return None
+                return await uploads.upload([(write_file(tmp_path, name, sizes[name]), f"/Batch/{name}")])
+
+        return await asyncio.gather(*(produce(name) for name in [*sizes, None]))
+
+    results = asyncio.run(run())
+    assert results == [["/Batch/a.docx"], ["/Batch/b.docx"], ["/Batch/c.pdf"], None]
+    assert fake.calls.count("files/upload_session/finish_batch_v2") == 1
+    assert "files/upload" not in fake.calls
+    assert {path: len(data) for path, data in fake.files.items()} == {f"/Batch/{n}": s for n, s in sizes.items()}
+    assert uploader.batch_commits == 1
@@ -0,0 +1,84 @@
+"""
+Tests for generated-file retention. Runs offline against a temporary
+directory and index; generated_docs updates are recorded in memory.
+"""
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils import generated_storage as generated_storage_module
+from utils.generated_storage import GeneratedStorage
+
+
+class RecordingDocsRepo:
+    def __init__(self):
+        self.cleared = []
+
+    async def update(self, doc_id, updates):
+        self.cleared.append((doc_id, updates))
+
+    async def clear_file(self, path):
+        self.cleared.append(path)
+
+
+@pytest.fixture
+def docs_repo(monkeypatch):
+    repo = RecordingDocsRepo()
+    monkeypatch.setattr(generated_storage_module, "generated_docs_repo", repo)
+    return repo
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = GeneratedStorage(root=str(tmp_path / "generated"), index_path=str(tmp_path / "index.db"))
+    storage.retention_days = 0
+    storage.quota_bytes = 0
+    yield storage
+    asyncio.run(storage.shutdown())
+
+
+def write_old_file(storage, name, days_old):
+    storage.root.mkdir(parents=True, exist_ok=True)
+    path = storage.root / name
+    path.write_bytes(b"x" * 100)
+    then = time.time() - days_old * 86400
+    os.utime(path, (then, then))
+    return path
+
+
+def test_retention_is_off_by_default(monkeypatch, tmp_path):
+    monkeypatch.delenv("GENERATED_RETENTION_DAYS", raising=False)
+    monkeypatch.delenv("GENERATED_QUOTA_MB", raising=False)
+    storage = GeneratedStorage(root=str(tmp_path / "generated"), index_path=str(tmp_path / "index.db"))
+    assert storage.retention_days == 0
+    assert storage.quota_bytes == 0
+
+
+def test_sweep_leaves_files_alone_when_retention_is_off(storage, docs_repo):
+    paths = [write_old_file(storage, f"old-{i}.docx", days_old=400) for i in range(3)]
+
+    async def run():
+        return [await storage.sweep(), await storage.sweep()]
+
+    assert asyncio.run(run()) == [0, 0]
+    assert all(path.exists() for path in paths)
+    assert docs_repo.cleared == []
+
+
+def test_adopting_sweep_only_reports(storage, docs_repo):
+    storage.retention_days = 90
+    old = write_old_file(storage, "old.docx", days_old=200)
+    recent = write_old_file(storage, "recent.docx", days_old=1)
+
+    async def run():
+        return [await storage.sweep(), await storage.sweep()]
+
+    assert asyncio.run(run()) == [0, 1]
+    assert not old.exists()
+    assert recent.exists()
+    assert docs_repo.cleared == [str(old)]
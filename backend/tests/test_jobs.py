@@ -0,0 +1,110 @@
+"""
+Tests for cancelling background jobs. Runs offline against a temporary
+SQLite job store with one worker.
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils.jobs import CANCELLED, CANCELLING, JobManager
+
+
+async def wait_for_status(manager, job_id, status):
+    for _ in range(200):
+        job = await manager.store.get(job_id)
+        if job["status"] == status:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Job never reached {status}: {job['status']}")
+
+
+def test_cancel_running_job(tmp_path):
+    async def run():
+        manager = JobManager(db_path=str(tmp_path / "jobs.db"), workers=1)
+        started = asyncio.Event()
+
+        async def handler(context):
+            started.set()
+            await asyncio.sleep(60)
+
+        manager.register("slow", handler)
+        await manager.start()
+        job = await manager.submit("slow", {})
+        await started.wait()
+        cancelled = await manager.cancel(job["id"])
+        await manager.shutdown()
+        return cancelled, manager
+
+    cancelled, manager = asyncio.run(run())
+    assert cancelled["status"] == CANCELLED
+    assert manager.cancelled_count == 1
+
+
+def test_cancel_reports_cancelling_while_the_job_unwinds(tmp_path):
+    async def run():
+        manager = JobManager(db_path=str(tmp_path / "jobs.db"), workers=1)
+        manager.cancel_timeout = 0.05
+        started = asyncio.Event()
+
+        async def handler(context):
+            started.set()
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                await asyncio.sleep(0.3)
+                raise
+
+        manager.register("slow", handler)
+        await manager.start()
+        job = await manager.submit("slow", {})
+        await started.wait()
+        cancelled = await manager.cancel(job["id"])
+        finished = await wait_for_status(manager, job["id"], CANCELLED)
+        await manager.shutdown()
+        return cancelled, finished
+
+    cancelled, finished = asyncio.run(run())
+    assert cancelled["status"] == CANCELLING
+    assert finished["status"] == CANCELLED
+
+
+def test_job_cancelled_while_worker_picks_it_up_never_runs(tmp_path):
+    async def run():
+        manager = JobManager(db_path=str(tmp_path / "jobs.db"), workers=1)
+        ran = []
+
+        async def handler(context):
+            ran.append(context.id)
+
+        manager.register("quick", handler)
+        job = await manager.submit("quick", {})
+
+        # Hold the worker's read of the job until the cancel has been recorded
+        store_get = manager.store.get
+        worker_read = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow_get(job_id):
+            row = await store_get(job_id)
+            if not worker_read.is_set():
+                worker_read.set()
+                await release.wait()
+            return row
+
+        manager.store.get = slow_get
+        await manager.start()
+        await worker_read.wait()
+        manager.store.get = store_get
+        cancelled = await manager.cancel(job["id"])
+        release.set()
+        await asyncio.sleep(0.1)
+        final = await manager.store.get(job["id"])
+        await manager.shutdown()
+        return cancelled, final, ran
+
+    cancelled, final, ran = asyncio.run(run())
+    assert cancelled["status"] == CANCELLED
+    assert final["status"] == CANCELLED
+    assert ran == []
@@ -0,0 +1,91 @@
+"""
+Tests for compiled mapping plans and filename templates. Runs offline on
+in-memory client bundles.
+"""
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils.bundle_cache import ClientBundle
+from utils.mapping_plan import (
+    LEAVE_BLANK, STAFF_INPUT, FilenameTemplate, MappingPlan, compile_mapping, filename_template
+)
+
+MAPPING = {
+    "fields": {
+        "client_name": {"source": "Client"},
+        "matter": {"source": "matter name"},
+        "notes": {"source": LEAVE_BLANK},
+        "hearing_room": {"source": STAFF_INPUT},
+        "missing": {"source": "Not In Bundle"},
+    },
+    "pdfFields": {
+        "Name": {"source": "Client"},
+        "Married": {"source": "Is Married", "type": "checkbox"},
+        "Single": {"source": "Is Single", "type": "checkbox"},
+        "County": {"source": "County"},
+    }
+}
+
+BUNDLE = ClientBundle({
+    "Client": "Linda Wong",
+    "Matter Name": "Estate of Wong",
+    "Is Married": "Yes",
+    "Is Single": "false",
+    "County": None,
+})
+
+
+def test_plan_splits_sources_and_markers():
+    plan = MappingPlan(MAPPING)
+    assert plan.fields == [("client_name", "Client"), ("matter", "matter name"), ("missing", "Not In Bundle")]
+    assert plan.leave_blank == {"notes"}
+    assert plan.staff_input == {"hearing_room"}
+    assert [name for name, _, _, _ in plan.pdf_fields] == ["Name", "Married", "Single", "County"]
+    assert plan.has_fields
+    assert not MappingPlan(None).has_fields
+
+
+def test_apply_resolves_normalized_sources():
+    plan = MappingPlan(MAPPING)
+    render_data = {}
+    unresolved = plan.apply(BUNDLE, render_data, include_pdf_fields=False)
+    assert render_data == {"client_name": "Linda Wong", "matter": "Estate of Wong"}
+    assert unresolved == ["missing"]
+
+
+def test_unresolved_pdf_fields_ignore_docx_mappings():
+    mapping = {**MAPPING, "pdfFields": {**MAPPING["pdfFields"], "Spouse": {"source": "Spouse Name"}}}
+    plan = MappingPlan(mapping)
+    # "missing" is a DOCX-only mapping; a PDF fill never uses it
+    assert plan.unresolved_pdf_fields(BUNDLE) == ["Spouse"]
+    assert plan.apply(BUNDLE, {}) == ["missing", "Spouse"]
+
+
+def test_pdf_values_set_checkbox_states():
+    assert MappingPlan(MAPPING).pdf_values(BUNDLE) == {
+        "Name": "Linda Wong", "Married": "/Yes", "Single": "/Off", "County": ""
+    }
+
+
+def test_compiled_plans_are_reused_per_key():
+    first = compile_mapping(MAPPING, ("profile", "p1", "2026-01-01"))
+    assert compile_mapping(MAPPING, ("profile", "p1", "2026-01-01")) is first
+    assert compile_mapping(MAPPING, ("profile", "p1", "2026-02-01")) is not first
+    assert compile_mapping(MAPPING) is not compile_mapping(MAPPING)
+
+
+def test_filename_template_renders_tokens():
+    today = datetime.now()
+    name = FilenameTemplate("{Client} - {templateName} {yyyy}-{mm}-{dd}.docx").render(BUNDLE, "Petition")
+    assert name == f"Linda Wong - Petition {today:%Y}-{today:%m}-{today:%d}.docx"
+
+
+def test_filename_template_keeps_unknown_tokens_and_strips_unsafe_characters():
+    template = filename_template("{matter_name}: {Unknown}/{Client}?")
+    assert template is filename_template("{matter_name}: {Unknown}/{Client}?")
+    assert template.render(BUNDLE, "Petition") == "Estate of Wong {Unknown}Linda Wong"
+    # Non-string values leave the token in place
+    assert template.render({"Client": 42}, "Petition") == "{matter_name} {Unknown}{Client}"
@@ -0,0 +1,67 @@
+"""
+Tests for the streamed ZIP of generated documents. Runs offline on files
+in a temporary directory and reads the result back with zipfile.
+"""
+import io
+import os
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils.zip_stream import StreamingZip
+
+
+def write_file(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(os.urandom(size))
+    return str(path)
+
+
+@pytest.fixture
+def files(tmp_path):
+    return [
+        (write_file(tmp_path, "one.pdf", 0), "Linda Wong - Appearance.pdf"),
+        (write_file(tmp_path, "two.docx", 200 * 1024), "Linda Wong - Petition.docx"),
+        (write_file(tmp_path, "three.pdf", 1000), "Peña - Órden.pdf"),
+    ]
+
+
+def test_streamed_bytes_match_content_length(files):
+    archive = StreamingZip(files)
+    data = b"".join(archive)
+    assert len(data) == archive.content_length
+
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == [arcname for _, arcname in files]
+        for path, arcname in files:
+            with open(path, "rb") as f:
+                assert zf.read(arcname) == f.read()
+
+
+def test_duplicate_names_are_made_unique(tmp_path):
+    files = [
+        (write_file(tmp_path, "a.pdf", 10), "Petition.pdf"),
+        (write_file(tmp_path, "b.pdf", 20), "Petition.pdf"),
+        (write_file(tmp_path, "c.pdf", 30), "Petition (2).pdf"),
+        (write_file(tmp_path, "d.pdf", 40), "Petition.pdf"),
+    ]
+    archive = StreamingZip(files)
+    data = b"".join(archive)
+    assert len(data) == archive.content_length
+
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        names = zf.namelist()
+        assert names == ["Petition.pdf", "Petition (2).pdf", "Petition (2) (2).pdf", "Petition (3).pdf"]
+        assert [zf.getinfo(name).file_size for name in names] == [10, 20, 30, 40]
+
+
+def test_file_growing_after_listing_keeps_declared_length(tmp_path):
+    path = write_file(tmp_path, "growing.pdf", 500)
+    archive = StreamingZip([(path, "growing.pdf")])
+    with open(path, "ab") as f:
+        f.write(b"appended")
+    assert len(b"".join(archive)) == archive.content_length
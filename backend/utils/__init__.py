@@ -1,9 +1,9 @@
 """Backend utilities package"""
 
-from utils.cache import AirtableCache, airtable_cache
+from utils.cache import AirtableCache, TTLCache, airtable_cache
 from utils.airtable import airtable_request, upload_attachment_to_airtable
 
 __all__ = [
-    'AirtableCache', 'airtable_cache',
+    'AirtableCache', 'TTLCache', 'airtable_cache',
     'airtable_request', 'upload_attachment_to_airtable'
 ]
@@ -1,7 +1,8 @@
 """Airtable API utilities for making requests to Airtable"""
 
 from fastapi import HTTPException
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+import asyncio
 import httpx
 import logging
 import os
@@ -13,48 +14,161 @@ AIRTABLE_BASE_ID = os.environ.get('AIRTABLE_BASE_ID', '')
 AIRTABLE_BASE_URL = f"https://api.airtable.com/v0/{AIRTABLE_BASE_ID}"
 
 
+class AirtableRateLimiter:
+    """Spaces requests evenly to stay under Airtable's per-base rate limit"""
+
+    def __init__(self, requests_per_second: float):
+        self.interval = 1.0 / requests_per_second
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+        self.waited_seconds = 0.0
+
+    async def acquire(self):
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        wait = slot - now
+        if wait > 0:
+            self.waited_seconds += wait
+            await asyncio.sleep(wait)
+
+
+class AirtableClient:
+    """One pooled HTTP client for every Airtable call, behind a shared rate limiter.
+
+    Opening a new httpx client per request pays a TLS handshake each time;
+    the shared client keeps connections alive. Requests answered with 429
+    are retried with backoff.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: Optional[float] = None,
+        max_connections: Optional[int] = None,
+        chunk_size: Optional[int] = None
+    ):
+        self.limiter = AirtableRateLimiter(
+            requests_per_second or float(os.environ.get('AIRTABLE_MAX_REQUESTS_PER_SECOND', '5'))
+        )
+        self.max_connections = max_connections or int(os.environ.get('AIRTABLE_MAX_CONNECTIONS', '10'))
+        # Records per RECORD_ID() formula; Airtable pages at 100 and URLs are capped at 16k
+        self.chunk_size = chunk_size or int(os.environ.get('AIRTABLE_RECORD_CHUNK_SIZE', '50'))
+        self.max_retries = 3
+        self._client: Optional[httpx.AsyncClient] = None
+        self.request_count = 0
+        self.retry_count = 0
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers={
+                    'Authorization': f'Bearer {AIRTABLE_API_KEY}',
+                    'Content-Type': 'application/json'
+                },
+                timeout=60.0,
+                limits=httpx.Limits(max_connections=self.max_connections)
+            )
+        return self._client
+
+    async def send(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict] = None,
+        params: Optional[Dict] = None
+    ) -> httpx.Response:
+        """Send one request; the caller interprets the response status"""
+        url = f"{AIRTABLE_BASE_URL}/{endpoint}"
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            self.request_count += 1
+            response = await self.http.request(method, url, json=data, params=params)
+            if response.status_code != 429 or attempt == self.max_retries:
+                return response
+            self.retry_count += 1
+            await asyncio.sleep(2 ** attempt)
+
+    async def get_records(self, table: str, record_ids: List[str]) -> List[Dict]:
+        """Fetch records by id with chunked RECORD_ID() formulas, chunks in parallel.
+
+        Records come back in record_ids order; ids that no longer exist are
+        skipped.
+        """
+        record_ids = list(dict.fromkeys(rid for rid in record_ids if rid))
+        chunks = [record_ids[i:i + self.chunk_size] for i in range(0, len(record_ids), self.chunk_size)]
+
+        async def fetch_chunk(chunk: List[str]) -> List[Dict]:
+            formula = "OR(" + ",".join(f"RECORD_ID()='{rid}'" for rid in chunk) + ")"
+            records = []
+            offset = None
+            while True:
+                params = {"filterByFormula": formula}
+                if offset:
+                    params["offset"] = offset
+                response = await self.send("GET", table, params=params)
+                response.raise_for_status()
+                result = response.json()
+                records.extend(result.get("records", []))
+                offset = result.get("offset")
+                if not offset:
+                    return records
+
+        by_id = {}
+        for records in await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks)):
+            for record in records:
+                by_id[record["id"]] = record
+        return [by_id[rid] for rid in record_ids if rid in by_id]
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def get_stats(self) -> Dict:
+        """Get current client statistics"""
+        return {
+            "requests": self.request_count,
+            "retries": self.retry_count,
+            "rate_limit_wait_seconds": round(self.limiter.waited_seconds, 2),
+            "requests_per_second": round(1.0 / self.limiter.interval, 2)
+        }
+
+
+# Global Airtable client instance
+airtable_client = AirtableClient()
+
+
 async def airtable_request(method: str, endpoint: str, data: Optional[Dict] = None) -> Dict:
     """Make a request to Airtable API"""
     url = f"{AIRTABLE_BASE_URL}/{endpoint}"
-    headers = {
-        'Authorization': f'Bearer {AIRTABLE_API_KEY}',
-        'Content-Type': 'application/json'
-    }
+    if method not in ("GET", "POST", "PATCH", "DELETE"):
+        raise HTTPException(status_code=400, detail=f"Unsupported method: {method}")
     
-    # Use longer timeout for Airtable requests
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        try:
-            if method == "GET":
-                response = await client.get(url, headers=headers)
-            elif method == "POST":
-                response = await client.post(url, headers=headers, json=data)
-            elif method == "PATCH":
-                response = await client.patch(url, headers=headers, json=data)
-            elif method == "DELETE":
-                response = await client.delete(url, headers=headers)
-            else:
-                raise HTTPException(status_code=400, detail=f"Unsupported method: {method}")
-            
-            if response.status_code == 200 or response.status_code == 201:
-                return response.json()
-            elif response.status_code == 404:
-                raise HTTPException(status_code=404, detail="Record not found")
-            elif response.status_code == 422:
-                error_data = response.json()
-                error_message = error_data.get('error', {}).get('message', 'Validation error')
-                logger.error(f"Airtable 422 error: {error_data}")
-                raise HTTPException(status_code=422, detail=error_message)
-            else:
-                logger.error(f"Airtable request failed: {response.status_code} - {response.text}")
-                raise HTTPException(status_code=response.status_code, detail=f"Airtable error: {response.text}")
-        except httpx.TimeoutException:
-            logger.error(f"Airtable request timed out: {method} {url}")
-            raise HTTPException(status_code=504, detail="Request to Airtable timed out")
-        except HTTPException:
-            raise
-        except Exception as e:
-            logger.error(f"Airtable request error: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Airtable request failed: {str(e)}")
+    try:
+        response = await airtable_client.send(method, endpoint, data)
+        
+        if response.status_code == 200 or response.status_code == 201:
+            return response.json()
+        elif response.status_code == 404:
+            raise HTTPException(status_code=404, detail="Record not found")
+        elif response.status_code == 422:
+            error_data = response.json()
+            error_message = error_data.get('error', {}).get('message', 'Validation error')
+            logger.error(f"Airtable 422 error: {error_data}")
+            raise HTTPException(status_code=422, detail=error_message)
+        else:
+            logger.error(f"Airtable request failed: {response.status_code} - {response.text}")
+            raise HTTPException(status_code=response.status_code, detail=f"Airtable error: {response.text}")
+    except httpx.TimeoutException:
+        logger.error(f"Airtable request timed out: {method} {url}")
+        raise HTTPException(status_code=504, detail="Request to Airtable timed out")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Airtable request error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Airtable request failed: {str(e)}")
 
 
 async def upload_attachment_to_airtable(record_id: str, field_name: str, file_data: str, filename: str):
@@ -0,0 +1,159 @@
+"""Content-addressed blob storage keyed by sha256, on local disk with an optional remote backend"""
+
+from pathlib import Path
+from typing import Optional
+import hashlib
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def sha256_bytes(content: bytes) -> str:
+    """Hex sha256 digest of a byte string"""
+    return hashlib.sha256(content).hexdigest()
+
+
+def sha256_file(file_path: str) -> str:
+    """Hex sha256 digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LocalBlobStore:
+    """Stores each distinct blob once on disk under root/ab/cd/<sha256><suffix>.
+
+    Writes go to a temp file in the same directory and are renamed into place,
+    so concurrent writers of the same content never expose a partial file.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, digest: str, suffix: str = "") -> Path:
+        """Location of a blob on disk (whether or not it exists)"""
+        return self.root / digest[:2] / digest[2:4] / f"{digest}{suffix}"
+
+    def exists(self, digest: str, suffix: str = "") -> bool:
+        return self.path_for(digest, suffix).exists()
+
+    def put(self, content: bytes, suffix: str = "") -> str:
+        """Store content and return its sha256; identical content is stored once"""
+        digest = sha256_bytes(content)
+        target = self.path_for(digest, suffix)
+        if target.exists():
+            return digest
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=target.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, target)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        logger.info(f"[BlobStore] Stored blob {digest[:12]} ({len(content)} bytes)")
+        return digest
+
+    def get_path(self, digest: str, suffix: str = "") -> Optional[Path]:
+        """Path of a stored blob, or None if it is not in the store"""
+        target = self.path_for(digest, suffix)
+        return target if target.exists() else None
+
+    def read(self, digest: str, suffix: str = "") -> Optional[bytes]:
+        target = self.get_path(digest, suffix)
+        if target is None:
+            return None
+        with open(target, 'rb') as f:
+            return f.read()
+
+    def delete(self, digest: str, suffix: str = "") -> bool:
+        target = self.path_for(digest, suffix)
+        if target.exists():
+            target.unlink()
+            return True
+        return False
+
+
+class SupabaseStorageBackend:
+    """Remote blob backend on a Supabase Storage bucket, keyed <prefix>/<sha256><suffix>"""
+
+    def __init__(self, client, bucket: str, prefix: str = ""):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+
+    def _key(self, digest: str, suffix: str) -> str:
+        name = f"{digest}{suffix}"
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def put(self, digest: str, content: bytes, suffix: str = ""):
+        self.client.storage.from_(self.bucket).upload(
+            self._key(digest, suffix), content, {"upsert": "true"}
+        )
+
+    def read(self, digest: str, suffix: str = "") -> Optional[bytes]:
+        try:
+            return self.client.storage.from_(self.bucket).download(self._key(digest, suffix))
+        except Exception as e:
+            logger.warning(f"[BlobStore] Remote read failed for {digest[:12]}: {e}")
+            return None
+
+    def delete(self, digest: str, suffix: str = ""):
+        self.client.storage.from_(self.bucket).remove([self._key(digest, suffix)])
+
+
+class BlobStore:
+    """Content-addressed store with a local disk copy and an optional remote backend.
+
+    The local copy is what callers open; the remote backend (if configured)
+    keeps blobs across deployments and refills the local disk on demand.
+    """
+
+    def __init__(self, local: LocalBlobStore, remote=None):
+        self.local = local
+        self.remote = remote
+
+    def put(self, content: bytes, suffix: str = "") -> str:
+        digest = self.local.put(content, suffix)
+        if self.remote is not None:
+            self.remote.put(digest, content, suffix)
+        return digest
+
+    def local_path(self, digest: str, suffix: str = "") -> Optional[Path]:
+        """Local path of a blob, fetching it from the remote backend if needed"""
+        path = self.local.get_path(digest, suffix)
+        if path is not None or self.remote is None:
+            return path
+        content = self.remote.read(digest, suffix)
+        if content is None:
+            return None
+        if sha256_bytes(content) != digest:
+            logger.error(f"[BlobStore] Remote blob {digest[:12]} failed its checksum")
+            return None
+        self.local.put(content, suffix)
+        return self.local.get_path(digest, suffix)
+
+    def exists(self, digest: str, suffix: str = "") -> bool:
+        return self.local_path(digest, suffix) is not None
+
+    def delete(self, digest: str, suffix: str = ""):
+        self.local.delete(digest, suffix)
+        if self.remote is not None:
+            self.remote.delete(digest, suffix)
+
+
+def create_remote_backend(client, prefix: str):
+    """Remote backend selected by BLOB_STORE_BACKEND ("local" or "supabase")"""
+    backend = os.environ.get('BLOB_STORE_BACKEND', 'local').lower()
+    if backend == "supabase" and client is not None:
+        return SupabaseStorageBackend(client, os.environ.get('BLOB_STORE_BUCKET', 'blobs'), prefix)
+    return None
@@ -0,0 +1,218 @@
+"""Cache of assembled client bundles, invalidated by writes to the matter or its linked records"""
+
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+_RECORD_ID_PATTERN = re.compile(r"\brec[A-Za-z0-9]{14}\b")
+
+# Master List fields whose linked records are folded into the bundle
+LINKED_FIELDS = ("Judge", "Case Contacts", "Assets & Debts", "Dates & Deadlines")
+
+# Stamped at build time; they change daily without the matter changing
+_DATE_KEYS = {"currentdate", "yyyy", "mm", "dd", "_bundle_version"}
+
+
+def normalize_key(name: str) -> str:
+    """Case- and separator-insensitive form of a bundle key ('Matter Name' -> 'matter_name')"""
+    return name.lower().replace(' ', '_').replace('-', '_')
+
+
+class ClientBundle(dict):
+    """A client bundle holding each value once, under its Airtable field name
+    or computed key, plus an index from normalized names to those keys.
+
+    Mapping sources may name a field as "Matter Name", "matter name" or
+    "matter_name"; resolve_key() answers all of them with one index lookup.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.key_index: Dict[str, str] = {}
+        self.reindex()
+
+    def reindex(self):
+        """Rebuild the index; later keys win, as in the old flattened bundle"""
+        self.key_index = {normalize_key(key): key for key in self}
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.key_index[normalize_key(key)] = key
+
+    def resolve_key(self, name: str) -> Optional[str]:
+        """The stored key a mapping source refers to, or None"""
+        if name in self:
+            return name
+        return self.key_index.get(normalize_key(name))
+
+    def resolve(self, name: str, default: Any = None) -> Any:
+        key = self.resolve_key(name)
+        return self[key] if key is not None else default
+
+    def render_context(self) -> Dict[str, Any]:
+        """Flat dict for template rendering, with the lower-cased and underscored
+        aliases templates may use; built per render, never cached"""
+        context: Dict[str, Any] = {}
+        for key, value in self.items():
+            context[key.lower()] = value
+            context[normalize_key(key)] = value
+        context.update(self)
+        return context
+
+    def copy(self) -> "ClientBundle":
+        bundle = ClientBundle.__new__(ClientBundle)
+        dict.update(bundle, self)
+        bundle.key_index = dict(self.key_index)
+        return bundle
+
+
+def find_record_ids(*values: Any) -> Set[str]:
+    """Every Airtable record id mentioned in endpoints, payloads or responses"""
+    found: Set[str] = set()
+    for value in values:
+        if value:
+            text = value if isinstance(value, str) else json.dumps(value, default=str)
+            found.update(_RECORD_ID_PATTERN.findall(text))
+    return found
+
+
+class ClientBundleCache:
+    """Client bundles per client_id with a short TTL and a version stamp.
+
+    The version is a digest of the bundle's Airtable data, returned to the
+    caller as "_bundle_version". Passing it back pins generation to exactly
+    the bundle that was previewed, as long as it is retained, even after the
+    current bundle was invalidated. Each bundle records the linked record ids
+    it was built from, so a write to any of them drops the bundle.
+    """
+
+    def __init__(self):
+        self.ttl_seconds = int(os.environ.get('CLIENT_BUNDLE_TTL_SECONDS', '120'))
+        max_size = int(os.environ.get('CLIENT_BUNDLE_CACHE_SIZE', '256'))
+        self.current = TTLCache(max_size=max_size, ttl_seconds=self.ttl_seconds)
+        self.versions = TTLCache(
+            max_size=max_size * 4,
+            ttl_seconds=int(os.environ.get('CLIENT_BUNDLE_VERSION_RETENTION_SECONDS', '1800'))
+        )
+        self.clients_by_record: Dict[str, Set[str]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Bumped by every invalidation so a build that raced one isn't cached
+        self.epoch = 0
+        self.pinned_hits = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def compute_version(bundle: Dict) -> str:
+        data = {k: v for k, v in bundle.items() if k not in _DATE_KEYS}
+        return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+    def _store(self, client_id: str, bundle: Dict, is_current: bool):
+        version = self.compute_version(bundle)
+        bundle["_bundle_version"] = version
+        if is_current:
+            self.current.set(client_id, bundle)
+        self.versions.set((client_id, version), bundle)
+        for record_id in find_record_ids(*(bundle.get(field) for field in LINKED_FIELDS)):
+            self.clients_by_record.setdefault(record_id, set()).add(client_id)
+
+    async def get(
+        self,
+        client_id: str,
+        build: Callable[[str], Awaitable[Dict]],
+        version: Optional[str] = None
+    ) -> Dict:
+        """Bundle for a client: the pinned version if still retained, else the
+        cached current bundle, else a fresh build (shared by concurrent callers)"""
+        if version:
+            pinned = self.versions.get((client_id, version))
+            if pinned is not None:
+                self.pinned_hits += 1
+                return pinned.copy()
+            logger.info(f"[ClientBundleCache] Version {version} of {client_id} no longer retained; rebuilding")
+
+        cached = self.current.get(client_id)
+        if cached is not None:
+            return cached.copy()
+
+        future = self._inflight.get(client_id)
+        if future is None:
+            epoch = self.epoch
+            future = asyncio.ensure_future(build(client_id))
+            self._inflight[client_id] = future
+            try:
+                bundle = await asyncio.shield(future)
+                self._store(client_id, bundle, is_current=epoch == self.epoch)
+            finally:
+                self._inflight.pop(client_id, None)
+        else:
+            bundle = await asyncio.shield(future)
+        return bundle.copy()
+
+    async def get_many(
+        self,
+        client_ids: Iterable[str],
+        build_many: Callable[[List[str]], Awaitable[Dict[str, Dict]]]
+    ) -> Dict[str, Dict]:
+        """Bundles for many clients: cached ones as they are, the rest from one
+        build_many call. Clients build_many doesn't return are omitted."""
+        bundles: Dict[str, Dict] = {}
+        missing = []
+        for client_id in dict.fromkeys(client_ids):
+            cached = self.current.get(client_id)
+            if cached is not None:
+                bundles[client_id] = cached.copy()
+            else:
+                missing.append(client_id)
+        if missing:
+            epoch = self.epoch
+            for client_id, bundle in (await build_many(missing)).items():
+                self._store(client_id, bundle, is_current=epoch == self.epoch)
+                bundles[client_id] = bundle.copy()
+        return bundles
+
+    def invalidate(self, client_id: str):
+        """Drop the current bundle of one client; pinned versions stay retained"""
+        self.current.invalidate(client_id)
+        self.epoch += 1
+        self.invalidations += 1
+
+    def invalidate_records(self, record_ids: Iterable[str]):
+        """Drop bundles of every client that is, or links to, one of these records"""
+        for record_id in record_ids:
+            self.current.invalidate(record_id)
+            for client_id in self.clients_by_record.pop(record_id, set()):
+                self.invalidate(client_id)
+        self.epoch += 1
+
+    def invalidate_from_write(self, endpoint: str, *payloads: Any):
+        """Invalidate from an Airtable write: the record in the endpoint path and
+        any record ids in the request or response (e.g. a new contact's Matter link)"""
+        self.invalidate_records(find_record_ids(endpoint, *payloads))
+
+    def clear(self):
+        self.current.clear()
+        self.epoch += 1
+        self.clients_by_record.clear()
+
+    def get_cache_status(self) -> Dict:
+        """Get current cache status"""
+        return {
+            "ttl_seconds": self.ttl_seconds,
+            "current": self.current.get_stats(),
+            "versions": self.versions.get_stats(),
+            "pinned_hits": self.pinned_hits,
+            "invalidations": self.invalidations,
+            "tracked_records": len(self.clients_by_record)
+        }
+
+
+# Global bundle cache instance
+client_bundle_cache = ClientBundleCache()
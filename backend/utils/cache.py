@@ -1,11 +1,14 @@
-"""Airtable cache utility for caching Master List and Assignees data"""
+"""Cache utilities: Airtable Master List/Assignees cache and a generic TTL/LRU cache"""
 
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional, Hashable
+from collections import OrderedDict
 from datetime import datetime, timezone
 import asyncio
 import httpx
 import logging
 import os
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -134,5 +137,63 @@ class AirtableCache:
         }
 
 
+class TTLCache:
+    """Thread-safe in-process cache with per-entry TTL and LRU eviction"""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 30.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a live entry (marking it recently used) or default"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Store an entry, evicting the least recently used one when full"""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_stats(self) -> Dict:
+        """Get current cache statistics"""
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
 # Global cache instance
 airtable_cache = AirtableCache()
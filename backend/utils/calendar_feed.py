@@ -0,0 +1,314 @@
+"""ICS calendar feeds built from the Airtable Dates & Deadlines table"""
+
+from typing import List, Dict, Optional, Callable, Awaitable
+from datetime import datetime, timezone, timedelta
+import asyncio
+import hashlib
+import logging
+import os
+import re
+
+from utils.airtable import airtable_client
+
+logger = logging.getLogger(__name__)
+
+CALENDAR_PRODID = "-//Illinois Estate Law//Staff Portal//EN"
+CALENDAR_UID_DOMAIN = "illinoisestatelaw.com"
+FIRM_FEED_KEY = "firm"
+
+
+def _escape_text(value: str) -> str:
+    """Escape a TEXT value per RFC 5545 section 3.3.11"""
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold_line(line: str) -> str:
+    """Fold a content line to 75 octets per RFC 5545 section 3.1"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    current = b""
+    limit = 75
+    for char in line:
+        char_bytes = char.encode("utf-8")
+        if len(current) + len(char_bytes) > limit:
+            parts.append(current.decode("utf-8"))
+            current = b""
+            limit = 74  # continuation lines start with a space
+        current += char_bytes
+    parts.append(current.decode("utf-8"))
+    return "\r\n ".join(parts)
+
+
+def _parse_event_date(value: str, all_day: bool):
+    """Parse an Airtable Date value into (start, is_all_day).
+
+    Airtable returns either a plain date (YYYY-MM-DD) or an ISO datetime in UTC.
+    """
+    if not value:
+        return None, all_day
+    try:
+        if len(value) == 10:
+            return datetime.strptime(value, "%Y-%m-%d").date(), True
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        if all_day:
+            return parsed.date(), True
+        return parsed.astimezone(timezone.utc), False
+    except ValueError:
+        logger.warning(f"[CalendarFeed] Unparseable event date: {value}")
+        return None, all_day
+
+
+def _format_stamp(value: str) -> Optional[str]:
+    """Format an Airtable createdTime as a UTC DATE-TIME"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return parsed.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    except ValueError:
+        return None
+
+
+def _split_invitees(value) -> List[str]:
+    """Normalize the free-text Invitee field into lowercase tokens"""
+    if not value:
+        return []
+    if isinstance(value, list):
+        value = ",".join(str(v) for v in value)
+    return [part.strip().lower() for part in re.split(r"[,;/\n]", str(value)) if part.strip()]
+
+
+class CalendarFeedCache:
+    """Deadline index plus pre-rendered ICS feeds.
+
+    Dates & Deadlines are crawled at most once per TTL (or after a write
+    invalidates the index). Each feed is rendered to bytes once per index
+    fingerprint, calendar name and invitee identities, so repeated polls from
+    calendar clients are served from memory and a renamed user gets a new feed.
+    """
+
+    def __init__(self):
+        self.events: List[Dict] = []
+        self.events_updated: Optional[datetime] = None
+        self.fingerprint: Optional[str] = None
+        self.by_invitee: Dict[str, List[int]] = {}
+        self.feeds: Dict[str, Dict] = {}
+        self.cache_ttl_seconds = int(os.environ.get('CALENDAR_FEED_TTL_SECONDS', '300'))
+        self.crawl_count = 0
+        self.render_count = 0
+        self._lock = asyncio.Lock()
+
+    def is_stale(self) -> bool:
+        """Check if the deadline index is stale"""
+        if self.events_updated is None:
+            return True
+        age = (datetime.now(timezone.utc) - self.events_updated).total_seconds()
+        return age > self.cache_ttl_seconds
+
+    def invalidate(self):
+        """Mark the index stale so the next poll re-crawls Dates & Deadlines"""
+        self.events_updated = None
+
+    async def fetch_all_deadlines_from_airtable(self) -> List[Dict]:
+        """Fetch ALL records from Airtable Dates & Deadlines with proper pagination"""
+        all_records = []
+        offset = None
+
+        while True:
+            params = {"offset": offset} if offset else None
+            response = await airtable_client.send("GET", "Dates%20%26%20Deadlines", params=params)
+            if response.status_code != 200:
+                logger.error(f"Airtable request failed: {response.status_code} - {response.text}")
+                raise RuntimeError(f"Dates & Deadlines fetch failed: {response.status_code}")
+
+            data = response.json()
+            all_records.extend(data.get('records', []))
+
+            offset = data.get('offset')
+            if not offset:
+                break
+
+        logger.info(f"[CalendarFeed] Fetched {len(all_records)} dates & deadlines from Airtable")
+        return all_records
+
+    def build_events(self, records: List[Dict], matter_names: Dict[str, str]) -> List[Dict]:
+        """Convert Airtable records into normalized event dicts, sorted by start"""
+        events = []
+        for r in records:
+            fields = r.get('fields', {})
+            all_day_flag = bool(fields.get('All Day Event?') or fields.get('All Day Event'))
+            start, all_day = _parse_event_date(fields.get('Date', ''), all_day_flag)
+            if start is None:
+                continue
+
+            matter_ids = fields.get('Add Client', []) or []
+            names = [matter_names.get(mid, '') for mid in matter_ids if matter_names.get(mid)]
+            title = fields.get('Event') or 'Untitled'
+            if names:
+                title = f"{title} - {', '.join(names)}"
+
+            events.append({
+                "id": r.get('id'),
+                "created": r.get('createdTime', ''),
+                "title": title,
+                "start": start,
+                "all_day": all_day,
+                "location": fields.get('Location', '') or '',
+                "notes": fields.get('Notes', '') or '',
+                "invitees": _split_invitees(fields.get('Invitee')),
+            })
+
+        events.sort(key=lambda e: (e["start"].isoformat(), e["id"] or ""))
+        return events
+
+    def build_index(self, events: List[Dict]) -> Dict[str, List[int]]:
+        """Index events by invitee token for per-user feeds"""
+        index: Dict[str, List[int]] = {}
+        for i, event in enumerate(events):
+            for invitee in event["invitees"]:
+                index.setdefault(invitee, []).append(i)
+        return index
+
+    @staticmethod
+    def compute_fingerprint(events: List[Dict]) -> str:
+        """Stable hash of every field that ends up in a feed"""
+        digest = hashlib.sha256()
+        for e in events:
+            digest.update(repr((
+                e["id"], e["title"], e["start"].isoformat(), e["all_day"],
+                e["location"], e["notes"], e["invitees"]
+            )).encode("utf-8"))
+        return digest.hexdigest()
+
+    async def refresh_events(
+        self,
+        matter_names_loader: Optional[Callable[[], Awaitable[Dict[str, str]]]] = None,
+        force_refresh: bool = False
+    ):
+        """Re-crawl Dates & Deadlines when stale; feeds are dropped only if the events changed"""
+        async with self._lock:
+            if not force_refresh and not self.is_stale():
+                return
+            try:
+                records = await self.fetch_all_deadlines_from_airtable()
+                matter_names = await matter_names_loader() if matter_names_loader else {}
+            except Exception as e:
+                if self.fingerprint is None:
+                    raise
+                # Keep serving the last good feed rather than failing calendar polls
+                logger.warning(f"[CalendarFeed] Refresh failed, serving cached feeds: {e}")
+                self.events_updated = datetime.now(timezone.utc)
+                return
+
+            self.crawl_count += 1
+            events = self.build_events(records, matter_names)
+            fingerprint = self.compute_fingerprint(events)
+            if fingerprint != self.fingerprint:
+                self.events = events
+                self.by_invitee = self.build_index(events)
+                self.fingerprint = fingerprint
+                logger.info(f"[CalendarFeed] Deadline index changed ({len(events)} events), feeds will be regenerated")
+            self.events_updated = datetime.now(timezone.utc)
+
+    def select_events(self, feed_key: str, identities: List[str]) -> List[Dict]:
+        """Pick the events for a feed: all events for the firm feed, invitee matches otherwise"""
+        if feed_key == FIRM_FEED_KEY:
+            return self.events
+        positions = set()
+        for identity in identities:
+            if identity:
+                positions.update(self.by_invitee.get(identity.strip().lower(), []))
+        return [self.events[i] for i in sorted(positions)]
+
+    def render_ics(self, events: List[Dict], calendar_name: str) -> bytes:
+        """Render events as an RFC 5545 VCALENDAR document"""
+        fallback_stamp = (self.events_updated or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+        lines = [
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            f"PRODID:{CALENDAR_PRODID}",
+            "CALSCALE:GREGORIAN",
+            "METHOD:PUBLISH",
+            f"X-WR-CALNAME:{_escape_text(calendar_name)}",
+            f"X-PUBLISHED-TTL:PT{max(self.cache_ttl_seconds // 60, 1)}M",
+        ]
+        for e in events:
+            lines.append("BEGIN:VEVENT")
+            lines.append(f"UID:{e['id']}@{CALENDAR_UID_DOMAIN}")
+            # Use the record's creation time so unchanged events render to identical bytes
+            lines.append(f"DTSTAMP:{_format_stamp(e['created']) or fallback_stamp}")
+            if e["all_day"]:
+                start = e["start"]
+                lines.append(f"DTSTART;VALUE=DATE:{start.strftime('%Y%m%d')}")
+                lines.append(f"DTEND;VALUE=DATE:{(start + timedelta(days=1)).strftime('%Y%m%d')}")
+            else:
+                start = e["start"]
+                lines.append(f"DTSTART:{start.strftime('%Y%m%dT%H%M%SZ')}")
+                lines.append(f"DTEND:{(start + timedelta(hours=1)).strftime('%Y%m%dT%H%M%SZ')}")
+            lines.append(f"SUMMARY:{_escape_text(e['title'])}")
+            if e["location"]:
+                lines.append(f"LOCATION:{_escape_text(e['location'])}")
+            if e["notes"]:
+                lines.append(f"DESCRIPTION:{_escape_text(e['notes'])}")
+            lines.append("END:VEVENT")
+        lines.append("END:VCALENDAR")
+        return ("\r\n".join(_fold_line(line) for line in lines) + "\r\n").encode("utf-8")
+
+    async def get_feed(
+        self,
+        feed_key: str,
+        calendar_name: str,
+        identities: Optional[List[str]] = None,
+        matter_names_loader: Optional[Callable[[], Awaitable[Dict[str, str]]]] = None
+    ) -> Dict:
+        """Return {"body", "etag", "last_modified"} for a feed, rendering only on index change"""
+        await self.refresh_events(matter_names_loader)
+
+        identities = [identity.strip().lower() for identity in identities or [] if identity]
+        cached = self.feeds.get(feed_key)
+        if (cached and cached["fingerprint"] == self.fingerprint
+                and cached["calendar_name"] == calendar_name and cached["identities"] == identities):
+            return cached
+
+        body = self.render_ics(self.select_events(feed_key, identities), calendar_name)
+        feed = {
+            "fingerprint": self.fingerprint,
+            "calendar_name": calendar_name,
+            "identities": identities,
+            "body": body,
+            "etag": '"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+            "last_modified": self.events_updated or datetime.now(timezone.utc),
+        }
+        # Keep the original Last-Modified when a re-render produced identical bytes
+        if cached and cached["etag"] == feed["etag"]:
+            feed["last_modified"] = cached["last_modified"]
+        self.feeds[feed_key] = feed
+        self.render_count += 1
+        return feed
+
+    def get_cache_status(self) -> Dict:
+        """Get current feed cache status"""
+        return {
+            "event_count": len(self.events),
+            "events_updated": self.events_updated.isoformat() if self.events_updated else None,
+            "fingerprint": self.fingerprint,
+            "cached_feeds": len(self.feeds),
+            "crawl_count": self.crawl_count,
+            "render_count": self.render_count,
+            "cache_ttl_seconds": self.cache_ttl_seconds
+        }
+
+
+# Global feed cache instance
+calendar_feed_cache = CalendarFeedCache()
@@ -0,0 +1,370 @@
+"""Async data-access layer for the Supabase tables used by the backend"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Database:
+    """Runs supabase-py queries on a managed thread pool.
+
+    supabase-py's query builders are synchronous; executing them inside an
+    async handler blocks the event loop for a full round trip. Queries are
+    built on the loop (no I/O) and only .execute() runs on the pool. The one
+    bound client is shared, so its HTTP connection pool is reused by every
+    call. Each call is timed per label ("<table>.<operation>").
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, slow_query_ms: Optional[float] = None):
+        self.client = None
+        self.max_workers = max_workers or int(os.environ.get('DB_MAX_WORKERS', '16'))
+        self.slow_query_ms = slow_query_ms or float(os.environ.get('DB_SLOW_QUERY_MS', '500'))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def bind(self, client):
+        """Attach the Supabase client used for every query"""
+        self.client = client
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="db")
+        return self._executor
+
+    def table(self, name: str):
+        if self.client is None:
+            raise RuntimeError("Database client not bound; call database.bind(client) at startup")
+        return self.client.table(name)
+
+    def _record(self, label: str, elapsed_ms: float, failed: bool):
+        entry = self.stats.setdefault(label, {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+        entry["calls"] += 1
+        entry["total_ms"] += elapsed_ms
+        entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+        if failed:
+            entry["errors"] += 1
+        if elapsed_ms > self.slow_query_ms:
+            logger.warning(f"[DB] Slow query {label}: {elapsed_ms:.0f} ms")
+
+    async def execute(self, label: str, query) -> Any:
+        """Execute a built query off the event loop and return its response"""
+        start = time.perf_counter()
+        failed = False
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, query.execute)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._record(label, (time.perf_counter() - start) * 1000, failed)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def get_stats(self) -> Dict:
+        """Per-label call counts and timings"""
+        return {
+            label: {
+                "calls": int(s["calls"]),
+                "errors": int(s["errors"]),
+                "avg_ms": round(s["total_ms"] / s["calls"], 1) if s["calls"] else 0.0,
+                "max_ms": round(s["max_ms"], 1)
+            }
+            for label, s in sorted(self.stats.items())
+        }
+
+
+# Global database instance
+database = Database()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class Repository:
+    """Base class for a table repository"""
+
+    table_name = ""
+
+    def __init__(self, db: Database = database):
+        self.db = db
+
+    def query(self):
+        return self.db.table(self.table_name)
+
+    async def _execute(self, operation: str, query) -> Any:
+        return await self.db.execute(f"{self.table_name}.{operation}", query)
+
+    async def _rows(self, operation: str, query) -> List[Dict]:
+        result = await self._execute(operation, query)
+        return (result.data if result else None) or []
+
+    async def _one(self, operation: str, query) -> Optional[Dict]:
+        # maybe_single() yields no response at all when nothing matches
+        result = await self._execute(operation, query.maybe_single())
+        return result.data if result else None
+
+
+class UsersRepository(Repository):
+    table_name = "users"
+
+    async def get_by_id(self, user_id: str) -> Optional[Dict]:
+        return await self._one("get_by_id", self.query().select("*").eq("id", user_id))
+
+    async def get_by_email(self, email: str, columns: str = "*") -> Optional[Dict]:
+        return await self._one("get_by_email", self.query().select(columns).eq("email", email))
+
+    async def get_by_reset_token(self, token: str, columns: str = "*") -> Optional[Dict]:
+        return await self._one("get_by_reset_token", self.query().select(columns).eq("password_reset_token", token))
+
+    async def list_all(self) -> List[Dict]:
+        return await self._rows("list_all", self.query().select("*").order("created_at", desc=True))
+
+    async def any_exist(self) -> bool:
+        return bool(await self._rows("any_exist", self.query().select("id").limit(1)))
+
+    async def insert(self, user: Dict) -> None:
+        await self._execute("insert", self.query().insert(user))
+
+    async def update(self, user_id: str, updates: Dict) -> None:
+        await self._execute("update", self.query().update(updates).eq("id", user_id))
+
+    async def update_revoking_tokens(self, user_id: str, updates: Dict) -> Optional[int]:
+        """Apply updates and bump token_version, revoking the user's outstanding tokens.
+
+        The next version comes from the stored row, never a cached copy, and
+        the write only lands if the version is still the one read (retried
+        otherwise). Returns the new version, or None if the user is gone.
+        """
+        for _ in range(5):
+            row = await self._one("get_token_version", self.query().select("token_version").eq("id", user_id))
+            if not row:
+                return None
+            current = row.get("token_version")
+            query = self.query().update({**updates, "token_version": (current or 0) + 1}).eq("id", user_id)
+            query = query.is_("token_version", "null") if current is None else query.eq("token_version", current)
+            if await self._rows("update_revoking_tokens", query):
+                return (current or 0) + 1
+        raise RuntimeError(f"token_version of user {user_id} kept changing")
+
+
+class TemplatesRepository(Repository):
+    table_name = "doc_templates"
+
+    # Template bytes live in the blob store; never pull the legacy base64
+    # file_content column into listings
+    METADATA_COLUMNS = (
+        "id, name, type, county, case_type, category, file_path, original_filename, "
+        "content_hash, file_size, detected_variables, detected_pdf_fields, "
+        "mapping_json, mapping_name, mapping_updated_at, created_at, updated_at"
+    )
+
+    async def get(self, template_id: str) -> Optional[Dict]:
+        return await self._one("get", self.query().select(self.METADATA_COLUMNS).eq("id", template_id))
+
+    async def get_many(self, template_ids: List[str]) -> Dict[str, Dict]:
+        """Templates keyed by id, fetched in one query"""
+        if not template_ids:
+            return {}
+        rows = await self._rows("get_many", self.query().select(self.METADATA_COLUMNS).in_("id", list(template_ids)))
+        return {row["id"]: row for row in rows}
+
+    async def get_legacy_content(self, template_id: str) -> Optional[str]:
+        """Base64 file_content of a template that predates the blob store"""
+        row = await self._one("get_legacy_content", self.query().select("file_content").eq("id", template_id))
+        return (row or {}).get("file_content") or None
+
+    async def count_by_hash(self, content_hash: str) -> int:
+        rows = await self._rows("count_by_hash", self.query().select("id").eq("content_hash", content_hash))
+        return len(rows)
+
+    async def list(
+        self,
+        template_type: Optional[str] = None,
+        case_type: Optional[str] = None,
+        county: Optional[str] = None
+    ) -> List[Dict]:
+        q = self.query().select(self.METADATA_COLUMNS)
+        if template_type:
+            q = q.eq("type", template_type)
+        if case_type:
+            q = q.eq("case_type", case_type)
+        if county:
+            q = q.eq("county", county)
+        return await self._rows("list", q)
+
+    async def insert(self, template: Dict) -> None:
+        await self._execute("insert", self.query().insert(template))
+
+    async def update(self, template_id: str, updates: Dict) -> None:
+        await self._execute("update", self.query().update(updates).eq("id", template_id))
+
+    async def delete(self, template_id: str) -> None:
+        await self._execute("delete", self.query().delete().eq("id", template_id))
+
+
+class MappingProfilesRepository(Repository):
+    table_name = "doc_mapping_profiles"
+
+    async def get(self, profile_id: str) -> Optional[Dict]:
+        return await self._one("get", self.query().select("*").eq("id", profile_id))
+
+    async def list(self, template_id: Optional[str] = None) -> List[Dict]:
+        q = self.query().select("*")
+        if template_id:
+            q = q.eq("template_id", template_id)
+        return await self._rows("list", q)
+
+    async def latest_for_template(self, template_id: str) -> Optional[Dict]:
+        rows = await self._rows(
+            "latest_for_template",
+            self.query().select("*").eq("template_id", template_id).order("created_at", desc=True).limit(1)
+        )
+        return rows[0] if rows else None
+
+    async def get_many(self, profile_ids: List[str]) -> Dict[str, Dict]:
+        """Profiles keyed by id, fetched in one query"""
+        if not profile_ids:
+            return {}
+        rows = await self._rows("get_many", self.query().select("*").in_("id", list(profile_ids)))
+        return {row["id"]: row for row in rows}
+
+    async def latest_for_templates(self, template_ids: List[str]) -> Dict[str, Dict]:
+        """Newest profile of each template, keyed by template id, fetched in one query"""
+        if not template_ids:
+            return {}
+        rows = await self._rows(
+            "latest_for_templates",
+            self.query().select("*").in_("template_id", list(template_ids)).order("created_at", desc=True)
+        )
+        latest: Dict[str, Dict] = {}
+        for row in rows:
+            latest.setdefault(row["template_id"], row)
+        return latest
+
+    async def insert(self, profile: Dict) -> None:
+        await self._execute("insert", self.query().insert(profile))
+
+    async def update(self, profile_id: str, updates: Dict) -> None:
+        await self._execute("update", self.query().update(updates).eq("id", profile_id))
+
+    async def delete(self, profile_id: str) -> None:
+        await self._execute("delete", self.query().delete().eq("id", profile_id))
+
+    async def delete_for_template(self, template_id: str) -> None:
+        await self._execute("delete_for_template", self.query().delete().eq("template_id", template_id))
+
+
+class GeneratedDocsRepository(Repository):
+    table_name = "generated_docs"
+
+    async def get(self, doc_id: str, columns: str = "*") -> Optional[Dict]:
+        return await self._one("get", self.query().select(columns).eq("id", doc_id))
+
+    async def get_many(self, doc_ids: List[str], columns: str = "*") -> Dict[str, Dict]:
+        """Generated documents keyed by id, fetched in one query"""
+        if not doc_ids:
+            return {}
+        rows = await self._rows("get_many", self.query().select(columns).in_("id", list(doc_ids)))
+        return {row["id"]: row for row in rows}
+
+    async def list(self, client_id: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        q = self.query().select("*").order("created_at", desc=True)
+        if client_id:
+            q = q.eq("client_id", client_id)
+        return await self._rows("list", q.limit(limit))
+
+    async def insert(self, doc: Dict) -> None:
+        await self._execute("insert", self.query().insert(doc))
+
+    async def update(self, doc_id: str, updates: Dict) -> None:
+        await self._execute("update", self.query().update(updates).eq("id", doc_id))
+
+    async def clear_file(self, path: str) -> None:
+        """Unset every path column that points at a file that no longer exists"""
+        for column in ("docx_path", "pdf_path", "file_path"):
+            await self._execute("clear_file", self.query().update({column: None}).eq(column, path))
+
+
+class StaffInputsRepository(Repository):
+    table_name = "client_staff_inputs"
+
+    async def get(self, client_id: str) -> Optional[Dict]:
+        return await self._one("get", self.query().select("*").eq("client_id", client_id))
+
+    async def upsert(self, row: Dict) -> None:
+        row = {"updated_at": _now(), **row}
+        await self._execute("upsert", self.query().upsert(row, on_conflict="client_id"))
+
+
+class ApprovalsRepository(Repository):
+    table_name = "document_approvals"
+
+    async def get(self, approval_id: str) -> Optional[Dict]:
+        return await self._one("get", self.query().select("*").eq("id", approval_id))
+
+    async def list_recent(self, limit: int = 200) -> List[Dict]:
+        return await self._rows("list_recent", self.query().select("*").order("created_at", desc=True).limit(limit))
+
+    async def insert(self, approval: Dict) -> None:
+        await self._execute("insert", self.query().insert(approval))
+
+    async def update(self, approval_id: str, updates: Dict) -> None:
+        await self._execute("update", self.query().update(updates).eq("id", approval_id))
+
+
+class NotificationsRepository(Repository):
+    table_name = "notifications"
+
+    async def list_for_user(self, user_id: str, limit: int = 50) -> List[Dict]:
+        return await self._rows(
+            "list_for_user",
+            self.query().select("*").eq("user_id", user_id).order("created_at", desc=True).limit(limit)
+        )
+
+    async def unread_count(self, user_id: str) -> int:
+        rows = await self._rows("unread_count", self.query().select("id").eq("user_id", user_id).eq("read", False))
+        return len(rows)
+
+    async def insert(self, notification: Dict) -> None:
+        await self._execute("insert", self.query().insert(notification))
+
+    async def mark_read(self, notification_id: str, user_id: str) -> None:
+        await self._execute(
+            "mark_read",
+            self.query().update({"read": True}).eq("id", notification_id).eq("user_id", user_id)
+        )
+
+
+class TaskDatesRepository(Repository):
+    table_name = "task_completion_dates"
+
+    async def list_for_case(self, case_id: str) -> List[Dict]:
+        return await self._rows("list_for_case", self.query().select("*").eq("case_id", case_id))
+
+    async def upsert(self, row: Dict) -> None:
+        await self._execute("upsert", self.query().upsert(row, on_conflict="case_id,task_key"))
+
+    async def delete(self, case_id: str, task_key: str) -> None:
+        await self._execute("delete", self.query().delete().eq("case_id", case_id).eq("task_key", task_key))
+
+
+# Repository instances
+users_repo = UsersRepository()
+templates_repo = TemplatesRepository()
+mapping_profiles_repo = MappingProfilesRepository()
+generated_docs_repo = GeneratedDocsRepository()
+staff_inputs_repo = StaffInputsRepository()
+approvals_repo = ApprovalsRepository()
+notifications_repo = NotificationsRepository()
+task_dates_repo = TaskDatesRepository()
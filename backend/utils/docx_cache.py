@@ -0,0 +1,183 @@
+"""LRU of pre-processed DOCX templates, so renders skip re-reading, re-patching and re-compiling them"""
+
+from typing import Callable, Dict, Hashable, Optional
+from collections import OrderedDict
+import hashlib
+import io
+import logging
+import os
+import threading
+
+from docxtpl import DocxTemplate
+from jinja2 import Environment
+
+logger = logging.getLogger(__name__)
+
+
+def _source_key(source: str) -> bytes:
+    return hashlib.sha1(source.encode("utf-8")).digest()
+
+
+class CachingEnvironment(Environment):
+    """Jinja environment that compiles each distinct XML source once.
+
+    docxtpl renders every part with from_string(), which compiles the whole
+    part (often hundreds of KB of XML) to Python on each call. Compiled
+    templates are immutable and safe to render from several threads.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.compiled: Dict[bytes, object] = {}
+        self.compiled_bytes = 0
+        self.compile_hits = 0
+        self.compile_misses = 0
+
+    def from_string(self, source, globals=None, template_class=None):
+        if globals or template_class or not isinstance(source, str):
+            return super().from_string(source, globals, template_class)
+        key = _source_key(source)
+        template = self.compiled.get(key)
+        if template is not None:
+            self.compile_hits += 1
+            return template
+        self.compile_misses += 1
+        template = super().from_string(source)
+        self.compiled[key] = template
+        # Compiled code is roughly proportional to the source it came from
+        self.compiled_bytes += len(source) * 2
+        return template
+
+
+class CachedTemplate:
+    """One template's bytes plus the work derived from them: patched XML per part and compiled Jinja"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.env = CachingEnvironment()
+        self.patched: Dict[bytes, str] = {}
+        self.patched_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return len(self.data) + self.patched_bytes + self.env.compiled_bytes
+
+    def patch(self, src_xml: str, patch_xml: Callable[[str], str]) -> str:
+        key = _source_key(src_xml)
+        patched = self.patched.get(key)
+        if patched is None:
+            patched = patch_xml(src_xml)
+            with self._lock:
+                if key not in self.patched:
+                    self.patched[key] = patched
+                    self.patched_bytes += len(src_xml) + len(patched)
+        return patched
+
+
+class CachedDocxTemplate(DocxTemplate):
+    """DocxTemplate working from a cache entry: the document is loaded from
+    in-memory bytes, and XML patching and Jinja compilation are reused"""
+
+    def __init__(self, entry: CachedTemplate):
+        super().__init__(io.BytesIO(entry.data))
+        self.entry = entry
+
+    def init_docx(self, reload: bool = True):
+        # Each load reads a fresh stream, as the document mutates while rendering
+        self.template_file = io.BytesIO(self.entry.data)
+        super().init_docx(reload)
+
+    def patch_xml(self, src_xml):
+        return self.entry.patch(src_xml, super().patch_xml)
+
+    def render(self, context, jinja_env=None, autoescape=False):
+        # autoescape is set on the environment itself, so it can't be shared
+        if jinja_env is None and not autoescape:
+            jinja_env = self.entry.env
+        super().render(context, jinja_env, autoescape)
+
+
+class DocxTemplateCache:
+    """Pre-processed DOCX templates keyed by content hash, bounded by entry count and approximate memory.
+
+    Templates stored as blobs are keyed by their content_hash; other paths by
+    path, size and modification time, so an overwritten file is a new entry.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries or int(os.environ.get('DOCX_TEMPLATE_CACHE_SIZE', '32'))
+        self.max_bytes = max_bytes or int(os.environ.get('DOCX_TEMPLATE_CACHE_MAX_MB', '256')) * 1024 * 1024
+        self._entries: "OrderedDict[Hashable, CachedTemplate]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key_for(template_path: str, content_hash: Optional[str] = None) -> Hashable:
+        if content_hash:
+            return content_hash
+        stat = os.stat(template_path)
+        return (os.path.abspath(template_path), stat.st_size, stat.st_mtime_ns)
+
+    def get(self, template_path: str, content_hash: Optional[str] = None) -> CachedDocxTemplate:
+        """A renderable template; each call returns a new object sharing the cached work"""
+        key = self.key_for(template_path, content_hash)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if entry is None:
+            with open(template_path, "rb") as f:
+                entry = CachedTemplate(f.read())
+            with self._lock:
+                self.misses += 1
+                entry = self._entries.setdefault(key, entry)
+                self._entries.move_to_end(key)
+                self._evict()
+        return CachedDocxTemplate(entry)
+
+    def _evict(self):
+        # Sizes grow as entries are rendered, so this also runs on hits via render()
+        total = sum(entry.size for entry in self._entries.values())
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or total > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            total -= entry.size
+            self.evictions += 1
+
+    def render(self, template_path: str, context: Dict, output_path, content_hash: Optional[str] = None):
+        doc = self.get(template_path, content_hash)
+        doc.render(context)
+        doc.save(output_path)
+        with self._lock:
+            self._evict()
+
+    def invalidate(self, content_hash: str):
+        with self._lock:
+            self._entries.pop(content_hash, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        """Get current cache statistics"""
+        with self._lock:
+            entries = list(self._entries.values())
+        return {
+            "size": len(entries),
+            "max_size": self.max_entries,
+            "bytes": sum(entry.size for entry in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "compile_hits": sum(entry.env.compile_hits for entry in entries),
+            "compile_misses": sum(entry.env.compile_misses for entry in entries)
+        }
+
+
+# Global DOCX template cache instance
+docx_template_cache = DocxTemplateCache()
@@ -0,0 +1,120 @@
+"""Variable detection for DOCX templates, streamed from the zip and memoized by content hash"""
+
+from typing import Any, Dict, List, Optional, Set, Union
+import copy
+import io
+import logging
+import os
+import re
+import xml.etree.ElementTree as ET
+import zipfile
+
+from utils.blob_store import sha256_bytes, sha256_file
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_PARAGRAPH = _W + "p"
+_TEXT = _W + "t"
+
+# The body, then headers and footers (word/header1.xml, word/footer2.xml, ...)
+_PART_PATTERN = re.compile(r"^word/(document|header\d*|footer\d*)\.xml$")
+
+_VARIABLE = re.compile(r'\{([a-zA-Z_][a-zA-Z0-9_\.]*)\}')
+_REPEAT_START = re.compile(r'\{#([a-zA-Z_][a-zA-Z0-9_]*)\}')
+_REPEAT_END = re.compile(r'\{/([a-zA-Z_][a-zA-Z0-9_]*)\}')
+
+
+def template_parts(archive: zipfile.ZipFile) -> List[str]:
+    """Document, header and footer parts of a DOCX, body first"""
+    names = [name for name in archive.namelist() if _PART_PATTERN.match(name)]
+    return sorted(names, key=lambda name: (name != "word/document.xml", name))
+
+
+def iter_paragraph_text(stream):
+    """Text of each paragraph in a WordprocessingML part, runs joined.
+
+    Word splits a placeholder across runs whenever formatting, spell-check
+    or revision marks change mid-word, so "{client" and "name}" may sit in
+    separate <w:t> elements; joining a paragraph's runs puts them back
+    together. Paragraphs are cleared as they finish, so a large part never
+    sits in memory as a whole tree.
+    """
+    buffers: List[List[str]] = []
+    for event, element in ET.iterparse(stream, events=("start", "end")):
+        if element.tag == _PARAGRAPH:
+            if event == "start":
+                buffers.append([])
+            else:
+                yield "".join(buffers.pop())
+                if not buffers:
+                    element.clear()
+        elif event == "end" and element.tag == _TEXT and buffers and element.text:
+            buffers[-1].append(element.text)
+
+
+class DocxVariableScanner:
+    """Detects {var}, {#block}/{/block} and {block.field} placeholders.
+
+    Only the document, header and footer parts are read, straight from the
+    zip, and a result is memoized by the file's sha256, so re-uploading or
+    re-detecting the same file doesn't read it again.
+    """
+
+    def __init__(self):
+        self.results = TTLCache(
+            max_size=int(os.environ.get('DOCX_SCAN_CACHE_SIZE', '512')),
+            ttl_seconds=int(os.environ.get('DOCX_SCAN_CACHE_TTL_SECONDS', '86400'))
+        )
+        self.scan_count = 0
+
+    @staticmethod
+    def _scan(source: Union[str, io.BytesIO]) -> Dict[str, Any]:
+        variables: Set[str] = set()
+        repeat_starts: Set[str] = set()
+        repeat_ends: Set[str] = set()
+        with zipfile.ZipFile(source) as archive:
+            for part in template_parts(archive):
+                with archive.open(part) as stream:
+                    for text in iter_paragraph_text(stream):
+                        if "{" not in text:
+                            continue
+                        variables.update(_VARIABLE.findall(text))
+                        repeat_starts.update(_REPEAT_START.findall(text))
+                        repeat_ends.update(_REPEAT_END.findall(text))
+
+        # Repeat blocks are those that have both start and end markers
+        repeat_blocks = repeat_starts & repeat_ends
+        # Variables inside repeat blocks look like {items.name}
+        nested = {v for v in variables if '.' in v}
+        return {
+            "variables": sorted(variables - nested),
+            "repeat_blocks": sorted(repeat_blocks),
+            "nested_variables": sorted(nested),
+            "all_detected": sorted(variables)
+        }
+
+    def _memoized(self, content_hash: str, source) -> Dict[str, Any]:
+        result = self.results.get(content_hash)
+        if result is None:
+            result = self._scan(source)
+            self.scan_count += 1
+            self.results.set(content_hash, result)
+        return copy.deepcopy(result)
+
+    def scan_bytes(self, content: bytes, content_hash: Optional[str] = None) -> Dict[str, Any]:
+        """Variables in a DOCX held in memory"""
+        return self._memoized(content_hash or sha256_bytes(content), io.BytesIO(content))
+
+    def scan_file(self, file_path: str, content_hash: Optional[str] = None) -> Dict[str, Any]:
+        """Variables in a DOCX on disk; pass content_hash when it is already known"""
+        return self._memoized(content_hash or sha256_file(file_path), file_path)
+
+    def get_stats(self) -> Dict:
+        """Get current cache statistics"""
+        return {**self.results.get_stats(), "scans": self.scan_count}
+
+
+# Global DOCX variable scanner instance
+docx_variable_scanner = DocxVariableScanner()
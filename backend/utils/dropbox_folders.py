@@ -0,0 +1,241 @@
+"""Dropbox folder tree held in memory and kept current with list_folder cursors"""
+
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+import os
+import re
+import threading
+
+import dropbox
+from dropbox.exceptions import ApiError
+from dropbox.files import DeletedMetadata, FileCategory, FolderMetadata, ListFolderContinueError, SearchOptions
+
+from utils.dropbox_upload import DropboxNotConfigured, dropbox_uploader
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def _parent(key: str) -> str:
+    return key.rsplit("/", 1)[0]
+
+
+def _folder(entry: FolderMetadata) -> Dict[str, str]:
+    return {"name": entry.name, "path": entry.path_display, "id": entry.id}
+
+
+class _FolderIndex:
+    """Folders by lower-cased path, their children, and a sorted word index for prefix search"""
+
+    def __init__(self):
+        self.folders: Dict[str, Dict[str, str]] = {}
+        self.children: Dict[str, Set[str]] = defaultdict(set)
+        self._words: Optional[List[Tuple[str, str]]] = None
+
+    def __len__(self) -> int:
+        return len(self.folders)
+
+    def apply(self, entries: List) -> int:
+        """Apply list_folder entries; files are ignored. Returns how many changed the tree"""
+        changed = 0
+        for entry in entries:
+            if isinstance(entry, FolderMetadata):
+                self.folders[entry.path_lower] = _folder(entry)
+                self.children[_parent(entry.path_lower)].add(entry.path_lower)
+                changed += 1
+            elif isinstance(entry, DeletedMetadata) and entry.path_lower in self.folders:
+                # A deleted (or renamed-away) folder takes its whole subtree with it
+                stack = [entry.path_lower]
+                while stack:
+                    key = stack.pop()
+                    self.folders.pop(key, None)
+                    stack.extend(self.children.pop(key, ()))
+                self.children[_parent(entry.path_lower)].discard(entry.path_lower)
+                changed += 1
+        if changed:
+            self._words = None
+        return changed
+
+    def list(self, key: str) -> List[Dict[str, str]]:
+        folders = [self.folders[child] for child in self.children.get(key, ())]
+        return sorted(folders, key=lambda folder: folder["name"].lower())
+
+    def search(self, query: str, limit: int) -> List[Dict[str, str]]:
+        """Folders with a name word starting with each word of the query"""
+        words = _WORD.findall(query.lower())
+        if not words:
+            return []
+        if self._words is None:
+            self._words = sorted(
+                (word, key) for key, folder in self.folders.items() for word in set(_WORD.findall(folder["name"].lower()))
+            )
+        # Walk the index for the longest query word, check the rest per folder
+        lead = max(words, key=len)
+        matches: Dict[str, Dict[str, str]] = {}
+        i = bisect_left(self._words, (lead,))
+        while i < len(self._words) and self._words[i][0].startswith(lead) and len(matches) < limit:
+            key = self._words[i][1]
+            name_words = _WORD.findall(self.folders[key]["name"].lower())
+            if key not in matches and all(any(w.startswith(q) for w in name_words) for q in words):
+                matches[key] = self.folders[key]
+            i += 1
+        return list(matches.values())
+
+
+class DropboxFolderCache:
+    """The Dropbox folder tree under DROPBOX_FOLDER_CACHE_ROOT, in memory.
+
+    A background task pages through a recursive list_folder once, keeping
+    only folders, then every DROPBOX_FOLDER_REFRESH_SECONDS applies what
+    changed since with list_folder/continue on the saved cursor, starting
+    over if Dropbox resets it. Browsing and prefix search are answered from
+    memory once the first sync is done; before that, or for a folder the
+    tree doesn't know yet, they fall back to Dropbox directly. Every SDK
+    call runs in a thread on the uploader's shared client.
+    """
+
+    def __init__(self, connection=dropbox_uploader):
+        self.connection = connection
+        self.root = os.environ.get('DROPBOX_FOLDER_CACHE_ROOT', '').rstrip('/').lower()
+        self.refresh_interval = float(os.environ.get('DROPBOX_FOLDER_REFRESH_SECONDS', '60'))
+        self.search_limit = int(os.environ.get('DROPBOX_FOLDER_SEARCH_LIMIT', '100'))
+        self._index = _FolderIndex()
+        self._cursor: Optional[str] = None
+        self._refresher: Optional[asyncio.Task] = None
+        self._stopping = threading.Event()
+        self.full_syncs = 0
+        self.changes_applied = 0
+        self.served_from_cache = 0
+        self.served_live = 0
+        self.last_refresh: Optional[str] = None
+
+    @property
+    def synced(self) -> bool:
+        return self._cursor is not None
+
+    def _covers(self, key: str) -> bool:
+        return self.synced and (key == self.root or key in self._index.folders)
+
+    async def _run(self, func: Callable, *args):
+        try:
+            return await asyncio.to_thread(func, *args)
+        except dropbox.exceptions.AuthError:
+            self.connection.reset()
+            raise
+
+    def _page_through(self, result) -> Tuple[List, str]:
+        """Entries of every page of a listing (folders and deletions only) and the final cursor"""
+        entries = []
+        while True:
+            entries.extend(e for e in result.entries if isinstance(e, (FolderMetadata, DeletedMetadata)))
+            if not result.has_more:
+                return entries, result.cursor
+            if self._stopping.is_set():
+                raise asyncio.CancelledError()
+            result = self.connection.client.files_list_folder_continue(result.cursor)
+
+    def _full_sync(self) -> Tuple[_FolderIndex, str]:
+        entries, cursor = self._page_through(self.connection.client.files_list_folder(self.root, recursive=True))
+        index = _FolderIndex()
+        index.apply(entries)
+        return index, cursor
+
+    def _changes(self, cursor: str) -> Tuple[List, str]:
+        return self._page_through(self.connection.client.files_list_folder_continue(cursor))
+
+    def _list_live(self, path: str) -> List[Dict[str, str]]:
+        entries, _ = self._page_through(self.connection.client.files_list_folder(path))
+        folders = [_folder(entry) for entry in entries if isinstance(entry, FolderMetadata)]
+        return sorted(folders, key=lambda folder: folder["name"].lower())
+
+    def _search_live(self, query: str) -> List[Dict[str, str]]:
+        options = SearchOptions(file_categories=[FileCategory.folder], max_results=self.search_limit)
+        result = self.connection.client.files_search_v2(query, options=options)
+        folders = []
+        for match in result.matches:
+            entry = match.metadata.get_metadata() if match.metadata.is_metadata() else None
+            if isinstance(entry, FolderMetadata):
+                folders.append(_folder(entry))
+        return folders
+
+    async def refresh(self):
+        """Sync the whole tree the first time (or after a cursor reset), then only what changed"""
+        if self._cursor is None:
+            self._index, self._cursor = await self._run(self._full_sync)
+            self.full_syncs += 1
+            logger.info(f"[DropboxFolders] Synced {len(self._index)} folders")
+        else:
+            try:
+                entries, cursor = await self._run(self._changes, self._cursor)
+            except ApiError as e:
+                if isinstance(e.error, ListFolderContinueError) and e.error.is_reset():
+                    logger.info("[DropboxFolders] Cursor reset by Dropbox; syncing again")
+                    self._cursor = None
+                    return await self.refresh()
+                raise
+            self.changes_applied += self._index.apply(entries)
+            self._cursor = cursor
+        self.last_refresh = datetime.now(timezone.utc).isoformat()
+
+    async def list_folders(self, path: str = "") -> List[Dict[str, str]]:
+        """Subfolders of a folder, sorted by name"""
+        key = path.rstrip('/').lower()
+        if self._covers(key):
+            self.served_from_cache += 1
+            return self._index.list(key)
+        self.served_live += 1
+        return await self._run(self._list_live, path)
+
+    async def search(self, query: str) -> List[Dict[str, str]]:
+        """Folders whose name has words starting with each word of the query"""
+        if self.synced:
+            self.served_from_cache += 1
+            return self._index.search(query, self.search_limit)
+        self.served_live += 1
+        return await self._run(self._search_live, query)
+
+    async def _refresh_forever(self):
+        while True:
+            try:
+                await self.refresh()
+            except DropboxNotConfigured:
+                return
+            except Exception as e:
+                logger.error(f"[DropboxFolders] Refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        """Start syncing in the background, if Dropbox is configured"""
+        if self._refresher is None and self.refresh_interval > 0 and os.environ.get('DROPBOX_ACCESS_TOKEN'):
+            self._stopping.clear()
+            self._refresher = asyncio.create_task(self._refresh_forever())
+
+    async def shutdown(self):
+        if self._refresher is not None:
+            # An initial sync in progress stops at its next page
+            self._stopping.set()
+            self._refresher.cancel()
+            await asyncio.gather(self._refresher, return_exceptions=True)
+            self._refresher = None
+
+    def get_stats(self) -> Dict:
+        """Get current cache statistics"""
+        return {
+            "synced": self.synced,
+            "root": self.root or "/",
+            "folders": len(self._index),
+            "full_syncs": self.full_syncs,
+            "changes_applied": self.changes_applied,
+            "served_from_cache": self.served_from_cache,
+            "served_live": self.served_live,
+            "last_refresh": self.last_refresh
+        }
+
+
+# Global Dropbox folder cache instance
+dropbox_folder_cache = DropboxFolderCache()
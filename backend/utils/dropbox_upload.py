@@ -0,0 +1,252 @@
+"""Dropbox uploads off the event loop: one shared client, upload sessions and batched commits"""
+
+from typing import Callable, List, Optional, Tuple, Union
+import asyncio
+import logging
+import os
+import threading
+
+import dropbox
+from dropbox.files import CommitInfo, UploadSessionCursor, UploadSessionFinishArg, WriteMode
+
+logger = logging.getLogger(__name__)
+
+# finish_batch accepts at most this many entries per call
+_FINISH_BATCH_LIMIT = 1000
+
+UploadResult = Union[str, Exception]
+
+
+class DropboxNotConfigured(Exception):
+    """Raised when DROPBOX_ACCESS_TOKEN isn't set"""
+
+
+class DropboxUploadFailed(Exception):
+    """Raised (or returned per file in a packet) when Dropbox rejects a commit"""
+
+
+def client_from_env() -> dropbox.Dropbox:
+    """Authenticated client, acting as DROPBOX_TEAM_MEMBER_ID on Business team tokens"""
+    token = os.environ.get('DROPBOX_ACCESS_TOKEN', '')
+    team_member_id = os.environ.get('DROPBOX_TEAM_MEMBER_ID', '')
+    if not token:
+        raise DropboxNotConfigured("Dropbox access token not configured")
+    if team_member_id:
+        return dropbox.DropboxTeam(token).as_user(team_member_id)
+    return dropbox.Dropbox(token)
+
+
+def _normalize(dropbox_path: str) -> str:
+    return dropbox_path if dropbox_path.startswith('/') else '/' + dropbox_path
+
+
+class DropboxUploader:
+    """Uploads generated files to Dropbox.
+
+    The SDK is synchronous, so every call runs in a thread, at most
+    DROPBOX_UPLOAD_CONCURRENCY at a time, on one client that is built once
+    and rebuilt only after an auth error. Files are streamed in
+    DROPBOX_UPLOAD_CHUNK_MB chunks; one that fits in a chunk goes up in a
+    single call. For a packet of documents, each file is uploaded into its
+    own session in parallel and the whole packet is committed with one
+    upload_session_finish_batch call, which Dropbox applies as one write
+    instead of contending per file for the namespace lock.
+    """
+
+    def __init__(self, client_factory: Callable[[], dropbox.Dropbox] = client_from_env):
+        self.client_factory = client_factory
+        self.chunk_size = int(float(os.environ.get('DROPBOX_UPLOAD_CHUNK_MB', '8')) * 1024 * 1024)
+        self.max_concurrency = int(os.environ.get('DROPBOX_UPLOAD_CONCURRENCY', '4'))
+        self._client: Optional[dropbox.Dropbox] = None
+        self._client_lock = threading.Lock()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.uploaded_count = 0
+        self.uploaded_bytes = 0
+        self.batch_commits = 0
+        self.failed_count = 0
+
+    @property
+    def client(self) -> dropbox.Dropbox:
+        with self._client_lock:
+            if self._client is None:
+                self._client = self.client_factory()
+            return self._client
+
+    def reset(self):
+        """Drop the client so the next call builds one from the current token"""
+        with self._client_lock:
+            self._client = None
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        return self._slots
+
+    async def _run(self, func: Callable, *args):
+        async with self.slots:
+            try:
+                return await asyncio.to_thread(func, *args)
+            except dropbox.exceptions.AuthError:
+                self.reset()
+                raise
+
+    def _start_session(self, local_path: str) -> UploadSessionCursor:
+        """Upload a file into a closed session, a chunk at a time"""
+        dbx = self.client
+        size = os.path.getsize(local_path)
+        with open(local_path, 'rb') as f:
+            chunk = f.read(self.chunk_size)
+            session = dbx.files_upload_session_start(chunk, close=len(chunk) >= size)
+            cursor = UploadSessionCursor(session_id=session.session_id, offset=len(chunk))
+            while cursor.offset < size:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    raise IOError(f"{local_path} shrank while being uploaded")
+                dbx.files_upload_session_append_v2(chunk, cursor, close=cursor.offset + len(chunk) >= size)
+                cursor.offset += len(chunk)
+        return cursor
+
+    def _upload(self, local_path: str, dropbox_path: str) -> str:
+        dbx = self.client
+        commit = CommitInfo(path=dropbox_path, mode=WriteMode.overwrite)
+        size = os.path.getsize(local_path)
+        if size <= self.chunk_size:
+            with open(local_path, 'rb') as f:
+                metadata = dbx.files_upload(f.read(), dropbox_path, mode=WriteMode.overwrite)
+        else:
+            metadata = dbx.files_upload_session_finish(b"", self._start_session(local_path), commit)
+        self.uploaded_count += 1
+        self.uploaded_bytes += size
+        return metadata.path_display
+
+    def _finish_batch(self, staged: List[Tuple[UploadSessionCursor, str]]) -> List[UploadResult]:
+        results: List[UploadResult] = []
+        for start in range(0, len(staged), _FINISH_BATCH_LIMIT):
+            part = staged[start:start + _FINISH_BATCH_LIMIT]
+            outcome = self.client.files_upload_session_finish_batch_v2([
+                UploadSessionFinishArg(cursor=cursor, commit=CommitInfo(path=path, mode=WriteMode.overwrite))
+                for cursor, path in part
+            ])
+            self.batch_commits += 1
+            for (cursor, path), entry in zip(part, outcome.entries):
+                if entry.is_success():
+                    self.uploaded_count += 1
+                    self.uploaded_bytes += cursor.offset
+                    results.append(entry.get_success().path_display)
+                else:
+                    self.failed_count += 1
+                    results.append(DropboxUploadFailed(f"Dropbox rejected {path}: {entry.get_failure()}"))
+        return results
+
+    async def upload(self, local_path: str, dropbox_path: str) -> str:
+        """Upload one file, overwriting; returns its Dropbox display path"""
+        try:
+            path_display = await self._run(self._upload, local_path, _normalize(dropbox_path))
+        except Exception:
+            self.failed_count += 1
+            raise
+        logger.info(f"Uploaded to Dropbox: {path_display}")
+        return path_display
+
+    async def start_session(self, local_path: str) -> UploadSessionCursor:
+        return await self._run(self._start_session, local_path)
+
+    async def finish_batch(self, staged: List[Tuple[UploadSessionCursor, str]]) -> List[UploadResult]:
+        return await self._run(self._finish_batch, [(cursor, _normalize(path)) for cursor, path in staged])
+
+    def packet(self, producers: int) -> "UploadPacket":
+        """A packet committed once each of `producers` has uploaded or left without uploading"""
+        return UploadPacket(self, producers)
+
+    def get_stats(self) -> dict:
+        """Get current upload statistics"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "chunk_mb": round(self.chunk_size / (1024 * 1024), 2),
+            "uploaded": self.uploaded_count,
+            "uploaded_mb": round(self.uploaded_bytes / (1024 * 1024), 2),
+            "batch_commits": self.batch_commits,
+            "failed": self.failed_count
+        }
+
+
+class _Producer:
+    """One producer's place in a packet; leaving without uploading withdraws it"""
+
+    def __init__(self, packet: "UploadPacket"):
+        self.packet = packet
+        self.arrived = False
+
+    async def upload(self, files: List[Tuple[str, str]]) -> List[UploadResult]:
+        """Upload (local path, Dropbox path) pairs; returns once the packet is committed"""
+        self.arrived = True
+        return await self.packet._upload(files)
+
+    def __enter__(self) -> "_Producer":
+        return self
+
+    def __exit__(self, *exc_info):
+        if not self.arrived:
+            self.arrived = True
+            self.packet._arrive()
+
+
+class UploadPacket:
+    """Files from several concurrent producers, committed in one finish_batch.
+
+    Each producer's files start uploading as soon as it hands them over; the
+    packet is committed once every producer has uploaded or left without
+    uploading. Results are per file: the Dropbox display path, or the
+    exception for that file.
+    """
+
+    def __init__(self, uploader: DropboxUploader, producers: int):
+        self.uploader = uploader
+        self.remaining = producers
+        self._staged: List[Tuple[UploadSessionCursor, str, asyncio.Future]] = []
+
+    def producer(self) -> _Producer:
+        return _Producer(self)
+
+    async def _upload(self, files: List[Tuple[str, str]]) -> List[UploadResult]:
+        loop = asyncio.get_running_loop()
+        futures = []
+        try:
+            sessions = await asyncio.gather(
+                *(self.uploader.start_session(local_path) for local_path, _ in files), return_exceptions=True
+            )
+            for (_, dropbox_path), session in zip(files, sessions):
+                future = loop.create_future()
+                if isinstance(session, BaseException):
+                    self.uploader.failed_count += 1
+                    future.set_result(session)
+                else:
+                    self._staged.append((session, dropbox_path, future))
+                futures.append(future)
+        finally:
+            self._arrive()
+        return list(await asyncio.gather(*futures))
+
+    def _arrive(self):
+        self.remaining -= 1
+        if self.remaining == 0:
+            asyncio.ensure_future(self._commit())
+
+    async def _commit(self):
+        staged, self._staged = self._staged, []
+        if not staged:
+            return
+        try:
+            results = await self.uploader.finish_batch([(cursor, path) for cursor, path, _ in staged])
+        except Exception as e:
+            logger.error(f"Dropbox batch commit failed: {e}")
+            self.uploader.failed_count += len(staged)
+            results = [e] * len(staged)
+        for (_, _, future), result in zip(staged, results):
+            if not future.done():
+                future.set_result(result)
+
+
+# Global Dropbox uploader instance
+dropbox_uploader = DropboxUploader()
@@ -0,0 +1,274 @@
+"""Storage for generated documents: sharded, collision-free paths, an index and retention"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+import time
+import uuid
+
+from utils.db import generated_docs_repo
+
+logger = logging.getLogger(__name__)
+
+# Files this young are never evicted for quota; they may still be downloading
+_MIN_AGE_SECONDS = 600
+
+_SUFFIX_PATTERN = re.compile(r"\.[0-9a-f]{8}(?=\.[^.]+$)")
+_UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9_-]+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    doc_id TEXT,
+    doc_column TEXT,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_accessed ON files (accessed_at);
+CREATE INDEX IF NOT EXISTS files_created ON files (created_at);
+"""
+
+
+def display_name(path: str) -> str:
+    """The human-readable file name, without the unique suffix"""
+    return _SUFFIX_PATTERN.sub("", os.path.basename(path))
+
+
+class GeneratedStorage:
+    """Generated files under root/YYYY/MM/<client>/, each name made unique.
+
+    Every file is recorded in a SQLite index with its size, creation and
+    last access, and with the generated_docs row and column pointing at it.
+    A background sweep deletes files past GENERATED_RETENTION_DAYS, then the
+    least recently accessed ones while the total exceeds GENERATED_QUOTA_MB,
+    and clears the matching generated_docs paths so rows never point at
+    missing files. Both limits are off (0) unless set. Files already on
+    disk when the index is first built (e.g. the old flat directory) are
+    adopted so retention covers them too; the sweep that adopts them only
+    logs what it would remove, and deletion starts with the next one.
+    """
+
+    def __init__(self, root: Optional[str] = None, index_path: Optional[str] = None):
+        backend_dir = Path(__file__).parent.parent
+        self.root = Path(os.path.abspath(root or os.environ.get(
+            'GENERATED_STORAGE_DIR', str(backend_dir / "templates_storage" / "generated")
+        )))
+        self.index_path = index_path or os.environ.get(
+            'GENERATED_INDEX_PATH', str(backend_dir / "data" / "generated_index.db")
+        )
+        self.retention_days = float(os.environ.get('GENERATED_RETENTION_DAYS', '0'))
+        self.quota_bytes = int(float(os.environ.get('GENERATED_QUOTA_MB', '0')) * 1024 * 1024)
+        self.sweep_interval = float(os.environ.get('GENERATED_SWEEP_INTERVAL_SECONDS', '3600'))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._sweeper: Optional[asyncio.Task] = None
+        self._adopted = False
+        self.evicted_count = 0
+        self.evicted_bytes = 0
+        self.last_sweep: Optional[str] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="generated-index")
+        return self._executor
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.index_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.index_path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    async def _call(self, func: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def allocate(self, filename: str, client_id: Optional[str] = None) -> Path:
+        """A new path for a generated file, e.g. 2026/02/recXXX/Linda Wong - Appearance.1a2b3c4d.pdf.
+        The directory is created; nothing is written."""
+        stem, ext = os.path.splitext(filename)
+        shard = _UNSAFE_CHARS.sub("_", client_id or "")[:64].strip("_") or "unassigned"
+        directory = self.root / datetime.now().strftime("%Y/%m") / shard
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory / f"{stem}.{uuid.uuid4().hex[:8]}{ext}"
+
+    def _register(self, path: str, doc_id: Optional[str], doc_column: Optional[str]):
+        size = os.path.getsize(path)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO files (path, doc_id, doc_column, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET doc_id = excluded.doc_id, doc_column = excluded.doc_column, "
+                "size = excluded.size, accessed_at = excluded.accessed_at",
+                (os.path.abspath(path), doc_id, doc_column, size, now, now)
+            )
+
+    def _touch(self, paths: List[str]):
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE files SET accessed_at = ? WHERE path = ?",
+                [(time.time(), os.path.abspath(path)) for path in paths]
+            )
+
+    def _adopt_existing(self) -> int:
+        """Index files already on disk that the index doesn't know"""
+        conn = self._connect()
+        known = {row[0] for row in conn.execute("SELECT path FROM files")}
+        rows = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.abspath(os.path.join(directory, name))
+                if path not in known:
+                    stat = os.stat(path)
+                    rows.append((path, stat.st_size, stat.st_mtime, max(stat.st_atime, stat.st_mtime)))
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO files (path, size, created_at, accessed_at) VALUES (?, ?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        # Drop shard directories left empty, never the root itself
+        directory = Path(path).parent
+        while directory != self.root and self.root in directory.parents:
+            try:
+                directory.rmdir()
+            except OSError:
+                break
+            directory = directory.parent
+        return True
+
+    def _sweep(self) -> List[Tuple[str, Optional[str], Optional[str]]]:
+        """Delete expired, over-quota and vanished files; returns (path, doc_id, column) of each"""
+        adopted = 0
+        if not self._adopted:
+            adopted = self._adopt_existing()
+            self._adopted = True
+            if adopted:
+                logger.info(f"[GeneratedStorage] Indexed {adopted} existing generated files")
+        conn = self._connect()
+        now = time.time()
+        victims: Dict[str, sqlite3.Row] = {}
+
+        for row in conn.execute("SELECT * FROM files"):
+            if not os.path.exists(row["path"]):
+                victims[row["path"]] = row
+        if self.retention_days > 0:
+            for row in conn.execute("SELECT * FROM files WHERE created_at < ?", (now - self.retention_days * 86400,)):
+                victims[row["path"]] = row
+        if self.quota_bytes > 0:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM files").fetchone()[0]
+            total -= sum(row["size"] for row in victims.values())
+            for row in conn.execute(
+                "SELECT * FROM files WHERE created_at < ? ORDER BY accessed_at", (now - _MIN_AGE_SECONDS,)
+            ):
+                if total <= self.quota_bytes:
+                    break
+                if row["path"] not in victims:
+                    victims[row["path"]] = row
+                    total -= row["size"]
+
+        if adopted:
+            # Newly adopted files have only mtime for age; report before deleting anything
+            if victims:
+                megabytes = sum(row["size"] for row in victims.values()) / (1024 * 1024)
+                logger.warning(
+                    f"[GeneratedStorage] Retention would remove {len(victims)} generated files ({megabytes:.1f} MB); "
+                    f"nothing is removed until the next sweep"
+                )
+            return []
+
+        for path, row in victims.items():
+            if self._remove(path):
+                self.evicted_count += 1
+                self.evicted_bytes += row["size"]
+        with conn:
+            conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in victims])
+        return [(path, row["doc_id"], row["doc_column"]) for path, row in victims.items()]
+
+    def _stats(self) -> Tuple[int, int]:
+        return tuple(self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files").fetchone())
+
+    async def register(self, path: Optional[str], doc_id: Optional[str] = None, doc_column: Optional[str] = None):
+        """Record a written file, and the generated_docs row and column that point at it"""
+        if path and os.path.exists(path):
+            await self._call(self._register, path, doc_id, doc_column)
+
+    async def touch(self, *paths: str):
+        """Mark files as just accessed, for least-recently-used eviction"""
+        try:
+            await self._call(self._touch, [path for path in paths if path])
+        except sqlite3.Error as e:
+            logger.warning(f"[GeneratedStorage] Could not record access: {e}")
+
+    async def sweep(self) -> int:
+        """Apply retention now; returns the number of files removed"""
+        removed = await self._call(self._sweep)
+        for path, doc_id, doc_column in removed:
+            try:
+                if doc_id and doc_column:
+                    await generated_docs_repo.update(doc_id, {doc_column: None})
+                else:
+                    await generated_docs_repo.clear_file(path)
+            except Exception as e:
+                logger.warning(f"[GeneratedStorage] Could not clear generated_docs path {path}: {e}")
+        self.last_sweep = datetime.now(timezone.utc).isoformat()
+        if removed:
+            logger.info(f"[GeneratedStorage] Removed {len(removed)} generated files")
+        return len(removed)
+
+    async def _sweep_forever(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"[GeneratedStorage] Sweep failed: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    def start(self):
+        """Start the background retention sweep"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        if self._sweeper is None and (self.retention_days > 0 or self.quota_bytes > 0):
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def shutdown(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def get_stats(self) -> Dict:
+        """Get current storage statistics"""
+        files, total = await self._call(self._stats)
+        return {
+            "files": files,
+            "total_mb": round(total / (1024 * 1024), 2),
+            "quota_mb": round(self.quota_bytes / (1024 * 1024), 2) if self.quota_bytes else None,
+            "retention_days": self.retention_days or None,
+            "evicted": self.evicted_count,
+            "evicted_mb": round(self.evicted_bytes / (1024 * 1024), 2),
+            "last_sweep": self.last_sweep
+        }
+
+
+# Global generated storage instance
+generated_storage = GeneratedStorage()
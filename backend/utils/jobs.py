@@ -0,0 +1,427 @@
+"""Background jobs with progress events, persisted in a local SQLite database"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import uuid
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+# Reported, not stored: a cancelled job whose task has not unwound yet
+CANCELLING = "cancelling"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    user_id TEXT,
+    payload TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    PRIMARY KEY (job_id, key)
+);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _loads(value: Optional[str]) -> Any:
+    return json.loads(value) if value else None
+
+
+class JobStore:
+    """SQLite tables for jobs, their per-item results and their event log.
+
+    Every call runs on one dedicated thread, which owns the connection.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobs-db")
+        return self._executor
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    async def _call(self, func: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def _job_row(self, row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job["payload"] = _loads(job["payload"])
+        job["result"] = _loads(job["result"])
+        return job
+
+    def _insert(self, job: Dict):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, user_id, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job["id"], job["kind"], job["status"], job["user_id"], json.dumps(job["payload"], default=str),
+                 job["created_at"], job["updated_at"])
+            )
+
+    def _update(self, job_id: str, fields: Dict):
+        fields = dict(fields, updated_at=_now())
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"], default=str)
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def _start(self, job_id: str) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?", (RUNNING, _now(), job_id, QUEUED)
+            )
+        return cursor.rowcount == 1
+
+    def _get(self, job_id: str) -> Optional[Dict]:
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job_row(row) if row else None
+
+    def _list(self, user_id: Optional[str], limit: int) -> List[Dict]:
+        query = "SELECT * FROM jobs"
+        params: Tuple = ()
+        if user_id:
+            query += " WHERE user_id = ?"
+            params = (user_id,)
+        rows = self._connect().execute(query + " ORDER BY created_at DESC LIMIT ?", (*params, limit)).fetchall()
+        return [self._job_row(row) for row in rows]
+
+    def _unfinished(self) -> List[Dict]:
+        rows = self._connect().execute(
+            "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+        ).fetchall()
+        return [self._job_row(row) for row in rows]
+
+    def _save_item(self, job_id: str, key: str, result: Any, error: Any):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_items (job_id, key, result, error) VALUES (?, ?, ?, ?)",
+                (job_id, key, json.dumps(result, default=str) if result is not None else None,
+                 json.dumps(error, default=str) if error is not None else None)
+            )
+            conn.execute(
+                "UPDATE jobs SET done = (SELECT COUNT(*) FROM job_items WHERE job_id = ?), updated_at = ? WHERE id = ?",
+                (job_id, _now(), job_id)
+            )
+
+    def _items(self, job_id: str) -> Dict[str, Tuple[Any, Any]]:
+        rows = self._connect().execute("SELECT key, result, error FROM job_items WHERE job_id = ?", (job_id,)).fetchall()
+        return {row["key"]: (_loads(row["result"]), _loads(row["error"])) for row in rows}
+
+    def _append_event(self, job_id: str, event: str, data: Dict) -> int:
+        with self._connect() as conn:
+            seq = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO job_events (job_id, seq, event, data, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, seq, event, json.dumps(data, default=str), _now())
+            )
+        return seq
+
+    def _events(self, job_id: str, after_seq: int) -> List[Dict]:
+        rows = self._connect().execute(
+            "SELECT seq, event, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after_seq)
+        ).fetchall()
+        return [{"seq": row["seq"], "event": row["event"], "data": json.loads(row["data"])} for row in rows]
+
+    def _purge(self, before: str) -> int:
+        with self._connect() as conn:
+            ids = [row[0] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?, ?) AND updated_at < ?", (*FINISHED_STATUSES, before)
+            )]
+            for table, column in (("job_events", "job_id"), ("job_items", "job_id"), ("jobs", "id")):
+                conn.executemany(f"DELETE FROM {table} WHERE {column} = ?", [(job_id,) for job_id in ids])
+        return len(ids)
+
+    async def insert(self, job: Dict):
+        await self._call(self._insert, job)
+
+    async def update(self, job_id: str, **fields):
+        await self._call(self._update, job_id, fields)
+
+    async def start(self, job_id: str) -> bool:
+        """Mark a queued job running; False if it is no longer queued"""
+        return await self._call(self._start, job_id)
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        return await self._call(self._get, job_id)
+
+    async def list(self, user_id: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        return await self._call(self._list, user_id, limit)
+
+    async def unfinished(self) -> List[Dict]:
+        return await self._call(self._unfinished)
+
+    async def save_item(self, job_id: str, key: str, result: Any, error: Any):
+        await self._call(self._save_item, job_id, key, result, error)
+
+    async def items(self, job_id: str) -> Dict[str, Tuple[Any, Any]]:
+        return await self._call(self._items, job_id)
+
+    async def append_event(self, job_id: str, event: str, data: Dict) -> int:
+        return await self._call(self._append_event, job_id, event, data)
+
+    async def events(self, job_id: str, after_seq: int = 0) -> List[Dict]:
+        return await self._call(self._events, job_id, after_seq)
+
+    async def purge(self, before: str) -> int:
+        return await self._call(self._purge, before)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class JobContext:
+    """What a running job's handler sees: its payload, the items finished by
+    an earlier (interrupted) run, and calls to report progress"""
+
+    def __init__(self, manager: "JobManager", job: Dict, completed: Dict[str, Tuple[Any, Any]]):
+        self.manager = manager
+        self.id = job["id"]
+        self.payload = job["payload"]
+        self.user_id = job["user_id"]
+        self.completed = completed
+
+    async def set_total(self, total: int):
+        await self.manager.store.update(self.id, total=total)
+        await self.manager.publish(self.id, "total", {"total": total})
+
+    async def progress(self, stage: str, **data):
+        await self.manager.publish(self.id, "progress", {"stage": stage, **data})
+
+    async def item_done(self, key: str, result: Any = None, error: Any = None):
+        """Record one finished item; a resumed run skips it"""
+        self.completed[key] = (result, error)
+        await self.manager.store.save_item(self.id, key, result, error)
+        await self.manager.publish(self.id, "item", {"key": key, "result": result, "error": error})
+
+
+JobHandler = Callable[[JobContext], Awaitable[Any]]
+
+
+class JobManager:
+    """Queue of jobs run by a fixed number of worker tasks.
+
+    Submitting stores the job and returns its id at once; handlers report
+    progress as events that clients replay and follow (SSE or polling).
+    Jobs that were queued or running when the process stopped are resumed
+    on start, skipping the items they had already finished. Cancelling a
+    running job cancels its task and waits up to JOB_CANCEL_TIMEOUT_SECONDS
+    for it to unwind; a job a worker has picked up but not started yet is
+    cancelled before its handler runs.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, workers: Optional[int] = None):
+        default_path = Path(__file__).parent.parent / "data" / "jobs.db"
+        self.store = JobStore(db_path or os.environ.get('JOBS_DB_PATH', str(default_path)))
+        self.workers = workers or int(os.environ.get('JOB_WORKERS', '2'))
+        self.retention_days = int(os.environ.get('JOB_RETENTION_DAYS', '7'))
+        self.cancel_timeout = float(os.environ.get('JOB_CANCEL_TIMEOUT_SECONDS', '10'))
+        self.handlers: Dict[str, JobHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._finished: Dict[str, asyncio.Event] = {}
+        self._cancel_requested: set = set()
+        self._signals: Dict[str, asyncio.Event] = {}
+        self.completed_count = 0
+        self.failed_count = 0
+        self.cancelled_count = 0
+
+    def register(self, kind: str, handler: JobHandler):
+        self.handlers[kind] = handler
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    async def start(self):
+        """Start the workers and re-queue jobs a previous process left unfinished"""
+        purged = await self.store.purge((datetime.now(timezone.utc) - timedelta(days=self.retention_days)).isoformat())
+        if purged:
+            logger.info(f"[JobManager] Purged {purged} finished jobs")
+        for job in await self.store.unfinished():
+            logger.info(f"[JobManager] Resuming {job['kind']} job {job['id']}")
+            await self.store.update(job["id"], status=QUEUED)
+            self.queue.put_nowait(job["id"])
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def shutdown(self):
+        # Running jobs keep their status and resume on the next start
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self.store.close()
+
+    async def submit(self, kind: str, payload: Dict, user_id: Optional[str] = None) -> Dict:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = _now()
+        job = {
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "status": QUEUED,
+            "user_id": user_id,
+            "payload": payload,
+            "created_at": now,
+            "updated_at": now
+        }
+        await self.store.insert(job)
+        await self.publish(job["id"], "status", {"status": QUEUED})
+        self.queue.put_nowait(job["id"])
+        return job
+
+    async def cancel(self, job_id: str) -> Optional[Dict]:
+        job = await self.store.get(job_id)
+        if not job or job["status"] in FINISHED_STATUSES:
+            return job
+        self._cancel_requested.add(job_id)
+        finished = self._finished.get(job_id)
+        if finished is None:
+            # Still queued; the worker drops it when it comes up
+            await self._finish(job_id, CANCELLED)
+            return await self.store.get(job_id)
+
+        # A worker has it; the worker records the cancellation once it has unwound
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        try:
+            await asyncio.wait_for(finished.wait(), timeout=self.cancel_timeout)
+        except asyncio.TimeoutError:
+            job = await self.store.get(job_id)
+            if job and job["status"] not in FINISHED_STATUSES:
+                job["status"] = CANCELLING
+            return job
+        return await self.store.get(job_id)
+
+    async def publish(self, job_id: str, event: str, data: Dict) -> int:
+        seq = await self.store.append_event(job_id, event, data)
+        signal = self._signals.pop(job_id, None)
+        if signal is not None:
+            signal.set()
+        return seq
+
+    def listen(self, job_id: str) -> asyncio.Event:
+        """Event set by the job's next publish; take it before reading the log so nothing is missed"""
+        return self._signals.setdefault(job_id, asyncio.Event())
+
+    async def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None):
+        await self.store.update(job_id, status=status, result=result, error=error)
+        await self.publish(job_id, "status", {"status": status, "result": result, "error": error})
+        self._cancel_requested.discard(job_id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self.queue.get()
+            job = await self.store.get(job_id)
+            # Finished, or cancelled while queued (cancel() records that)
+            if not job or job["status"] in FINISHED_STATUSES or job_id in self._cancel_requested:
+                continue
+            # Claimed from here on: cancel() waits for this worker instead of finishing the job itself
+            self._finished[job_id] = asyncio.Event()
+            task = None
+            try:
+                handler = self.handlers.get(job["kind"])
+                if handler is None:
+                    await self._finish(job_id, FAILED, error=f"Unknown job kind: {job['kind']}")
+                    continue
+                if not await self.store.start(job_id):
+                    continue
+                await self.publish(job_id, "status", {"status": RUNNING})
+                context = JobContext(self, job, await self.store.items(job_id))
+                if job_id in self._cancel_requested:
+                    self.cancelled_count += 1
+                    await self._finish(job_id, CANCELLED)
+                    continue
+                task = asyncio.create_task(handler(context))
+                self._running[job_id] = task
+                result = await task
+                self.completed_count += 1
+                await self._finish(job_id, SUCCEEDED, result=result)
+            except asyncio.CancelledError:
+                if job_id not in self._cancel_requested or task is None:
+                    # Shutting down: leave the job to resume on the next start
+                    if task is not None:
+                        task.cancel()
+                    raise
+                self.cancelled_count += 1
+                await self._finish(job_id, CANCELLED)
+            except Exception as e:
+                self.failed_count += 1
+                logger.error(f"[JobManager] {job['kind']} job {job_id} failed: {e}")
+                await self._finish(job_id, FAILED, error=str(e))
+            finally:
+                self._running.pop(job_id, None)
+                self._finished.pop(job_id).set()
+
+    def get_stats(self) -> Dict:
+        """Get current queue statistics"""
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": len(self._running),
+            "completed": self.completed_count,
+            "failed": self.failed_count,
+            "cancelled": self.cancelled_count
+        }
+
+
+# Global job manager instance
+job_manager = JobManager()
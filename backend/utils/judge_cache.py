@@ -0,0 +1,263 @@
+"""Judge Information cache with a judge/matter index and a local standing-order mirror"""
+
+from typing import List, Dict, Optional
+from datetime import datetime, timezone
+from pathlib import Path
+import asyncio
+import httpx
+import json
+import logging
+import os
+
+from utils.airtable import airtable_client
+from utils.blob_store import LocalBlobStore
+
+logger = logging.getLogger(__name__)
+
+STANDING_ORDERS_URL_PREFIX = "/api/airtable/standing-orders"
+
+
+class StandingOrderMirror:
+    """Downloads each Standing Orders attachment once into a content-addressed store.
+
+    Airtable attachment URLs expire after a few hours, so the portal links to
+    the local copy instead. The attachment id -> sha256 mapping is persisted
+    next to the blobs so restarts don't re-download anything.
+    """
+
+    def __init__(self, root: Path):
+        self.store = LocalBlobStore(root)
+        self.index_path = Path(root) / "index.json"
+        self.index: Dict[str, Dict] = self._load_index()
+        self.download_count = 0
+        self.max_concurrent_downloads = int(os.environ.get('STANDING_ORDERS_DOWNLOAD_CONCURRENCY', '4'))
+
+    def _load_index(self) -> Dict[str, Dict]:
+        if not self.index_path.exists():
+            return {}
+        try:
+            with open(self.index_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"[StandingOrders] Could not read mirror index, starting empty: {e}")
+            return {}
+
+    def _save_index(self, index: Dict[str, Dict]):
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def lookup(self, attachment_id: str) -> Optional[Dict]:
+        """Mirror entry for an attachment if its blob is present locally"""
+        entry = self.index.get(attachment_id)
+        if entry and self.store.exists(entry["sha256"]):
+            return entry
+        return None
+
+    def find_by_digest(self, digest: str) -> Optional[Dict]:
+        for entry in self.index.values():
+            if entry["sha256"] == digest:
+                return entry
+        return None
+
+    async def mirror(self, attachments: List[Dict]):
+        """Download attachments that are not mirrored yet"""
+        missing = [a for a in attachments if a.get("id") and a.get("url") and not self.lookup(a["id"])]
+        if not missing:
+            return
+
+        semaphore = asyncio.Semaphore(self.max_concurrent_downloads)
+
+        async with httpx.AsyncClient(timeout=60.0, follow_redirects=True) as client:
+            async def download(attachment: Dict):
+                async with semaphore:
+                    try:
+                        response = await client.get(attachment["url"])
+                        if response.status_code != 200:
+                            logger.warning(f"[StandingOrders] Download failed for {attachment['id']}: {response.status_code}")
+                            return
+                        digest = await asyncio.to_thread(self.store.put, response.content)
+                        self.index[attachment["id"]] = {
+                            "sha256": digest,
+                            "filename": attachment.get("filename") or f"{digest[:12]}.pdf",
+                            "type": attachment.get("type") or "application/pdf",
+                            "size": len(response.content),
+                        }
+                        self.download_count += 1
+                    except Exception as e:
+                        logger.warning(f"[StandingOrders] Download failed for {attachment['id']}: {e}")
+
+            await asyncio.gather(*(download(a) for a in missing))
+
+        await asyncio.to_thread(self._save_index, dict(self.index))
+        logger.info(f"[StandingOrders] Mirror holds {len(self.index)} attachments")
+
+
+class JudgeInformationCache:
+    """Long-TTL cache of Judge Information with judge <-> matter indexes.
+
+    Judges change rarely, so the whole table is crawled once per TTL (or after
+    a write invalidates it) and list responses are served from memory. New
+    standing orders are mirrored in the background after a crawl; until
+    then their links point at Airtable, and the list is relinked once the
+    downloads finish.
+    """
+
+    def __init__(self, mirror: StandingOrderMirror):
+        self.mirror = mirror
+        self.records: List[Dict] = []
+        self.judges: List[Dict] = []
+        self.matters_by_judge: Dict[str, List[str]] = {}
+        self.judge_by_matter: Dict[str, List[str]] = {}
+        self.updated: Optional[datetime] = None
+        self.cache_ttl_seconds = int(os.environ.get('JUDGE_CACHE_TTL_SECONDS', '3600'))
+        self.crawl_count = 0
+        self._lock = asyncio.Lock()
+        self._mirroring: Optional[asyncio.Task] = None
+
+    def is_stale(self) -> bool:
+        """Check if the judge cache is stale"""
+        if self.updated is None:
+            return True
+        age = (datetime.now(timezone.utc) - self.updated).total_seconds()
+        return age > self.cache_ttl_seconds
+
+    def invalidate(self):
+        """Mark the cache stale so the next read re-crawls Judge Information"""
+        self.updated = None
+
+    async def fetch_all_judges_from_airtable(self) -> List[Dict]:
+        """Fetch ALL records from Airtable Judge Information with proper pagination"""
+        all_records = []
+        offset = None
+
+        while True:
+            params = {"offset": offset} if offset else None
+            response = await airtable_client.send("GET", "Judge%20Information", params=params)
+            if response.status_code != 200:
+                logger.error(f"Airtable request failed: {response.status_code} - {response.text}")
+                raise RuntimeError(f"Judge Information fetch failed: {response.status_code}")
+
+            data = response.json()
+            all_records.extend(data.get('records', []))
+
+            offset = data.get('offset')
+            if not offset:
+                break
+
+        logger.info(f"[JudgeCache] Fetched {len(all_records)} judge records from Airtable")
+        return all_records
+
+    def build_index(self, records: List[Dict]):
+        """Build the judge -> matters and matter -> judges indexes"""
+        matters_by_judge: Dict[str, List[str]] = {}
+        judge_by_matter: Dict[str, List[str]] = {}
+        for r in records:
+            master_list = r.get("fields", {}).get("Master List", [])
+            matter_ids = master_list if isinstance(master_list, list) else []
+            matters_by_judge[r["id"]] = matter_ids
+            for matter_id in matter_ids:
+                judge_by_matter.setdefault(matter_id, []).append(r["id"])
+        self.matters_by_judge = matters_by_judge
+        self.judge_by_matter = judge_by_matter
+
+    def standing_orders_link(self, attachment: Dict) -> Dict:
+        """Local URL for a mirrored attachment, falling back to the Airtable URL"""
+        entry = self.mirror.lookup(attachment.get("id", ""))
+        if entry:
+            return {
+                "url": f"{STANDING_ORDERS_URL_PREFIX}/{entry['sha256']}",
+                "filename": entry["filename"],
+            }
+        return {"url": attachment.get("url"), "filename": attachment.get("filename")}
+
+    def build_judges(self, records: List[Dict]) -> List[Dict]:
+        """Project Airtable records into the response shape used by the portal"""
+        judges = []
+        for r in records:
+            fields = r.get("fields", {})
+            standing_orders = fields.get("Standing Orders", [])
+            link = self.standing_orders_link(standing_orders[0]) if standing_orders else {"url": None, "filename": None}
+
+            judges.append({
+                "id": r.get("id"),
+                "name": fields.get("Name"),
+                "county": fields.get("County"),
+                "courtroom": fields.get("Courtroom"),
+                "calendar": fields.get("Calendar"),
+                "email": fields.get("Email"),
+                "zoom_information": fields.get("Zoom Information"),
+                "standing_orders_url": link["url"],
+                "standing_orders_filename": link["filename"],
+                "master_list_count": len(self.matters_by_judge.get(r.get("id"), [])),
+                "area_of_law": fields.get("Area of Law"),
+                "open_close_on_zoom": fields.get("Open/Close on Zoom?", False),
+                "courtesy_copies_needed": fields.get("Courtesy Copies Needed?", False)
+            })
+
+        judges.sort(key=lambda x: x.get("name") or "")
+        return judges
+
+    async def get_judges(self, force_refresh: bool = False) -> List[Dict]:
+        """Get the judge list from cache, refreshing if stale"""
+        async with self._lock:
+            if force_refresh or self.is_stale():
+                try:
+                    records = await self.fetch_all_judges_from_airtable()
+                except Exception as e:
+                    if self.updated is None and not self.judges:
+                        raise
+                    logger.warning(f"[JudgeCache] Refresh failed, serving cached judges: {e}")
+                    self.updated = datetime.now(timezone.utc)
+                    return self.judges
+
+                self.records = records
+                self.build_index(records)
+                self.judges = self.build_judges(records)
+                self.updated = datetime.now(timezone.utc)
+                self.crawl_count += 1
+                self._start_mirroring(records)
+            return self.judges
+
+    def _start_mirroring(self, records: List[Dict]):
+        # One mirror run at a time; a later crawl picks up whatever it missed
+        if self._mirroring is not None and not self._mirroring.done():
+            return
+        self._mirroring = asyncio.create_task(self._mirror_and_relink(records))
+
+    async def _mirror_and_relink(self, records: List[Dict]):
+        attachments = [
+            att for r in records
+            for att in (r.get("fields", {}).get("Standing Orders", []) or [])
+        ]
+        try:
+            await self.mirror.mirror(attachments)
+        except Exception as e:
+            logger.warning(f"[StandingOrders] Mirroring failed: {e}")
+            return
+        if self.records is records:
+            self.judges = self.build_judges(records)
+
+    async def shutdown(self):
+        if self._mirroring is not None:
+            self._mirroring.cancel()
+            await asyncio.gather(self._mirroring, return_exceptions=True)
+            self._mirroring = None
+
+    async def get_matter_ids(self, judge_id: str) -> Optional[List[str]]:
+        """Linked Master List ids for a judge, or None if the judge is unknown"""
+        await self.get_judges()
+        return self.matters_by_judge.get(judge_id)
+
+    def get_cache_status(self) -> Dict:
+        """Get current judge cache status"""
+        return {
+            "judge_count": len(self.judges),
+            "linked_matter_count": len(self.judge_by_matter),
+            "updated": self.updated.isoformat() if self.updated else None,
+            "crawl_count": self.crawl_count,
+            "standing_orders_mirrored": len(self.mirror.index),
+            "standing_orders_downloaded": self.mirror.download_count,
+            "cache_ttl_seconds": self.cache_ttl_seconds
+        }
@@ -0,0 +1,174 @@
+"""Mapping profiles and filename patterns compiled once into reusable plans"""
+
+from functools import lru_cache
+from typing import Any, Dict, Hashable, List, Mapping, Optional, Set, Tuple
+from datetime import datetime
+import logging
+import os
+import re
+
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+LEAVE_BLANK = "__LEAVE_BLANK__"
+STAFF_INPUT = "__STAFF_INPUT__"
+
+_TOKEN_PATTERN = re.compile(r"\{([^{}]*)\}")
+_UNSAFE_FILENAME_CHARS = re.compile(r'[<>:"/\\|?*]')
+
+
+class MappingPlan:
+    """A mapping_json reduced to what generation needs: variable -> source
+    pairs with real sources, and the sets of leave-blank and staff-input
+    variables. Built once per profile version instead of per document."""
+
+    def __init__(self, mapping: Optional[Dict]):
+        mapping = mapping or {}
+        self.fields: List[Tuple[str, str]] = []
+        self.pdf_fields: List[Tuple[str, str, str, str]] = []
+        self.leave_blank: Set[str] = set()
+        self.staff_input: Set[str] = set()
+
+        for var_name, source_info in (mapping.get("fields") or {}).items():
+            source = self._classify(var_name, source_info)
+            if source:
+                self.fields.append((var_name, source))
+        for var_name, source_info in (mapping.get("pdfFields") or {}).items():
+            source = self._classify(var_name, source_info)
+            if source:
+                self.pdf_fields.append((
+                    var_name, source,
+                    source_info.get("type", "text"), source_info.get("trueValue", "Yes")
+                ))
+
+        # Every variable with a real source; pdfFields win, as they were applied last
+        self.sources: Dict[str, str] = dict(self.fields)
+        self.sources.update((var_name, source) for var_name, source, _, _ in self.pdf_fields)
+
+    def _classify(self, var_name: str, source_info: Dict) -> str:
+        source = (source_info or {}).get("source", "")
+        if source == LEAVE_BLANK:
+            self.leave_blank.add(var_name)
+            return ""
+        if source == STAFF_INPUT:
+            self.staff_input.add(var_name)
+            return ""
+        return source
+
+    @property
+    def has_fields(self) -> bool:
+        return bool(self.fields or self.pdf_fields or self.leave_blank or self.staff_input)
+
+    def apply(self, bundle, render_data: Dict[str, Any], include_pdf_fields: bool = True) -> List[str]:
+        """Copy each mapped source value from the bundle into render_data.
+        Returns the variables whose source isn't in the bundle."""
+        unresolved = []
+        plan = self.fields + [(var_name, source) for var_name, source, _, _ in self.pdf_fields] \
+            if include_pdf_fields else self.fields
+        for var_name, source in plan:
+            bundle_key = bundle.resolve_key(source)
+            if bundle_key is not None:
+                render_data[var_name] = bundle[bundle_key]
+            else:
+                unresolved.append(var_name)
+        return unresolved
+
+    def unresolved_pdf_fields(self, bundle) -> List[str]:
+        """The pdfFields whose source isn't in the bundle; what a PDF fill leaves empty"""
+        return [field_name for field_name, source, _, _ in self.pdf_fields if bundle.resolve_key(source) is None]
+
+    def pdf_values(self, bundle) -> Dict[str, str]:
+        """PDF form values for the mapped pdfFields, with checkbox states"""
+        values = {}
+        for field_name, source, field_type, _true_value in self.pdf_fields:
+            bundle_key = bundle.resolve_key(source)
+            if bundle_key is None:
+                continue
+            value = bundle[bundle_key]
+            if field_type == "checkbox":
+                values[field_name] = "/Yes" if str(value).lower() in ["yes", "true", "1"] else "/Off"
+            else:
+                values[field_name] = str(value) if value else ""
+        return values
+
+
+class FilenameTemplate:
+    """A filename or folder pattern split once into literal text and {token}s.
+
+    Rendering looks up only the tokens the pattern uses, instead of a
+    str.replace over every key of the render data. Tokens without a string
+    value are left in place, as before.
+    """
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.parts: List[Tuple[bool, str]] = []
+        position = 0
+        for match in _TOKEN_PATTERN.finditer(pattern):
+            if match.start() > position:
+                self.parts.append((False, pattern[position:match.start()]))
+            self.parts.append((True, match.group(1)))
+            position = match.end()
+        if position < len(pattern):
+            self.parts.append((False, pattern[position:]))
+
+    def render(self, data: Mapping[str, Any], template_name: str) -> str:
+        now = datetime.now()
+        fixed = {
+            "templateName": template_name,
+            "templatename": template_name,
+            "yyyy": now.strftime("%Y"),
+            "mm": now.strftime("%m"),
+            "dd": now.strftime("%d")
+        }
+        resolve = getattr(data, "resolve", None)
+        pieces = []
+        for is_token, text in self.parts:
+            if not is_token:
+                pieces.append(text)
+                continue
+            value = fixed.get(text)
+            if value is None:
+                value = data.get(text)
+                if value is None and resolve is not None:
+                    value = resolve(text)
+            pieces.append(value if isinstance(value, str) else f"{{{text}}}")
+        return _UNSAFE_FILENAME_CHARS.sub('', "".join(pieces))
+
+
+@lru_cache(maxsize=256)
+def filename_template(pattern: str) -> FilenameTemplate:
+    return FilenameTemplate(pattern)
+
+
+mapping_plans = TTLCache(
+    max_size=int(os.environ.get('MAPPING_PLAN_CACHE_SIZE', '512')),
+    ttl_seconds=int(os.environ.get('MAPPING_PLAN_TTL_SECONDS', '3600'))
+)
+
+
+def compile_mapping(mapping: Optional[Dict], cache_key: Optional[Hashable] = None) -> MappingPlan:
+    """Plan for a mapping, reused while cache_key (which must change with the
+    mapping) is unchanged; ad-hoc mappings pass no key and aren't cached"""
+    if cache_key is None:
+        return MappingPlan(mapping)
+    plan = mapping_plans.get(cache_key)
+    if plan is None:
+        plan = MappingPlan(mapping)
+        mapping_plans.set(cache_key, plan)
+    return plan
+
+
+def compile_profile_mapping(profile: Dict) -> MappingPlan:
+    return compile_mapping(
+        profile.get("mapping_json"),
+        ("profile", profile.get("id"), profile.get("updated_at"))
+    )
+
+
+def compile_template_mapping(template: Dict) -> MappingPlan:
+    return compile_mapping(
+        template.get("mapping_json"),
+        ("template", template.get("id"), template.get("mapping_updated_at") or template.get("updated_at"))
+    )
@@ -0,0 +1,102 @@
+"""Password hashing on a bounded thread pool, off the event loop"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+import asyncio
+import bcrypt
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+_COST_PATTERN = re.compile(r"^\$2[abxy]?\$(\d{2})\$")
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hash/verify calls are already queued"""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated thread pool with a queue-depth limit.
+
+    bcrypt releases the GIL, so hashes run in parallel on the pool while the
+    event loop keeps serving other requests. Calls beyond max_pending are
+    rejected immediately instead of piling up behind a login burst.
+    """
+
+    def __init__(
+        self,
+        rounds: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None
+    ):
+        self.rounds = rounds or int(os.environ.get('BCRYPT_ROUNDS', '12'))
+        self.max_workers = max_workers or int(os.environ.get('BCRYPT_MAX_WORKERS', str(min(4, os.cpu_count() or 1))))
+        self.max_pending = max_pending or int(os.environ.get('BCRYPT_MAX_PENDING', '32'))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.pending = 0
+        self.rejected_count = 0
+        self.completed_count = 0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def hash_sync(self, password: str) -> str:
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=self.rounds)).decode('utf-8')
+
+    @staticmethod
+    def verify_sync(password: str, hashed: str) -> bool:
+        try:
+            return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        except ValueError:
+            # Malformed stored hash
+            return False
+
+    async def _run(self, func, *args):
+        # Only touched from the event loop thread, so a plain counter is enough
+        if self.pending >= self.max_pending:
+            self.rejected_count += 1
+            raise PasswordHasherBusy(f"{self.pending} password operations already queued")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+            self.completed_count += 1
+
+    async def hash(self, password: str) -> str:
+        """Hash a password with the configured cost factor"""
+        return await self._run(self.hash_sync, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        """Verify a password against a stored hash"""
+        return await self._run(self.verify_sync, password, hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """True when a stored hash was made with a different cost factor"""
+        match = _COST_PATTERN.match(hashed or "")
+        return bool(match) and int(match.group(1)) != self.rounds
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def get_stats(self) -> Dict:
+        """Get current pool statistics"""
+        return {
+            "rounds": self.rounds,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed_count,
+            "rejected": self.rejected_count
+        }
+
+
+# Global hasher instance
+password_hasher = PasswordHasher()
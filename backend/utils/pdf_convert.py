@@ -0,0 +1,367 @@
+"""DOCX to PDF conversion on a pool of warm headless LibreOffice processes"""
+
+from collections import deque
+from typing import Deque, Dict, List, Optional
+import asyncio
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_MAC_SOFFICE = "/Applications/LibreOffice.app/Contents/MacOS/soffice"
+_THROUGHPUT_WINDOW_SECONDS = 300
+
+
+class ConversionUnavailable(Exception):
+    """Raised when LibreOffice isn't installed or the pool is disabled"""
+
+
+class ConversionFailed(Exception):
+    """Raised when a conversion errors or runs past its timeout"""
+
+
+def find_soffice() -> Optional[str]:
+    """The LibreOffice binary: SOFFICE_PATH, then PATH, then the macOS app bundle"""
+    configured = os.environ.get('SOFFICE_PATH')
+    if configured:
+        return configured if os.path.exists(configured) else None
+    for name in ("soffice", "libreoffice"):
+        found = shutil.which(name)
+        if found:
+            return found
+    return _MAC_SOFFICE if os.path.exists(_MAC_SOFFICE) else None
+
+
+def _uno_available() -> bool:
+    try:
+        import uno  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _process_tree_rss_mb(pid: int) -> Optional[float]:
+    """Resident memory of a process and its children from /proc; None elsewhere.
+
+    The soffice launcher forks soffice.bin, which is where memory grows.
+    """
+    total_kb = 0
+    pending = [pid]
+    try:
+        while pending:
+            current = pending.pop()
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+            children_path = f"/proc/{current}/task/{current}/children"
+            if os.path.exists(children_path):
+                with open(children_path) as f:
+                    pending.extend(int(child) for child in f.read().split())
+    except (OSError, ValueError):
+        return None
+    return total_kb / 1024
+
+
+class _Worker:
+    """One LibreOffice process with its own profile.
+
+    With the UNO bridge the process stays up and documents are loaded into it
+    directly. Without it, each document is a `soffice --convert-to` run on a
+    profile initialized once up front, which still skips the first-run setup
+    that makes a cold conversion slow; recycling doesn't apply there.
+    """
+
+    def __init__(self, soffice: str, profile_dir: str, use_uno: bool):
+        self.soffice = soffice
+        self.profile_dir = profile_dir
+        self.use_uno = use_uno
+        self.pipe_name = f"docgen_{os.getpid()}_{os.path.basename(profile_dir)}"
+        self.process: Optional[subprocess.Popen] = None
+        self.desktop = None
+        self.conversions = 0
+        self.lock = threading.Lock()
+
+    @property
+    def profile_url(self) -> str:
+        return "file://" + os.path.abspath(self.profile_dir).replace(os.sep, "/")
+
+    @property
+    def alive(self) -> bool:
+        if not self.use_uno:
+            return os.path.isdir(os.path.join(self.profile_dir, "user"))
+        return self.process is not None and self.process.poll() is None and self.desktop is not None
+
+    def _base_args(self) -> List[str]:
+        return [
+            self.soffice, "--headless", "--invisible", "--nologo", "--norestore",
+            "--nodefault", "--nolockcheck", f"-env:UserInstallation={self.profile_url}"
+        ]
+
+    def start(self, timeout: float):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self.conversions = 0
+        if not self.use_uno:
+            subprocess.run(
+                self._base_args() + ["--terminate_after_init"],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=timeout, check=False
+            )
+            return
+
+        import uno
+        self.process = subprocess.Popen(
+            self._base_args() + [f"--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                context = resolver.resolve(f"uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext")
+                break
+            except Exception:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise ConversionFailed("LibreOffice did not start")
+                time.sleep(0.25)
+        self.desktop = context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+
+    def _convert_uno(self, docx_path: str, pdf_path: str):
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def prop(name, value):
+            p = PropertyValue()
+            p.Name, p.Value = name, value
+            return p
+
+        document = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(docx_path)), "_blank", 0, (prop("Hidden", True),)
+        )
+        if document is None:
+            raise ConversionFailed(f"LibreOffice could not open {os.path.basename(docx_path)}")
+        try:
+            document.storeToURL(
+                uno.systemPathToFileUrl(os.path.abspath(pdf_path)), (prop("FilterName", "writer_pdf_Export"),)
+            )
+        finally:
+            document.close(True)
+
+    def _convert_cli(self, docx_path: str, pdf_path: str, timeout: float):
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(pdf_path)) or None) as out_dir:
+            completed = subprocess.run(
+                self._base_args() + ["--convert-to", "pdf", "--outdir", out_dir, os.path.abspath(docx_path)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=timeout, check=False
+            )
+            converted = os.path.join(out_dir, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf")
+            if not os.path.exists(converted):
+                detail = completed.stderr.decode("utf-8", "replace").strip()[-300:]
+                raise ConversionFailed(f"LibreOffice produced no PDF: {detail or completed.returncode}")
+            os.replace(converted, pdf_path)
+
+    def ensure_started(self, timeout: float):
+        with self.lock:
+            if not self.alive:
+                self.start(timeout)
+
+    def restart(self, timeout: float):
+        with self.lock:
+            self.stop()
+            self.start(timeout)
+
+    def convert(self, docx_path: str, pdf_path: str, timeout: float):
+        # A run abandoned by a timeout holds the lock until its killed process
+        # makes it fail, so the worker is never driven by two threads
+        with self.lock:
+            if self.use_uno:
+                self._convert_uno(docx_path, pdf_path)
+            else:
+                self._convert_cli(docx_path, pdf_path, timeout)
+            self.conversions += 1
+
+    def rss_mb(self) -> Optional[float]:
+        if self.process is None or self.process.poll() is not None:
+            return None
+        return _process_tree_rss_mb(self.process.pid)
+
+    def stop(self):
+        desktop, process = self.desktop, self.process
+        self.desktop = self.process = None
+        if desktop is not None:
+            try:
+                desktop.terminate()
+            except Exception:
+                pass
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+class PdfConverter:
+    """DOCX to PDF on a small pool of warm LibreOffice workers.
+
+    Each worker has its own profile (LibreOffice allows one process per
+    profile) and converts one document at a time; callers queue for the next
+    idle worker. A worker is recycled after PDF_CONVERT_MAX_JOBS_PER_WORKER
+    conversions or once it holds more than PDF_CONVERT_MAX_RSS_MB, and is
+    replaced outright when a conversion fails or times out.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.soffice = find_soffice()
+        self.worker_count = workers if workers is not None else int(os.environ.get('PDF_CONVERT_WORKERS', '2'))
+        self.max_jobs_per_worker = int(os.environ.get('PDF_CONVERT_MAX_JOBS_PER_WORKER', '200'))
+        self.max_rss_mb = float(os.environ.get('PDF_CONVERT_MAX_RSS_MB', '1024'))
+        self.timeout_seconds = float(os.environ.get('PDF_CONVERT_TIMEOUT_SECONDS', '120'))
+        self.start_timeout_seconds = float(os.environ.get('PDF_CONVERT_START_TIMEOUT_SECONDS', '60'))
+        self.profile_root = os.environ.get(
+            'PDF_CONVERT_PROFILE_DIR', os.path.join(tempfile.gettempdir(), f"docgen-soffice-{os.getpid()}")
+        )
+        self.mode = "uno" if self.soffice and _uno_available() else "cli"
+        self._workers: List[_Worker] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._recent: Deque[float] = deque()
+        self.queued = 0
+        self.busy = 0
+        self.completed_count = 0
+        self.failed_count = 0
+        self.timeout_count = 0
+        self.recycle_count = 0
+        self.total_seconds = 0.0
+
+    @property
+    def available(self) -> bool:
+        return bool(self.soffice) and self.worker_count > 0
+
+    def _ensure_pool(self):
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for index in range(self.worker_count):
+                worker = _Worker(self.soffice, os.path.join(self.profile_root, f"worker{index}"), self.mode == "uno")
+                self._workers.append(worker)
+                self._idle.put_nowait(worker)
+
+    async def start(self):
+        """Start every worker now, so the first document isn't charged for start-up"""
+        if not self.available:
+            return
+        self._ensure_pool()
+        workers = [self._idle.get_nowait() for _ in range(self._idle.qsize())]
+        results = await asyncio.gather(
+            *(asyncio.to_thread(worker.start, self.start_timeout_seconds) for worker in workers),
+            return_exceptions=True
+        )
+        for worker, result in zip(workers, results):
+            if isinstance(result, Exception):
+                # It is started again on first use
+                logger.error(f"[PdfConverter] Worker failed to start: {result}")
+            self._idle.put_nowait(worker)
+        logger.info(f"[PdfConverter] {len(workers)} LibreOffice worker(s) ready ({self.mode})")
+
+    async def convert(self, docx_path: str, pdf_path: str, timeout: Optional[float] = None):
+        """Convert a DOCX to PDF at pdf_path on the next idle worker"""
+        if not self.available:
+            raise ConversionUnavailable("PDF conversion requires LibreOffice (not available in this environment)")
+        timeout = timeout or self.timeout_seconds
+        self._ensure_pool()
+
+        self.queued += 1
+        try:
+            worker = await self._idle.get()
+        finally:
+            self.queued -= 1
+
+        self.busy += 1
+        replace = False
+        try:
+            # A worker that failed to (re)start is started here, outside the conversion timeout
+            await asyncio.to_thread(worker.ensure_started, self.start_timeout_seconds)
+            started = time.perf_counter()
+            await asyncio.wait_for(asyncio.to_thread(worker.convert, docx_path, pdf_path, timeout), timeout)
+        except asyncio.TimeoutError:
+            self.timeout_count += 1
+            self.failed_count += 1
+            replace = True
+            logger.error(f"[PdfConverter] Conversion of {os.path.basename(docx_path)} timed out; replacing worker")
+            raise ConversionFailed(f"PDF conversion timed out after {timeout:.0f} seconds")
+        except ConversionFailed as e:
+            self.failed_count += 1
+            replace = True
+            logger.error(f"[PdfConverter] Conversion of {os.path.basename(docx_path)} failed: {e}")
+            raise
+        except Exception as e:
+            self.failed_count += 1
+            replace = True
+            logger.error(f"[PdfConverter] Conversion of {os.path.basename(docx_path)} failed: {e}")
+            raise ConversionFailed(str(e)) from e
+        else:
+            elapsed = time.perf_counter() - started
+            self.completed_count += 1
+            self.total_seconds += elapsed
+            self._recent.append(time.monotonic())
+        finally:
+            self.busy -= 1
+            self._release(worker, replace)
+
+    def _release(self, worker: _Worker, replace: bool):
+        rss = worker.rss_mb()
+        worn = worker.use_uno and (
+            worker.conversions >= self.max_jobs_per_worker or (rss is not None and rss > self.max_rss_mb)
+        )
+        if replace or worn:
+            if not replace:
+                self.recycle_count += 1
+                logger.info(f"[PdfConverter] Recycling worker after {worker.conversions} conversions ({rss or 0:.0f} MB)")
+            # Restarted in the background so the next document gets a warm worker
+            asyncio.ensure_future(self._restart(worker))
+        else:
+            self._idle.put_nowait(worker)
+
+    async def _restart(self, worker: _Worker):
+        try:
+            # Stopping first, without the lock, frees a thread stuck in the old process
+            await asyncio.to_thread(worker.stop)
+            await asyncio.to_thread(worker.restart, self.start_timeout_seconds)
+        except Exception as e:
+            logger.error(f"[PdfConverter] Worker failed to restart: {e}")
+        finally:
+            self._idle.put_nowait(worker)
+
+    def shutdown(self):
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
+        self._idle = None
+
+    def get_stats(self) -> Dict:
+        """Get current pool statistics"""
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] > _THROUGHPUT_WINDOW_SECONDS:
+            self._recent.popleft()
+        return {
+            "available": self.available,
+            "mode": self.mode if self.available else None,
+            "workers": self.worker_count if self.available else 0,
+            "busy_workers": self.busy,
+            "queued": self.queued,
+            "completed": self.completed_count,
+            "failed": self.failed_count,
+            "timeouts": self.timeout_count,
+            "recycled": self.recycle_count,
+            "avg_seconds": round(self.total_seconds / self.completed_count, 3) if self.completed_count else None,
+            "docs_per_minute": round(len(self._recent) * 60 / _THROUGHPUT_WINDOW_SECONDS, 2)
+        }
+
+
+# Global PDF converter instance
+pdf_converter = PdfConverter()
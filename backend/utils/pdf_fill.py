@@ -0,0 +1,144 @@
+"""PDF form filling from parsed templates cached by content hash, with a field-to-page index"""
+
+from typing import Dict, Hashable, List, Optional, Set
+import io
+import logging
+import os
+import threading
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import NameObject
+
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+def _qualified_name(field) -> str:
+    names = []
+    while field is not None:
+        if "/T" in field:
+            names.append(str(field["/T"]))
+        parent = field.get("/Parent")
+        field = parent.get_object() if parent is not None else None
+    return ".".join(reversed(names))
+
+
+class PdfFormTemplate:
+    """A fillable PDF parsed once, with the pages each field's widgets sit on.
+
+    Fields are indexed under their fully qualified name and their partial
+    (/T) name, the two names pypdf matches fill data against.
+    """
+
+    def __init__(self, data: bytes):
+        self.reader = PdfReader(io.BytesIO(data))
+        self.size = len(data)
+        self.pages_by_field: Dict[str, Set[int]] = {}
+        self.fields_by_page: Dict[int, Set[str]] = {}
+        self.field_types: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        for page_index, page in enumerate(self.reader.pages):
+            for annotation in page.get("/Annots") or []:
+                widget = annotation.get_object()
+                if widget.get("/Subtype") != "/Widget":
+                    continue
+                field = widget if "/T" in widget else widget.get("/Parent", widget).get_object()
+                qualified = _qualified_name(field)
+                for name in {qualified, str(field.get("/T", qualified))}:
+                    self.pages_by_field.setdefault(name, set()).add(page_index)
+                    self.field_types.setdefault(name, str(field.get("/FT", widget.get("/FT", ""))))
+                self.fields_by_page.setdefault(page_index, set()).add(qualified)
+
+    @property
+    def has_form(self) -> bool:
+        return bool(self.fields_by_page) and "/AcroForm" in self.reader.trailer["/Root"]
+
+    def _checkbox_state(self, writer: PdfWriter, page_index: int, name: str) -> str:
+        """Current on/off state of a checkbox that flattening must draw but wasn't given a value"""
+        for annotation in writer.pages[page_index].get("/Annots") or []:
+            widget = annotation.get_object()
+            field = widget if "/T" in widget else widget.get("/Parent", widget).get_object()
+            if _qualified_name(field) == name:
+                return str(widget.get("/AS", "/Off"))
+        return "/Off"
+
+    def fill(self, data: Dict, output, flatten: bool = False):
+        """Fill every page's fields in one pass and write the result to a path or stream"""
+        with self._lock:
+            # Cloning copies the parsed objects; nothing is parsed again
+            writer = PdfWriter(clone_from=self.reader)
+
+        if self.has_form:
+            values_by_page: Dict[int, Dict] = {}
+            for name, value in data.items():
+                for page_index in self.pages_by_field.get(name, ()):
+                    values_by_page.setdefault(page_index, {})[name] = value
+            if flatten:
+                # Flattening draws each field's appearance, so every field is included
+                for page_index, names in self.fields_by_page.items():
+                    page_values = values_by_page.setdefault(page_index, {})
+                    for name in names:
+                        if name in page_values:
+                            continue
+                        if self.field_types.get(name) == "/Btn":
+                            page_values[name] = self._checkbox_state(writer, page_index, name)
+                        else:
+                            page_values[name] = None
+            for page_index, page_values in sorted(values_by_page.items()):
+                writer.update_page_form_field_values(
+                    writer.pages[page_index], page_values, auto_regenerate=not flatten, flatten=flatten
+                )
+            if flatten:
+                writer.remove_annotations(subtypes="/Widget")
+                del writer.root_object[NameObject("/AcroForm")]
+
+        if isinstance(output, (str, os.PathLike)):
+            with open(output, "wb") as f:
+                writer.write(f)
+        else:
+            writer.write(output)
+
+
+class PdfFillEngine:
+    """Parsed form templates keyed by content hash (or path, size and mtime)"""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.templates = TTLCache(
+            max_size=max_entries or int(os.environ.get('PDF_TEMPLATE_CACHE_SIZE', '32')),
+            ttl_seconds=int(os.environ.get('PDF_TEMPLATE_CACHE_TTL_SECONDS', '86400'))
+        )
+        self.fill_count = 0
+
+    @staticmethod
+    def key_for(template_path: str, content_hash: Optional[str] = None) -> Hashable:
+        if content_hash:
+            return content_hash
+        stat = os.stat(template_path)
+        return (os.path.abspath(template_path), stat.st_size, stat.st_mtime_ns)
+
+    def get(self, template_path: str, content_hash: Optional[str] = None) -> PdfFormTemplate:
+        key = self.key_for(template_path, content_hash)
+        template = self.templates.get(key)
+        if template is None:
+            with open(template_path, "rb") as f:
+                template = PdfFormTemplate(f.read())
+            self.templates.set(key, template)
+        return template
+
+    def fill(self, template_path: str, data: Dict, output, flatten: bool = False, content_hash: Optional[str] = None):
+        self.get(template_path, content_hash).fill(data, output, flatten)
+        self.fill_count += 1
+
+    def field_pages(self, template_path: str, content_hash: Optional[str] = None) -> Dict[str, List[int]]:
+        """1-based page numbers of each field, for field detection and mapping screens"""
+        template = self.get(template_path, content_hash)
+        return {name: sorted(i + 1 for i in pages) for name, pages in template.pages_by_field.items()}
+
+    def get_stats(self) -> Dict:
+        """Get current cache statistics"""
+        return {**self.templates.get_stats(), "fills": self.fill_count}
+
+
+# Global PDF fill engine instance
+pdf_fill_engine = PdfFillEngine()
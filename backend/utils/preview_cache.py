@@ -0,0 +1,198 @@
+"""Text previews of generated documents, memoized by file version and served a page at a time"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+import asyncio
+import io
+import logging
+import math
+import os
+import threading
+
+from pypdf import PdfReader
+
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class _PdfText:
+    """Per-page text of one PDF, extracted only as pages are asked for"""
+
+    def __init__(self, path: str, page_count: int):
+        self.path = path
+        self.page_count = page_count
+        self.pages: Dict[int, str] = {}
+        self.lock = threading.Lock()
+
+    def get(self, start: int, stop: int) -> Tuple[List[str], int]:
+        """Text of pages start..stop-1, and how many of them had to be extracted"""
+        with self.lock:
+            missing = [i for i in range(start, stop) if i not in self.pages]
+            if missing:
+                reader = PdfReader(self.path)
+                for i in missing:
+                    self.pages[i] = reader.pages[i].extract_text() or ""
+            return [self.pages[i] for i in range(start, stop)], len(missing)
+
+
+def _extract_docx(source) -> Dict[str, List]:
+    from docx import Document
+    document = Document(source)
+
+    paragraphs = []
+    for para in document.paragraphs:
+        if para.text.strip():
+            paragraphs.append({
+                "type": "paragraph",
+                "text": para.text,
+                "style": para.style.name if para.style else "Normal"
+            })
+
+    tables = []
+    for table in document.tables:
+        tables.append([[cell.text for cell in row.cells] for row in table.rows])
+    return {"paragraphs": paragraphs, "tables": tables}
+
+
+def _paging(page: int, page_size: int, total: int) -> Dict[str, Any]:
+    return {
+        "page": page,
+        "page_size": page_size,
+        "total_pages": max(1, math.ceil(total / page_size)),
+        "has_more": page * page_size < total
+    }
+
+
+class DocumentPreviewCache:
+    """Preview text for DOCX and PDF files.
+
+    Entries are keyed by absolute path, modification time and size, so a
+    file that is rewritten is extracted again. A DOCX is extracted whole;
+    a PDF only records its page count and extracts each page's text the
+    first time that page is asked for. With `page`, a preview returns
+    page_size PDF pages or DOCX paragraphs (a DOCX's tables come with its
+    last page); without it, the whole document as before. Newly generated
+    files are warmed in the background on a small pool so the first view
+    is already cached.
+    """
+
+    def __init__(self):
+        self.entries = TTLCache(
+            max_size=int(os.environ.get('PREVIEW_CACHE_SIZE', '256')),
+            ttl_seconds=int(os.environ.get('PREVIEW_CACHE_TTL_SECONDS', '86400'))
+        )
+        self.pdf_page_size = int(os.environ.get('PREVIEW_PDF_PAGE_SIZE', '5'))
+        self.docx_page_size = int(os.environ.get('PREVIEW_DOCX_PAGE_SIZE', '100'))
+        self.warm_pages = int(os.environ.get('PREVIEW_WARM_PDF_PAGES', '50'))
+        self.warm_workers = int(os.environ.get('PREVIEW_WARM_WORKERS', '1'))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._warming: Set[asyncio.Task] = set()
+        self.documents_opened = 0
+        self.pdf_pages_extracted = 0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.warm_workers, thread_name_prefix="preview-warm")
+        return self._executor
+
+    def _load(self, path: str) -> Union[_PdfText, Dict[str, List]]:
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        entry = self.entries.get(key)
+        if entry is None:
+            if path.endswith('.docx'):
+                entry = _extract_docx(path)
+            elif path.endswith('.pdf'):
+                entry = _PdfText(path, len(PdfReader(path).pages))
+            else:
+                raise ValueError("Unsupported file type")
+            self.documents_opened += 1
+            self.entries.set(key, entry)
+        return entry
+
+    def _pdf_pages(self, entry: _PdfText, start: int, stop: int) -> List[str]:
+        texts, extracted = entry.get(start, stop)
+        self.pdf_pages_extracted += extracted
+        return texts
+
+    def _preview(self, path: str, page: Optional[int], page_size: Optional[int]) -> Dict[str, Any]:
+        entry = self._load(path)
+        if isinstance(entry, _PdfText):
+            if page is None:
+                texts = self._pdf_pages(entry, 0, entry.page_count)
+                return {"success": True, "file_type": "pdf", "pages": [t for t in texts if t], "page_count": entry.page_count}
+            size = page_size or self.pdf_page_size
+            start = (page - 1) * size
+            stop = min(start + size, entry.page_count)
+            return {
+                "success": True,
+                "file_type": "pdf",
+                # Blank pages are kept here so pages[i] is page first_page + i
+                "pages": self._pdf_pages(entry, start, stop) if start < stop else [],
+                "first_page": start + 1,
+                "page_count": entry.page_count,
+                **_paging(page, size, entry.page_count)
+            }
+
+        if page is None:
+            return {"success": True, "file_type": "docx", **entry}
+        size = page_size or self.docx_page_size
+        start = (page - 1) * size
+        paging = _paging(page, size, len(entry["paragraphs"]))
+        return {
+            "success": True,
+            "file_type": "docx",
+            "paragraphs": entry["paragraphs"][start:start + size],
+            "tables": [] if paging["has_more"] else entry["tables"],
+            "paragraph_count": len(entry["paragraphs"]),
+            **paging
+        }
+
+    async def preview(self, path: str, page: Optional[int] = None, page_size: Optional[int] = None) -> Dict[str, Any]:
+        """Preview content of a DOCX or PDF, the whole document or one page of it"""
+        return await asyncio.to_thread(self._preview, path, page, page_size)
+
+    def preview_bytes(self, content: bytes, file_type: str) -> Dict[str, Any]:
+        """Whole-document preview of a file held in memory, such as a dry-run render; not cached.
+        A PDF's text stops after PREVIEW_WARM_PDF_PAGES pages."""
+        if file_type == "docx":
+            return {"file_type": "docx", **_extract_docx(io.BytesIO(content))}
+        reader = PdfReader(io.BytesIO(content))
+        pages = [page.extract_text() or "" for page in reader.pages[:self.warm_pages]]
+        return {"file_type": "pdf", "pages": pages, "page_count": len(reader.pages)}
+
+    async def _warm(self, path: str):
+        try:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self._preview, path, 1, self.warm_pages)
+        except Exception as e:
+            logger.warning(f"[Preview] Could not warm preview for {path}: {e}")
+
+    def warm(self, path: Optional[str]):
+        """Extract a newly generated file's preview in the background"""
+        if path and path.endswith(('.docx', '.pdf')):
+            task = asyncio.create_task(self._warm(path))
+            self._warming.add(task)
+            task.add_done_callback(self._warming.discard)
+
+    async def shutdown(self):
+        for task in list(self._warming):
+            task.cancel()
+        await asyncio.gather(*self._warming, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def get_stats(self) -> Dict:
+        """Get current cache statistics"""
+        return {
+            **self.entries.get_stats(),
+            "documents_opened": self.documents_opened,
+            "pdf_pages_extracted": self.pdf_pages_extracted,
+            "warming": len(self._warming)
+        }
+
+
+# Global document preview cache instance
+preview_cache = DocumentPreviewCache()
@@ -0,0 +1,161 @@
+"""Document rendering on a pool of worker processes, off the event loop"""
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class RenderTimeout(Exception):
+    """Raised when a render job runs past its timeout; its worker is killed"""
+
+
+class RenderFailed(Exception):
+    """Raised when a render job crashed its worker process"""
+
+
+def _init_worker(warm_templates: List[Tuple[str, Optional[str]]]):
+    """Load the rendering libraries and pre-process recently used templates"""
+    from utils.docx_cache import docx_template_cache
+    for template_path, content_hash in warm_templates:
+        try:
+            # An empty render parses, patches and compiles every part
+            docx_template_cache.render(template_path, {}, io.BytesIO(), content_hash)
+        except Exception:
+            pass
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class RenderEngine:
+    """Runs DOCX renders and PDF fills on a process pool.
+
+    Rendering is CPU-bound Python, so threads would still hold the GIL;
+    separate processes let a batch render on every core while the API
+    process keeps serving requests. Each worker keeps its own template cache
+    across jobs. A job past its timeout, or one that kills its worker, breaks
+    only that pool: it is replaced, workers are re-warmed with recently used
+    templates, and other jobs caught in the break are retried once.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, timeout_seconds: Optional[float] = None):
+        self.max_workers = max_workers if max_workers is not None else int(
+            os.environ.get('RENDER_MAX_WORKERS', str(min(4, os.cpu_count() or 1)))
+        )
+        self.timeout_seconds = timeout_seconds or float(os.environ.get('RENDER_TIMEOUT_SECONDS', '120'))
+        self.warm_size = int(os.environ.get('RENDER_WARM_TEMPLATES', '16'))
+        # Workers are spawned so they never inherit the server's threads and sockets
+        self._context = multiprocessing.get_context(os.environ.get('RENDER_START_METHOD', 'spawn'))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._recent: "OrderedDict[Tuple[str, Optional[str]], None]" = OrderedDict()
+        self.busy = 0
+        self.completed_count = 0
+        self.failed_count = 0
+        self.timeout_count = 0
+        self.restart_count = 0
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=self._context,
+                initializer=_init_worker,
+                initargs=(list(self._recent),)
+            )
+        return self._executor
+
+    async def start(self):
+        """Spawn every worker now, so the first batch isn't charged for start-up"""
+        if self.max_workers > 0:
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(
+                loop.run_in_executor(self.executor, _ping) for _ in range(self.max_workers)
+            ))
+
+    def remember_template(self, template_path: str, content_hash: Optional[str] = None):
+        """Note a DOCX template for warming workers that replace a broken pool"""
+        key = (template_path, content_hash)
+        self._recent[key] = None
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.warm_size:
+            self._recent.popitem(last=False)
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        if self._executor is not broken:
+            return
+        self._executor = None
+        self.restart_count += 1
+        # ProcessPoolExecutor can't cancel a running job; stop its process instead
+        for process in list(getattr(broken, "_processes", {}).values()):
+            process.terminate()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func: Callable, *args, timeout: Optional[float] = None):
+        """Run a module-level function in a worker and return its result"""
+        if self.max_workers <= 0:
+            return await asyncio.to_thread(func, *args)
+        timeout = timeout or self.timeout_seconds
+        loop = asyncio.get_running_loop()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        # Jobs are only handed over when a worker is free, so the timeout
+        # covers the render itself rather than time queued behind others
+        async with self._slots:
+            self.busy += 1
+            try:
+                return await self._run(loop, func, args, timeout)
+            finally:
+                self.busy -= 1
+
+    async def _run(self, loop, func: Callable, args: tuple, timeout: float):
+        for attempt in range(2):
+            executor = self.executor
+            try:
+                result = await asyncio.wait_for(loop.run_in_executor(executor, func, *args), timeout)
+                self.completed_count += 1
+                return result
+            except asyncio.TimeoutError:
+                self.timeout_count += 1
+                self.failed_count += 1
+                logger.error(f"[RenderEngine] {func.__name__} timed out after {timeout}s; restarting pool")
+                self._restart(executor)
+                raise RenderTimeout(f"Rendering timed out after {timeout:.0f} seconds")
+            except BrokenProcessPool:
+                self._restart(executor)
+                if attempt:
+                    self.failed_count += 1
+                    raise RenderFailed("Rendering crashed its worker process")
+                logger.warning(f"[RenderEngine] Worker pool broke during {func.__name__}; retrying")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def get_stats(self) -> Dict:
+        """Get current pool statistics"""
+        return {
+            "max_workers": self.max_workers,
+            "timeout_seconds": self.timeout_seconds,
+            "completed": self.completed_count,
+            "failed": self.failed_count,
+            "timeouts": self.timeout_count,
+            "restarts": self.restart_count,
+            "busy_workers": self.busy,
+            "warm_templates": len(self._recent)
+        }
+
+
+# Global render engine instance
+render_engine = RenderEngine()
@@ -0,0 +1,188 @@
+"""In-process catalog of document template metadata with indexed lookup and search"""
+
+from typing import Dict, Iterable, List, Optional, Set
+from datetime import datetime, timezone
+import asyncio
+import bisect
+import logging
+import os
+import re
+
+from utils.db import templates_repo
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens of a template name or query"""
+    return _TOKEN_PATTERN.findall((text or "").lower())
+
+
+class TemplateCatalog:
+    """All template metadata, loaded once and kept current by the write paths.
+
+    Templates are indexed by id, type, county, case type and category, and by
+    name token for search. Uploads, deletes and mapping changes update the
+    catalog in place; the TTL only bounds staleness from writes made by other
+    processes.
+    """
+
+    INDEXED_FIELDS = ("type", "county", "case_type", "category")
+
+    def __init__(self, repo=templates_repo):
+        self.repo = repo
+        self.templates: Dict[str, Dict] = {}
+        self.indexes: Dict[str, Dict[str, Set[str]]] = {field: {} for field in self.INDEXED_FIELDS}
+        self.tokens: Dict[str, Set[str]] = {}
+        self.sorted_tokens: List[str] = []
+        self.loaded_at: Optional[datetime] = None
+        self.cache_ttl_seconds = int(os.environ.get('TEMPLATE_CATALOG_TTL_SECONDS', '600'))
+        self.load_count = 0
+        self._lock = asyncio.Lock()
+
+    def is_stale(self) -> bool:
+        """Check if the catalog is stale"""
+        if self.loaded_at is None:
+            return True
+        age = (datetime.now(timezone.utc) - self.loaded_at).total_seconds()
+        return age > self.cache_ttl_seconds
+
+    def invalidate(self):
+        """Force a full reload on the next read"""
+        self.loaded_at = None
+
+    def _index(self, template: Dict):
+        template_id = template["id"]
+        for field in self.INDEXED_FIELDS:
+            value = template.get(field)
+            if value:
+                self.indexes[field].setdefault(value, set()).add(template_id)
+        for token in tokenize(template.get("name", "")):
+            if token not in self.tokens:
+                bisect.insort(self.sorted_tokens, token)
+            self.tokens.setdefault(token, set()).add(template_id)
+
+    def _unindex(self, template_id: str):
+        template = self.templates.pop(template_id, None)
+        if not template:
+            return
+        for field in self.INDEXED_FIELDS:
+            ids = self.indexes[field].get(template.get(field))
+            if ids:
+                ids.discard(template_id)
+        for token in tokenize(template.get("name", "")):
+            ids = self.tokens.get(token)
+            if ids is not None:
+                ids.discard(template_id)
+                if not ids:
+                    del self.tokens[token]
+                    index = bisect.bisect_left(self.sorted_tokens, token)
+                    if index < len(self.sorted_tokens) and self.sorted_tokens[index] == token:
+                        self.sorted_tokens.pop(index)
+
+    async def ensure_loaded(self, force_refresh: bool = False):
+        """Load every template's metadata if the catalog is empty or stale"""
+        async with self._lock:
+            if not force_refresh and not self.is_stale():
+                return
+            rows = await self.repo.list()
+            self.templates = {}
+            self.indexes = {field: {} for field in self.INDEXED_FIELDS}
+            self.tokens = {}
+            self.sorted_tokens = []
+            for row in rows:
+                self.templates[row["id"]] = row
+                self._index(row)
+            self.loaded_at = datetime.now(timezone.utc)
+            self.load_count += 1
+            logger.info(f"[TemplateCatalog] Loaded {len(rows)} templates")
+
+    def upsert(self, template: Dict):
+        """Add or replace one template's metadata"""
+        self._unindex(template["id"])
+        template = {k: v for k, v in template.items() if k != "file_content"}
+        self.templates[template["id"]] = template
+        self._index(template)
+
+    def apply_updates(self, template_id: str, updates: Dict):
+        """Mirror a row update the caller just wrote; unknown ids are left for the next load"""
+        template = self.templates.get(template_id)
+        if template is not None:
+            self.upsert({**template, **{k: v for k, v in updates.items() if k != "file_content"}})
+
+    def remove(self, template_id: str):
+        self._unindex(template_id)
+
+    async def refresh(self, template_id: str) -> Optional[Dict]:
+        """Re-read one template from the database after it was written"""
+        row = await self.repo.get(template_id)
+        if row:
+            self.upsert(row)
+        else:
+            self.remove(template_id)
+        return row
+
+    async def get(self, template_id: str) -> Optional[Dict]:
+        """One template (a copy the caller may modify), or None"""
+        found = await self.get_many([template_id])
+        return found.get(template_id)
+
+    async def get_many(self, template_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Resolve many template ids in one lookup; unknown ids are omitted"""
+        await self.ensure_loaded()
+        template_ids = list(dict.fromkeys(template_ids))
+        missing = [tid for tid in template_ids if tid not in self.templates]
+        # Another process may have uploaded these since the last load
+        if missing:
+            for row in (await self.repo.get_many(missing)).values():
+                self.upsert(row)
+        return {tid: dict(self.templates[tid]) for tid in template_ids if tid in self.templates}
+
+    def _ids_for_query_token(self, token: str) -> Set[str]:
+        """Ids whose name has a token starting with the query token"""
+        ids: Set[str] = set()
+        index = bisect.bisect_left(self.sorted_tokens, token)
+        while index < len(self.sorted_tokens) and self.sorted_tokens[index].startswith(token):
+            ids |= self.tokens[self.sorted_tokens[index]]
+            index += 1
+        return ids
+
+    async def search(
+        self,
+        template_type: Optional[str] = None,
+        case_type: Optional[str] = None,
+        county: Optional[str] = None,
+        category: Optional[str] = None,
+        search: Optional[str] = None
+    ) -> List[Dict]:
+        """Filter by indexed fields and match every search token against name-token prefixes"""
+        await self.ensure_loaded()
+        candidates: Optional[Set[str]] = None
+        for field, value in (("type", template_type), ("case_type", case_type), ("county", county), ("category", category)):
+            if value:
+                ids = self.indexes[field].get(value, set())
+                candidates = set(ids) if candidates is None else candidates & ids
+        for token in tokenize(search or ""):
+            ids = self._ids_for_query_token(token)
+            candidates = ids if candidates is None else candidates & ids
+        if candidates is None:
+            candidates = set(self.templates)
+        matches = [dict(self.templates[tid]) for tid in candidates]
+        matches.sort(key=lambda t: ((t.get("name") or "").lower(), t["id"]))
+        return matches
+
+    def get_cache_status(self) -> Dict:
+        """Get current catalog status"""
+        return {
+            "template_count": len(self.templates),
+            "token_count": len(self.tokens),
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "load_count": self.load_count,
+            "cache_ttl_seconds": self.cache_ttl_seconds
+        }
+
+
+# Global catalog instance
+template_catalog = TemplateCatalog()
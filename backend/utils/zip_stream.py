@@ -0,0 +1,120 @@
+"""ZIP archives streamed from files on disk, with the archive size known up front"""
+
+from typing import Iterator, List, Tuple
+from datetime import datetime
+import os
+import struct
+import zlib
+
+_CHUNK_SIZE = 64 * 1024
+_ZIP32_LIMIT = 0xFFFFFFFF
+_UTF8_FLAG = 0x800
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_RECORD = struct.Struct("<IHHHHIIH")
+
+
+class ArchiveTooLarge(Exception):
+    """Raised when the files don't fit a ZIP without ZIP64 extensions"""
+
+
+def _dos_datetime(timestamp: float) -> Tuple[int, int]:
+    t = datetime.fromtimestamp(timestamp)
+    year = min(max(t.year, 1980), 2107)
+    return (
+        (t.hour << 11) | (t.minute << 5) | (t.second // 2),
+        ((year - 1980) << 9) | (t.month << 5) | t.day
+    )
+
+
+class _Entry:
+    def __init__(self, path: str, arcname: str):
+        stat = os.stat(path)
+        self.path = path
+        self.name = arcname.encode("utf-8")
+        self.size = stat.st_size
+        self.dos_time, self.dos_date = _dos_datetime(stat.st_mtime)
+        self.crc = 0
+        self.offset = 0
+
+
+class StreamingZip:
+    """A ZIP of existing files, produced chunk by chunk.
+
+    Entries are stored uncompressed (DOCX and PDF are compressed already),
+    so every header size is known before streaming and the total length can
+    be sent as Content-Length. Each file's CRC is computed just before its
+    entry is written, which keeps headers complete without data descriptors
+    and keeps memory at one read buffer however large the archive.
+    """
+
+    def __init__(self, files: List[Tuple[str, str]]):
+        """files: (path on disk, name in the archive); duplicate names get a numeric suffix"""
+        self.entries: List[_Entry] = []
+        seen = set()
+        for path, arcname in files:
+            name = arcname
+            stem, ext = os.path.splitext(arcname)
+            counter = 2
+            while name in seen:
+                name = f"{stem} ({counter}){ext}"
+                counter += 1
+            seen.add(name)
+            self.entries.append(_Entry(path, name))
+        if self.content_length > _ZIP32_LIMIT or len(self.entries) > 0xFFFF:
+            raise ArchiveTooLarge("Archive exceeds the 4 GB / 65535 file ZIP limit")
+
+    @property
+    def content_length(self) -> int:
+        return sum(
+            _LOCAL_HEADER.size + _CENTRAL_HEADER.size + 2 * len(entry.name) + entry.size
+            for entry in self.entries
+        ) + _END_RECORD.size
+
+    @staticmethod
+    def _crc32(path: str, size: int) -> int:
+        crc = 0
+        with open(path, "rb") as f:
+            remaining = size
+            while remaining:
+                chunk = f.read(min(_CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise IOError(f"{path} shrank while being archived")
+                crc = zlib.crc32(chunk, crc)
+                remaining -= len(chunk)
+        return crc
+
+    def __iter__(self) -> Iterator[bytes]:
+        offset = 0
+        for entry in self.entries:
+            entry.crc = self._crc32(entry.path, entry.size)
+            entry.offset = offset
+            header = _LOCAL_HEADER.pack(
+                0x04034B50, 20, _UTF8_FLAG, 0, entry.dos_time, entry.dos_date,
+                entry.crc, entry.size, entry.size, len(entry.name), 0
+            ) + entry.name
+            yield header
+            # Exactly the stat'ed size, so the archive matches content_length
+            with open(entry.path, "rb") as f:
+                remaining = entry.size
+                while remaining:
+                    chunk = f.read(min(_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise IOError(f"{entry.path} shrank while being archived")
+                    remaining -= len(chunk)
+                    yield chunk
+            offset += len(header) + entry.size
+
+        directory_offset = offset
+        directory_size = 0
+        for entry in self.entries:
+            record = _CENTRAL_HEADER.pack(
+                0x02014B50, 20, 20, _UTF8_FLAG, 0, entry.dos_time, entry.dos_date,
+                entry.crc, entry.size, entry.size, len(entry.name), 0, 0, 0, 0, 0, entry.offset
+            ) + entry.name
+            directory_size += len(record)
+            yield record
+        yield _END_RECORD.pack(
+            0x06054B50, 0, 0, len(self.entries), len(self.entries), directory_size, directory_offset, 0
+        )
@@ -93,7 +93,8 @@ const GeneratePanel = () => {
     try {
       const res = await documentGenerationApi.getBatchVariables({
         client_id: selectedClient.id,
-        template_ids: selectedTemplateIds
+        template_ids: selectedTemplateIds,
+        bundle_version: clientBundle?._bundle_version
       });
       const vars = res.data?.variables || [];
       setBatchVars(vars);
@@ -116,7 +117,8 @@ const GeneratePanel = () => {
       const res = await documentGenerationApi.generateBatch({
         client_id: selectedClient.id,
         template_ids: selectedTemplateIds,
-        staff_inputs: staffInputs
+        staff_inputs: staffInputs,
+        bundle_version: clientBundle?._bundle_version
       });
       const docs = res.data?.results || [];
       setGeneratedDocs(docs);
@@ -125,7 +125,8 @@ const GenerateDocumentsPage = () => {
         const payload = {
           template_ids: selectedTemplates.map(t => t.id),
           client_id: selectedClient.id,
-          profile_mappings: selectedProfiles
+          profile_mappings: selectedProfiles,
+          bundle_version: clientBundle?._bundle_version
         };
         
         const result = await documentGenerationApi.getBatchVariables(payload);
@@ -158,7 +159,7 @@ const GenerateDocumentsPage = () => {
     fetchVariables();
     
     return () => { cancelled = true; };
-  }, [selectedTemplates.length, selectedClient?.id, JSON.stringify(selectedProfiles)]);
+  }, [selectedTemplates.length, selectedClient?.id, JSON.stringify(selectedProfiles), clientBundle?._bundle_version]);
 
   const fetchData = async () => {
     setLoading(true);
@@ -192,7 +193,8 @@ const GenerateDocumentsPage = () => {
       const payload = {
         template_ids: selectedTemplates.map(t => t.id),
         client_id: selectedClient.id,
-        profile_mappings: selectedProfiles
+        profile_mappings: selectedProfiles,
+        bundle_version: clientBundle?._bundle_version
       };
       
       const result = await documentGenerationApi.getBatchVariables(payload);
@@ -316,7 +318,8 @@ const GenerateDocumentsPage = () => {
         profile_mappings: selectedProfiles,
         staff_inputs: staffInputs,
         save_to_dropbox: false,
-        save_inputs: saveInputs
+        save_inputs: saveInputs,
+        bundle_version: clientBundle?._bundle_version
       });
       
       setLastGenerated(result.data);
@@ -450,6 +453,43 @@ const GenerateDocumentsPage = () => {
     }
   };
 
+  const handleDownloadAll = async (docs) => {
+    const docIds = docs.map(doc => doc.doc_id).filter(Boolean);
+    if (docIds.length === 0) {
+      toast.error('Download not available - document IDs missing');
+      return;
+    }
+    
+    try {
+      // One streamed ZIP instead of a request per document
+      const token = localStorage.getItem('token');
+      const baseUrl = process.env.REACT_APP_BACKEND_URL;
+      const response = await fetch(
+        `${baseUrl}/api/documents/generated/archive?doc_ids=${encodeURIComponent(docIds.join(','))}`,
+        { headers: { 'Authorization': `Bearer ${token}` } }
+      );
+      
+      if (!response.ok) {
+        throw new Error('Download failed');
+      }
+      
+      const blob = await response.blob();
+      const url = window.URL.createObjectURL(blob);
+      const a = document.createElement('a');
+      a.href = url;
+      a.download = `documents-${new Date().toISOString().slice(0, 10)}.zip`;
+      document.body.appendChild(a);
+      a.click();
+      window.URL.revokeObjectURL(url);
+      document.body.removeChild(a);
+      
+      toast.success(`Downloaded ${docIds.length} documents`);
+    } catch (error) {
+      console.error('Download error:', error);
+      toast.error('Failed to download documents');
+    }
+  };
+
   const handleDownload = async (doc) => {
     const filename = doc.docx_filename || doc.pdf_filename;
     const fileType = doc.file_type || (doc.pdf_path ? 'pdf' : 'docx');
@@ -1246,6 +1286,17 @@ const GenerateDocumentsPage = () => {
               Close
             </Button>
             
+            {/* Download All - one ZIP of every generated file */}
+            {generatedResults.length > 1 && (
+              <Button
+                variant="outline"
+                onClick={() => handleDownloadAll(generatedResults)}
+              >
+                <Download className="w-4 h-4 mr-2" />
+                Download All (ZIP)
+              </Button>
+            )}
+            
             {/* Save All to Dropbox - only show if there are unsaved docs */}
             {generatedResults.some(doc => !doc.dropbox_path) && (
               <Button
@@ -41,6 +41,11 @@ import {
 } from 'lucide-react';
 import { toast } from 'sonner';
 
+// Mirrored standing orders are served by the backend under a relative URL
+const standingOrdersHref = (url) => (
+  url && url.startsWith('/') ? `${process.env.REACT_APP_BACKEND_URL || ''}${url}` : url
+);
+
 // County options for the dropdown
 const COUNTY_OPTIONS = [
   'Cook',
@@ -399,22 +404,13 @@ const JudgeDetailModal = ({ judge, isOpen, onClose, getCountyColor, onUpdate })
   };
 
   const fetchLinkedCases = async () => {
-    if (!judge?.master_list_ids || judge.master_list_ids.length === 0) return;
+    if (!judge?.master_list_count) return;
     
     setLoadingCases(true);
     try {
-      // Fetch each linked case
-      const casePromises = judge.master_list_ids.map(id => 
-        masterListApi.getOne(id).catch(() => null)
-      );
-      const results = await Promise.all(casePromises);
-      const validCases = results
-        .filter(r => r && r.data)
-        .map(r => ({
-          id: r.data.id,
-          ...r.data.fields
-        }));
-      setLinkedCases(validCases);
+      // Linked cases are resolved server-side from the judge/matter index
+      const response = await judgeApi.getMatters(judge.id);
+      setLinkedCases(response.data.matters || []);
     } catch (error) {
       console.error('Failed to fetch linked cases:', error);
       toast.error('Failed to load linked cases');
@@ -613,7 +609,7 @@ const JudgeDetailModal = ({ judge, isOpen, onClose, getCountyColor, onUpdate })
                 <h4 className="text-sm font-semibold text-slate-800 uppercase tracking-wide">Standing Orders</h4>
                 {judge.standing_orders_url ? (
                   <a
-                    href={judge.standing_orders_url}
+                    href={standingOrdersHref(judge.standing_orders_url)}
                     target="_blank"
                     rel="noopener noreferrer"
                     className="inline-flex items-center gap-2 px-4 py-2 bg-[#2E7DA1]/10 text-[#2E7DA1] rounded-lg hover:bg-[#2E7DA1]/20 transition-colors"
@@ -1036,12 +1032,14 @@ const LinkRecordModal = ({ isOpen, onClose, onSuccess, judge }) => {
   const [matterSearchResults, setMatterSearchResults] = useState([]);
   const [searchingMatters, setSearchingMatters] = useState(false);
   const [selectedMatters, setSelectedMatters] = useState([]);
+  const [linkedIds, setLinkedIds] = useState(null);
   const [saving, setSaving] = useState(false);
 
   const resetForm = () => {
     setMatterSearchQuery('');
     setMatterSearchResults([]);
     setSelectedMatters([]);
+    setLinkedIds(null);
   };
 
   const handleClose = () => {
@@ -1057,9 +1055,13 @@ const LinkRecordModal = ({ isOpen, onClose, onSuccess, judge }) => {
     
     setSearchingMatters(true);
     try {
-      const response = await masterListApi.search(query);
+      const [response, linked] = await Promise.all([
+        masterListApi.search(query),
+        linkedIds ? Promise.resolve(linkedIds) : judgeApi.getMatters(judge.id).then(r => r.data.matter_ids || [])
+      ]);
+      setLinkedIds(linked);
       // Filter out matters that are already linked to this judge
-      const existingIds = judge?.master_list_ids || [];
+      const existingIds = linked;
       const filtered = (response.data.records || []).filter(
         r => !existingIds.includes(r.id)
       );
@@ -113,6 +113,10 @@ const SettingsPage = () => {
       });
 
       if (response.data.success) {
+        // Changing the password revokes older tokens; keep this session on the new one
+        if (response.data.access_token) {
+          localStorage.setItem('token', response.data.access_token);
+        }
         toast.success('Password changed successfully!');
         setPasswordData({
           currentPassword: '',
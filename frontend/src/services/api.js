@@ -174,6 +174,7 @@ export const judgeApi = {
   getAll: () => api.get('/airtable/judge-information'),
   create: (data) => api.post('/airtable/judge-information', data),
   update: (recordId, data) => api.patch(`/airtable/judge-information/${recordId}`, data),
+  getMatters: (recordId) => api.get(`/airtable/judge-information/${recordId}/matters`),
 };
 
 // Task Completion Dates
@@ -0,0 +1,23 @@
+/*
+  # Add token_version column to users table
+
+  1. Changes
+    - Add `token_version` integer column to users table, defaults to 0
+    - Tokens carry the version they were issued with in a `ver` claim
+    - Bumping the version (password change/reset, deactivation) revokes
+      every outstanding token for that user, even in processes that still
+      hold the user row in their auth cache
+
+  2. Security
+    - No RLS policy changes needed - existing policies remain in effect
+*/
+
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_schema = 'public' AND table_name = 'users' AND column_name = 'token_version'
+  ) THEN
+    ALTER TABLE public.users ADD COLUMN token_version integer NOT NULL DEFAULT 0;
+  END IF;
+END $$;
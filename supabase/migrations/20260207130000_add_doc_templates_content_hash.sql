@@ -0,0 +1,28 @@
+/*
+  # Move template binaries out of doc_templates rows
+
+  1. Changes
+    - Add `content_hash` (text) - sha256 of the template bytes; the bytes live in
+      the backend's content-addressed blob store (local disk, optionally mirrored
+      to a Supabase Storage bucket)
+    - Add `file_size` (bigint) - size of the template in bytes
+    - Make sure the metadata columns the backend projects exist:
+      `original_filename`, `mapping_json`, `mapping_name`, `mapping_updated_at`
+    - Index `content_hash` so shared blobs can be reference-counted on delete
+    - `file_content` is kept for templates that have not been migrated yet;
+      POST /api/documents/templates-migrate moves them into the blob store
+
+  2. Security
+    - No RLS policy changes needed - existing policies remain in effect
+*/
+
+ALTER TABLE doc_templates ADD COLUMN IF NOT EXISTS content_hash text;
+ALTER TABLE doc_templates ADD COLUMN IF NOT EXISTS file_size bigint;
+ALTER TABLE doc_templates ADD COLUMN IF NOT EXISTS original_filename text;
+ALTER TABLE doc_templates ADD COLUMN IF NOT EXISTS mapping_json jsonb DEFAULT '{}'::jsonb;
+ALTER TABLE doc_templates ADD COLUMN IF NOT EXISTS mapping_name text;
+ALTER TABLE doc_templates ADD COLUMN IF NOT EXISTS mapping_updated_at timestamptz;
+
+ALTER TABLE doc_templates ALTER COLUMN file_content DROP DEFAULT;
+
+CREATE INDEX IF NOT EXISTS doc_templates_content_hash_idx ON doc_templates (content_hash);
@@ -0,0 +1,68 @@
+"""
+Test suite for the ICS calendar feeds
+Tests GET /api/calendar/feed-url and GET /api/calendar/feed.ics,
+including conditional GET (ETag / If-None-Match) support
+"""
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://docgen-fix-2.preview.emergentagent.com')
+
+# Test credentials
+TEST_EMAIL = "contact@illinoisestatelaw.com"
+TEST_PASSWORD = "IEL2024!"
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with auth token"""
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": TEST_EMAIL, "password": TEST_PASSWORD}
+    )
+    if response.status_code != 200:
+        pytest.skip(f"Authentication failed: {response.status_code} - {response.text}")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def feed_urls(auth_headers):
+    """Get the personal and firm feed URLs"""
+    response = requests.get(f"{BASE_URL}/api/calendar/feed-url", headers=auth_headers)
+    assert response.status_code == 200, f"feed-url failed: {response.text}"
+    data = response.json()
+    assert "personal" in data and "firm" in data
+    return data
+
+
+class TestCalendarFeed:
+    """Calendar feed endpoint tests"""
+
+    def test_feed_requires_valid_token(self):
+        """Feed rejects an invalid token"""
+        response = requests.get(f"{BASE_URL}/api/calendar/feed.ics?token=invalid")
+        assert response.status_code == 401
+
+    def test_firm_feed_is_ics(self, feed_urls):
+        """Firm feed returns a VCALENDAR with an ETag"""
+        response = requests.get(f"{BASE_URL}{feed_urls['firm']}")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/calendar")
+        assert response.text.startswith("BEGIN:VCALENDAR")
+        assert response.text.rstrip().endswith("END:VCALENDAR")
+        assert response.headers.get("etag")
+
+    def test_feed_conditional_get(self, feed_urls):
+        """Polling with If-None-Match returns 304 while events are unchanged"""
+        first = requests.get(f"{BASE_URL}{feed_urls['personal']}")
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+
+        second = requests.get(
+            f"{BASE_URL}{feed_urls['personal']}",
+            headers={"If-None-Match": etag}
+        )
+        assert second.status_code == 304
+        assert second.content == b""
+        print(f"✓ Feed served 304 for ETag {etag}")